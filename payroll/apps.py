@@ -1,11 +1,18 @@
+import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
 
 from django.apps import AppConfig
 
 from core.custom_filters import CustomFilterRegistryPoint
 from payroll.payments_registry import PaymentsMethodRegistryPoint
 
+logger = logging.getLogger(__name__)
+
 MODULE_NAME = 'payroll'
+CONFIG_VERSION_CACHE_KEY = 'payroll_config_version'
 
 DEFAULT_CONFIG = {
     "gql_payment_point_search_perms": ["201001"],
@@ -39,6 +46,9 @@ DEFAULT_CONFIG = {
     "csv_reconciliation_code_column": "code",
     "csv_reconciliation_paid_yes": "Yes",
     "csv_reconciliation_paid_no": "No",
+    "csv_reconciliation_chunk_size": 5000,
+    "payment_cycle_export_rows_per_file": 100000,
+    "storage_stream_chunk_size": 1048576,
     "payroll_delete_event": "payroll.payroll_delete",
     "benefit_delete_event": "payroll.benefit_delete",
 
@@ -49,9 +59,35 @@ DEFAULT_CONFIG = {
     "payment_gateway_basic_auth_username": os.getenv('PAYMENT_GATEWAY_BASIC_AUTH_USERNAME'),
     "payment_gateway_basic_auth_password": os.getenv('PAYMENT_GATEWAY_BASIC_AUTH_PASSWORD'),
     "payment_gateway_timeout": 5,
+    # retries of connection errors, 429 and 5xx responses, with exponential backoff starting at the given seconds
+    "payment_gateway_retries": 0,
+    "payment_gateway_retry_backoff": 0.5,
     "payment_gateway_auth_type": "basic",  # can be 'token' or 'basic'
     "payment_gateway_class": "payroll.payment_gateway.MockedPaymentGatewayConnector",
-    "receipt_length": 8
+    # size of the gateway worker pool shared by a payment batch and its requests per second limit (None = no limit)
+    "payment_gateway_max_workers": 8,
+    "payment_gateway_rate_limit": 20,
+    "receipt_length": 8,
+    "keyset_total_count_cache_ttl": 60,
+    "bulk_create_batch_size": 1000,
+    # payrolls selecting more beneficiaries are generated by background chunk tasks, None disables it
+    "payroll_background_generation_threshold": None,
+    "payroll_generation_chunk_size": 5000,
+    # index updates of payroll documents made by payroll transitions are collected and indexed after commit
+    "opensearch_deferred_sync": True,
+    "opensearch_sync_batch_size": 1000,
+    # json_ext keys of benefit consumptions indexed in opensearch
+    "opensearch_benefit_json_ext_keys": ["gateway_reconciliation_success"],
+    # stage timings are always logged, metrics are additionally sent to 'prometheus' or 'statsd' when set
+    "instrumentation_metrics_backend": None,
+    # per field SQL query counting of the payroll GraphQL schema by QueryCountGuardMiddleware
+    "gql_query_guard_enabled": False,
+    "gql_query_guard_threshold": 20,
+    # seconds between two checks of the configuration version in the cache, see PayrollConfig.refresh_if_stale
+    "config_refresh_interval": 10,
+    "instrumentation_statsd_host": "localhost",
+    "instrumentation_statsd_port": 8125,
+    "instrumentation_statsd_prefix": "payroll",
 }
 
 
@@ -79,6 +115,9 @@ class PayrollConfig(AppConfig):
     csv_reconciliation_code_column = None
     csv_reconciliation_paid_yes = None
     csv_reconciliation_paid_no = None
+    csv_reconciliation_chunk_size = None
+    payment_cycle_export_rows_per_file = None
+    storage_stream_chunk_size = None
     payroll_delete_event = None
     benefit_delete_event = None
 
@@ -89,16 +128,116 @@ class PayrollConfig(AppConfig):
     payment_gateway_basic_auth_username = None
     payment_gateway_basic_auth_password = None
     payment_gateway_timeout = None
+    payment_gateway_retries = None
+    payment_gateway_retry_backoff = None
     payment_gateway_auth_type = None
     payment_gateway_class = None
+    payment_gateway_max_workers = None
+    payment_gateway_rate_limit = None
     receipt_length = None
+    keyset_total_count_cache_ttl = None
+    bulk_create_batch_size = None
+    payroll_background_generation_threshold = None
+    payroll_generation_chunk_size = None
+    opensearch_deferred_sync = None
+    opensearch_sync_batch_size = None
+    opensearch_benefit_json_ext_keys = None
+    instrumentation_metrics_backend = None
+    gql_query_guard_enabled = None
+    gql_query_guard_threshold = None
+    config_refresh_interval = None
+    # version of the configuration in the cache when it was loaded by this process
+    config_version = None
+    _config_checked_at = 0.0
+    # pinned blocks running in the process and a reload postponed until the last of them exits
+    _config_lock = threading.RLock()
+    _pinned_runs = 0
+    _reload_pending = False
+    instrumentation_statsd_host = None
+    instrumentation_statsd_port = None
+    instrumentation_statsd_prefix = None
 
     def ready(self):
         from core.models import ModuleConfiguration
 
         cfg = ModuleConfiguration.get_or_default(self.name, DEFAULT_CONFIG)
         self.__load_config(cfg)
+        PayrollConfig.config_version = self.__get_cached_config_version()
+        PayrollConfig._config_checked_at = time.monotonic()
         self.__register_filters_and_payment_methods()
+        self.__connect_configuration_change(ModuleConfiguration)
+
+    @classmethod
+    def refresh_if_stale(cls):
+        """
+        Reload the configuration if its version in the cache changed since this process loaded it. The cache is
+        checked at most once every `config_refresh_interval` seconds, so the call is cheap enough for the
+        boundaries between chunks and tasks. Returns True if the configuration was reloaded.
+        """
+        now = time.monotonic()
+        if now - cls._config_checked_at < (cls.config_refresh_interval or 0):
+            return False
+        cls._config_checked_at = now
+        version = cls.__get_cached_config_version()
+        if version == cls.config_version:
+            return False
+        return cls.reload_config(version)
+
+    @classmethod
+    def reload_config(cls, version=None):
+        """
+        Reload the configuration of the process. While a `pinned` block runs in any thread of the process the
+        reload is postponed until the last one exits. Returns True if the configuration was reloaded.
+        """
+        from core.models import ModuleConfiguration
+        from payroll.response_cache import response_cache
+        with cls._config_lock:
+            if cls._pinned_runs:
+                cls._reload_pending = True
+                return False
+            cls._reload_pending = False
+            cls.__load_config(ModuleConfiguration.get_or_default(MODULE_NAME, DEFAULT_CONFIG))
+            cls.config_version = version if version is not None else cls.__get_cached_config_version()
+            response_cache.clear()
+        logger.info(f"Payroll configuration reloaded, version {cls.config_version}")
+        return True
+
+    @classmethod
+    @contextmanager
+    def pinned(cls):
+        """
+        Refresh a stale configuration, then keep it unchanged until the block exits, so that a task or an upload
+        runs with the same values from start to end, also in its worker threads. Yields whether the configuration
+        was reloaded on entry. Can be used as a decorator.
+        """
+        reloaded = cls.refresh_if_stale()
+        with cls._config_lock:
+            cls._pinned_runs += 1
+        try:
+            yield reloaded
+        finally:
+            with cls._config_lock:
+                cls._pinned_runs -= 1
+                reload_pending = cls._reload_pending and not cls._pinned_runs
+            if reload_pending:
+                cls.reload_config()
+
+    @classmethod
+    def bump_config_version(cls):
+        """
+        Mark the configuration of all processes as stale.
+        """
+        from django.core.cache import cache
+        try:
+            return cache.incr(CONFIG_VERSION_CACHE_KEY)
+        except ValueError:
+            cache.set(CONFIG_VERSION_CACHE_KEY, 1, timeout=None)
+            return 1
+
+    @staticmethod
+    def __get_cached_config_version():
+        from django.core.cache import cache
+        return cache.get(CONFIG_VERSION_CACHE_KEY, 0)
 
     @classmethod
     def __load_config(cls, cfg):
@@ -127,8 +266,33 @@ class PayrollConfig(AppConfig):
             ]
         )
 
+    @staticmethod
+    def __connect_configuration_change(module_configuration_model):
+        from django.db.models.signals import post_delete, post_save
+        post_save.connect(on_module_configuration_change, sender=module_configuration_model,
+                          dispatch_uid='payroll_configuration_post_save')
+        post_delete.connect(on_module_configuration_change, sender=module_configuration_model,
+                            dispatch_uid='payroll_configuration_post_delete')
+
     @staticmethod
     def get_payroll_payment_file_path(payroll_id, file_name=None):
         if file_name:
             return f"csv_reconciliation/payroll_{payroll_id}/{file_name}"
         return f"csv_reconciliation/payroll_{payroll_id}"
+
+    @staticmethod
+    def get_payment_cycle_export_file_path(payment_cycle_id, file_name=None):
+        if file_name:
+            return f"payment_cycle_export/payment_cycle_{payment_cycle_id}/{file_name}"
+        return f"payment_cycle_export/payment_cycle_{payment_cycle_id}"
+
+
+def on_module_configuration_change(sender, instance, **kwargs):
+    """
+    Once the change of the payroll configuration is committed, bump its version so that the other processes reload
+    it on their next `refresh_if_stale` and reload it in this process, right away unless a pinned block is running.
+    """
+    if instance.module != MODULE_NAME:
+        return
+    from django.db import transaction
+    transaction.on_commit(lambda: PayrollConfig.reload_config(PayrollConfig.bump_config_version()))
@@ -3,9 +3,15 @@ from django.conf import settings
 
 is_unit_test_env = getattr(settings, 'IS_UNIT_TEST_ENV', False)
 
+# INDEXING_SELECT_RELATED of the documents lists the relations joined by the reindex_payroll_documents command,
+# so that nested objects are not lazy loaded per document. LEGACY_INDEX_NAMES are the indices replaced by a mapping
+# change, they are removed by the command with --delete-legacy-indices once the new index is loaded
+
 # Check if the 'opensearch_reports' app is in INSTALLED_APPS
 if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
     from opensearch_reports.service import BaseSyncDocument
+    from payroll.apps import PayrollConfig
+    from payroll.opensearch_sync import DeferredSyncDocumentMixin
     from django_opensearch_dsl import fields as opensearch_fields
     from django_opensearch_dsl.registries import registry
     from payroll.models import (
@@ -20,8 +26,9 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
     from invoice.models import Bill
 
     @registry.register_document
-    class PayrollDocument(BaseSyncDocument):
+    class PayrollDocument(DeferredSyncDocumentMixin, BaseSyncDocument):
         DASHBOARD_NAME = 'Payment'
+        INDEXING_SELECT_RELATED = ('payment_plan', 'payment_cycle')
 
         name = opensearch_fields.KeywordField()
         status = opensearch_fields.KeywordField()
@@ -62,18 +69,25 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
 
 
     @registry.register_document
-    class BenefitConsumptionDocument(BaseSyncDocument):
+    class BenefitConsumptionDocument(DeferredSyncDocumentMixin, BaseSyncDocument):
         DASHBOARD_NAME = 'Payment'
+        INDEXING_SELECT_RELATED = ('individual',)
+        LEGACY_INDEX_NAMES = ('benefit_consumption',)
 
-        photo = opensearch_fields.KeywordField()
+        # photo can hold a base64 image, only its presence is indexed
+        has_photo = opensearch_fields.BooleanField()
         code = opensearch_fields.KeywordField()
         date_due = opensearch_fields.DateField()
         date_created = opensearch_fields.DateField()
         receipt = opensearch_fields.KeywordField()
-        amount = opensearch_fields.KeywordField()
+        amount = opensearch_fields.ScaledFloatField(scaling_factor=100)
         type = opensearch_fields.KeywordField()
         status = opensearch_fields.KeywordField()
-        json_ext = opensearch_fields.ObjectField()
+        # not dynamic, so no indexing path can add fields to the mapping; whitelisted keys without a declared
+        # property are only kept in _source
+        json_ext = opensearch_fields.ObjectField(dynamic=False, properties={
+            'gateway_reconciliation_success': opensearch_fields.BooleanField(),
+        })
         individual = opensearch_fields.ObjectField(properties={
             'first_name': opensearch_fields.KeywordField(),
             'last_name': opensearch_fields.KeywordField(),
@@ -81,7 +95,7 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
         })
 
         class Index:
-            name = 'benefit_consumption'
+            name = 'benefit_consumption_v2'
             settings = {
                 'number_of_shards': 1,
                 'number_of_replicas': 0
@@ -100,11 +114,22 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
             if isinstance(related_instance, Individual):
                 return BenefitConsumption.objects.filter(individual=related_instance)
 
+        def prepare_has_photo(self, instance):
+            return bool(instance.photo)
+
+        def prepare_json_ext(self, instance):
+            json_ext = instance.json_ext or {}
+            return {key: json_ext[key] for key in PayrollConfig.opensearch_benefit_json_ext_keys if key in json_ext}
+
 
     @registry.register_document
-    class PayrollBenefitConsumptionDocument(BaseSyncDocument):
+    class PayrollBenefitConsumptionDocument(DeferredSyncDocumentMixin, BaseSyncDocument):
         DASHBOARD_NAME = 'Payment'
+        INDEXING_SELECT_RELATED = ('payroll__payment_plan', 'payroll__payment_cycle', 'benefit__individual')
+        LEGACY_INDEX_NAMES = ('payroll_benefit_consumption',)
 
+        # presence of the benefit photo, the photo itself is not indexed
+        has_photo = opensearch_fields.BooleanField()
         payroll = opensearch_fields.ObjectField(properties={
             'name': opensearch_fields.KeywordField(),
             'status': opensearch_fields.KeywordField(),
@@ -126,8 +151,7 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
             'status': opensearch_fields.KeywordField(),
             'type': opensearch_fields.KeywordField(),
             'receipt': opensearch_fields.KeywordField(),
-            'amount': opensearch_fields.KeywordField(),
-            'photo': opensearch_fields.KeywordField(),
+            'amount': opensearch_fields.ScaledFloatField(scaling_factor=100),
             'date_due': opensearch_fields.DateField(),
             'individual': opensearch_fields.ObjectField(properties={
               'first_name': opensearch_fields.KeywordField(),
@@ -137,7 +161,7 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
         })
 
         class Index:
-            name = 'payroll_benefit_consumption'
+            name = 'payroll_benefit_consumption_v2'
             settings = {
                 'number_of_shards': 1,
                 'number_of_replicas': 0
@@ -158,10 +182,15 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
             elif isinstance(related_instance, BenefitConsumption):
                 return PayrollBenefitConsumption.objects.filter(benefit=related_instance)
 
+        def prepare_has_photo(self, instance):
+            return bool(instance.benefit.photo)
+
 
     @registry.register_document
-    class BenefitAttachmentDocument(BaseSyncDocument):
+    class BenefitAttachmentDocument(DeferredSyncDocumentMixin, BaseSyncDocument):
         DASHBOARD_NAME = 'Invoice'
+        INDEXING_SELECT_RELATED = ('bill', 'benefit__individual')
+        LEGACY_INDEX_NAMES = ('benefit_attachment',)
 
         bill = opensearch_fields.ObjectField(properties={
             'code': opensearch_fields.KeywordField(),
@@ -181,8 +210,7 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
             'status': opensearch_fields.KeywordField(),
             'type': opensearch_fields.KeywordField(),
             'receipt': opensearch_fields.KeywordField(),
-            'amount': opensearch_fields.KeywordField(),
-            'photo': opensearch_fields.KeywordField(),
+            'amount': opensearch_fields.ScaledFloatField(scaling_factor=100),
             'date_due': opensearch_fields.DateField(),
             'individual': opensearch_fields.ObjectField(properties={
                 'first_name': opensearch_fields.KeywordField(),
@@ -208,7 +236,7 @@ if 'opensearch_reports' in apps.app_configs and not is_unit_test_env:
         })
 
         class Index:
-            name = 'benefit_attachment'
+            name = 'benefit_attachment_v2'
             settings = {
                 'number_of_shards': 1,
                 'number_of_replicas': 0
@@ -0,0 +1,104 @@
+import threading
+from collections import Counter
+
+from core import datetime
+from payroll.apps import PayrollConfig
+
+# upper bounds in milliseconds of the latency histogram buckets, slower requests fall into the `+Inf` bucket
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.period_start = datetime.datetime.now()
+        self.request_count = 0
+        self.error_count = 0
+        self.retry_count = 0
+        self.status_counts = Counter()
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_sum_ms = 0.0
+        self.latency_max_ms = 0.0
+
+    def record(self, duration_ms, status, retries=0):
+        self.request_count += 1
+        self.retry_count += retries
+        self.status_counts[str(status)] += 1
+        if not (isinstance(status, int) and 200 <= status < 300):
+            self.error_count += 1
+        self.bucket_counts[self._bucket_index(duration_ms)] += 1
+        self.latency_sum_ms += duration_ms
+        self.latency_max_ms = max(self.latency_max_ms, duration_ms)
+
+    def percentile(self, quantile):
+        """
+        Upper bound of the bucket containing the quantile, the maximum latency for the last bucket.
+        """
+        if not self.request_count:
+            return None
+        threshold = quantile * self.request_count
+        cumulative = 0
+        for index, count in enumerate(self.bucket_counts):
+            cumulative += count
+            if cumulative >= threshold:
+                if index < len(LATENCY_BUCKETS_MS):
+                    return float(min(LATENCY_BUCKETS_MS[index], self.latency_max_ms))
+                break
+        return self.latency_max_ms
+
+    def to_model(self, gateway, endpoint):
+        from payroll.models import PaymentGatewayStats
+        bucket_names = [str(bound) for bound in LATENCY_BUCKETS_MS] + ['+Inf']
+        return PaymentGatewayStats(
+            gateway=gateway,
+            endpoint=endpoint,
+            period_start=self.period_start,
+            period_end=datetime.datetime.now(),
+            request_count=self.request_count,
+            error_count=self.error_count,
+            retry_count=self.retry_count,
+            status_counts=dict(self.status_counts),
+            latency_buckets=dict(zip(bucket_names, self.bucket_counts)),
+            latency_sum_ms=round(self.latency_sum_ms, 3),
+            latency_max_ms=round(self.latency_max_ms, 3),
+            latency_p50_ms=self.percentile(0.5),
+            latency_p95_ms=self.percentile(0.95),
+            latency_p99_ms=self.percentile(0.99),
+        )
+
+    @staticmethod
+    def _bucket_index(duration_ms):
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if duration_ms <= bound:
+                return index
+        return len(LATENCY_BUCKETS_MS)
+
+
+class GatewayMetricsRegistry:
+    """
+    In-process metrics of the payment gateway requests per gateway and endpoint. Recording only updates
+    counters in memory, the gateway tasks flush them as PaymentGatewayStats rows once their run is over.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def record(self, gateway, endpoint, duration, status, retries=0):
+        with self._lock:
+            metrics = self._metrics.get((gateway, endpoint))
+            if metrics is None:
+                metrics = self._metrics[(gateway, endpoint)] = EndpointMetrics()
+            metrics.record(duration * 1000, status, retries)
+
+    def flush(self):
+        """
+        Save the collected metrics and start a new period. Returns the saved PaymentGatewayStats.
+        """
+        from payroll.models import PaymentGatewayStats
+        with self._lock:
+            collected, self._metrics = self._metrics, {}
+        stats = [metrics.to_model(gateway, endpoint) for (gateway, endpoint), metrics in collected.items()]
+        return PaymentGatewayStats.objects.bulk_create(stats, batch_size=PayrollConfig.bulk_create_batch_size)
+
+
+registry = GatewayMetricsRegistry()
@@ -238,8 +238,7 @@ class MakePaymentForPayrollMutation(BaseHistoryModelDeleteMutationMixin, BaseMut
 
     @classmethod
     def _mutate(cls, user, **data):
-        if "client_mutation_id" in data:
-            data.pop('client_mutation_id')
+        client_mutation_id = data.pop('client_mutation_id', None)
         if "client_mutation_label" in data:
             data.pop('client_mutation_label')
 
@@ -247,8 +246,12 @@ class MakePaymentForPayrollMutation(BaseHistoryModelDeleteMutationMixin, BaseMut
         ids = data.get('ids')
         if ids:
             with transaction.atomic():
-                for id in ids:
-                    service.make_payment_for_payroll({'id': id})
+                service.make_payment_for_payrolls(ids, client_mutation_id)
+                if client_mutation_id:
+                    for payroll in Payroll.objects.filter(id__in=ids):
+                        PayrollMutation.object_mutated(
+                            user, client_mutation_id=client_mutation_id, payroll=payroll
+                        )
 
     class Input(DeletePayrollInputType):
         pass
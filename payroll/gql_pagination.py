@@ -0,0 +1,110 @@
+import hashlib
+from gettext import gettext as _
+
+import graphene
+from django.core.cache import cache
+from django.db.models import Q, Subquery
+from graphene.relay import PageInfo
+from graphene_django.utils import maybe_queryset
+from graphql import GraphQLError
+from graphql_relay.utils import base64, unbase64
+
+from core.schema import OrderedDjangoFilterConnectionField
+from payroll.apps import PayrollConfig
+
+
+class KeysetOrderedDjangoFilterConnectionField(OrderedDjangoFilterConnectionField):
+    """
+    OrderedDjangoFilterConnectionField with an opt-in keyset pagination mode, enabled with `keyset: true`.
+
+    In keyset mode the results are always ordered by (date_created, id), `orderBy` is rejected, and the `after`/`before` cursors point to the last
+    seen row instead of an offset, so a page deep into a large result set costs the same as the first one.
+    `totalCount` is cached for `PayrollConfig.keyset_total_count_cache_ttl` seconds instead of being counted
+    on every page (0 disables the cache). Cursors of both modes are not interchangeable.
+    """
+    KEYSET_ORDERING = ('date_created', 'id')
+    KEYSET_CURSOR_PREFIX = 'keyset:'
+    KEYSET_DEFAULT_PAGE_SIZE = 100
+    TOTAL_COUNT_CACHE_PREFIX = 'payroll_keyset_count_'
+
+    def __init__(self, type_, *args, **kwargs):
+        kwargs.setdefault('keyset', graphene.Boolean())
+        super().__init__(type_, *args, **kwargs)
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        if not args.get('keyset'):
+            return super().resolve_connection(connection, args, iterable, max_limit=max_limit)
+
+        if args.get('orderBy'):
+            raise GraphQLError(_("orderBy is not supported with keyset pagination, pages are ordered by dateCreated"))
+
+        queryset = maybe_queryset(iterable)
+        first = args.get('first')
+        last = args.get('last')
+        after = args.get('after')
+        before = args.get('before')
+        backward = last is not None and first is None
+
+        page_size = (last if backward else first) or max_limit or cls.KEYSET_DEFAULT_PAGE_SIZE
+        if max_limit:
+            page_size = min(page_size, max_limit)
+
+        page_queryset = queryset.order_by(*cls.KEYSET_ORDERING)
+        if after:
+            page_queryset = page_queryset.filter(cls._keyset_filter(queryset.model, after, 'gt'))
+        if before:
+            page_queryset = page_queryset.filter(cls._keyset_filter(queryset.model, before, 'lt'))
+        if backward:
+            page_queryset = page_queryset.reverse()
+
+        # one extra row tells whether there is another page without counting
+        page = list(page_queryset[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if backward:
+            page.reverse()
+
+        edges = [connection.Edge(node=node, cursor=cls._encode_cursor(node)) for node in page]
+        page_info = PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_more if backward else bool(after),
+            has_next_page=bool(before) if backward else has_more,
+        )
+        result = connection(edges=edges, page_info=page_info)
+        result.iterable = queryset
+        result.length = cls._get_total_count(queryset)
+        return result
+
+    @classmethod
+    def _encode_cursor(cls, node):
+        return base64(f"{cls.KEYSET_CURSOR_PREFIX}{node.pk}")
+
+    @classmethod
+    def _decode_cursor(cls, cursor):
+        value = unbase64(cursor)
+        if not value.startswith(cls.KEYSET_CURSOR_PREFIX):
+            raise ValueError("Invalid keyset cursor")
+        return value[len(cls.KEYSET_CURSOR_PREFIX):]
+
+    @classmethod
+    def _keyset_filter(cls, model, cursor, lookup):
+        # the key of the cursor row is resolved by the database, so the cursor only needs to carry the primary key
+        pk = cls._decode_cursor(cursor)
+        cursor_date_created = Subquery(model.objects.filter(pk=pk).values('date_created')[:1])
+        return Q(**{f'date_created__{lookup}': cursor_date_created}) \
+            | Q(date_created=cursor_date_created, **{f'pk__{lookup}': pk})
+
+    @classmethod
+    def _get_total_count(cls, queryset):
+        ttl = PayrollConfig.keyset_total_count_cache_ttl
+        if not ttl:
+            return queryset.count()
+        query_hash = hashlib.md5(str(queryset.order_by().query).encode('utf-8')).hexdigest()
+        cache_key = f"{cls.TOTAL_COUNT_CACHE_PREFIX}{query_hash}"
+        total_count = cache.get(cache_key)
+        if total_count is None:
+            total_count = queryset.count()
+            cache.set(cache_key, total_count, ttl)
+        return total_count
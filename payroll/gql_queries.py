@@ -9,7 +9,7 @@ from invoice.gql.gql_types.bill_types import BillGQLType
 from location.gql_queries import LocationGQLType
 from individual.gql_queries import IndividualGQLType
 from payroll.models import PaymentPoint, Payroll, BenefitConsumption, \
-    PayrollBenefitConsumption, BenefitAttachment, CsvReconciliationUpload
+    PayrollBenefitConsumption, BenefitAttachment, CsvReconciliationUpload, PaymentGatewayStats, PayrollAggregate
 from contribution_plan.gql import PaymentPlanGQLType
 from payment_cycle.gql_queries import PaymentCycleGQLType
 from social_protection.models import BenefitPlan
@@ -93,6 +93,10 @@ class PayrollGQLType(DjangoObjectType):
     uuid = graphene.String(source='uuid')
     benefit_consumption = graphene.List(BenefitConsumptionGQLType)
     benefit_plan_name_code = graphene.String()
+    benefits_count = graphene.Int()
+    benefits_total_amount = graphene.String()
+    benefits_reconciled_amount = graphene.String()
+    benefits_status_summary = graphene.JSONString()
 
     class Meta:
         model = Payroll
@@ -124,11 +128,58 @@ class PayrollGQLType(DjangoObjectType):
         benefit_plan = BenefitPlan.objects.get(id=self.payment_plan.benefit_plan.id, is_deleted=False)
         return f"{benefit_plan.code} - {benefit_plan.name}"
 
+    def resolve_benefits_count(self, info):
+        return _get_payroll_aggregate(self).total_count
+
+    def resolve_benefits_total_amount(self, info):
+        return _get_payroll_aggregate(self).total_amount
+
+    def resolve_benefits_reconciled_amount(self, info):
+        return _get_payroll_aggregate(self).reconciled_amount
+
+    def resolve_benefits_status_summary(self, info):
+        return _get_payroll_aggregate(self).status_summary
+
+
+def _get_payroll_aggregate(payroll):
+    """
+    Aggregate of the payroll, selected with the payroll list. A missing row reads as empty until the
+    rebuild_payroll_aggregates command fills it, resolvers never write.
+    """
+    try:
+        return payroll.aggregate
+    except PayrollAggregate.DoesNotExist:
+        return PayrollAggregate(payroll_id=payroll.id)
+
 
 class PaymentMethodGQLType(graphene.ObjectType):
     name = graphene.String()
 
 
+class PaymentGatewayStatsGQLType(DjangoObjectType):
+    uuid = graphene.String(source='id')
+    average_latency_ms = graphene.Float()
+    error_rate = graphene.Float()
+
+    class Meta:
+        model = PaymentGatewayStats
+        interfaces = (graphene.relay.Node,)
+        filter_fields = {
+            "id": ["exact"],
+            "gateway": ["exact", "iexact", "istartswith", "icontains"],
+            "endpoint": ["exact", "iexact", "istartswith", "icontains"],
+            "period_start": ["exact", "lt", "lte", "gt", "gte"],
+            "period_end": ["exact", "lt", "lte", "gt", "gte"],
+        }
+        connection_class = ExtendedConnection
+
+    def resolve_average_latency_ms(self, info):
+        return self.latency_sum_ms / self.request_count if self.request_count else None
+
+    def resolve_error_rate(self, info):
+        return self.error_count / self.request_count if self.request_count else None
+
+
 class PaymentGatewayConfigGQLType(graphene.ObjectType):
     base_url = graphene.String()
     api_key = graphene.String()
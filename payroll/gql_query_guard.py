@@ -0,0 +1,115 @@
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection
+from graphene.utils.str_converters import to_camel_case
+
+from payroll.apps import PayrollConfig
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_payroll_query_fields = None
+
+
+class FieldQueryCounts:
+    """
+    SQL queries and resolver calls per GraphQL field, keyed by `<ParentType>.<field>`.
+    """
+
+    def __init__(self):
+        self.queries = defaultdict(int)
+        self.calls = defaultdict(int)
+
+    def add(self, field, queries):
+        self.queries[field] += queries
+        self.calls[field] += 1
+
+    def scaling_fields(self, other):
+        """
+        Fields running more queries in `other`, e.g. the counts of the same query with a larger page.
+        """
+        return {
+            field: (self.queries.get(field, 0), queries)
+            for field, queries in other.queries.items()
+            if queries > self.queries.get(field, 0)
+        }
+
+
+@contextmanager
+def collect_field_query_counts():
+    """
+    Collect the queries of the payroll fields resolved in the block by QueryCountGuardMiddleware, also when
+    `gql_query_guard_enabled` is off.
+    """
+    previous = getattr(_state, 'collector', None)
+    _state.collector = FieldQueryCounts()
+    try:
+        yield _state.collector
+    finally:
+        _state.collector = previous
+
+
+class QueryCountGuardMiddleware:
+    """
+    Graphene middleware counting the SQL queries run by every resolver of the payroll schema, opt-in with
+    `gql_query_guard_enabled` (add `payroll.gql_query_guard.QueryCountGuardMiddleware` to GRAPHENE['MIDDLEWARE']).
+    A field whose queries within one request exceed `gql_query_guard_threshold` is logged once per request.
+    Lists are resolved by the resolver of their field, nested fields are counted separately, so a field called
+    once per row of a page shows up with as many calls as rows.
+    """
+
+    def resolve(self, next, root, info, **args):
+        collector = getattr(_state, 'collector', None)
+        if not (PayrollConfig.gql_query_guard_enabled or collector is not None) or not _is_payroll_field(info):
+            return next(root, info, **args)
+
+        field = f"{info.parent_type.name}.{info.field_name}"
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            result = next(root, info, **args)
+
+        if collector is not None:
+            collector.add(field, len(queries))
+        if PayrollConfig.gql_query_guard_enabled:
+            self._check_threshold(info.context, field, len(queries))
+        return result
+
+    def _check_threshold(self, context, field, queries):
+        request_counts = getattr(context, '_payroll_field_query_counts', None)
+        if request_counts is None:
+            request_counts = FieldQueryCounts()
+            try:
+                setattr(context, '_payroll_field_query_counts', request_counts)
+            except AttributeError:
+                pass
+        previous = request_counts.queries[field]
+        request_counts.add(field, queries)
+        threshold = PayrollConfig.gql_query_guard_threshold
+        if previous <= threshold < request_counts.queries[field]:
+            logger.warning(
+                f"GraphQL field {field} ran more than {threshold} queries in one request "
+                f"({request_counts.queries[field]} queries in {request_counts.calls[field]} calls so far)"
+            )
+
+
+def _is_payroll_field(info):
+    graphene_type = getattr(info.parent_type, 'graphene_type', None)
+    if graphene_type is not None and graphene_type.__module__.startswith('payroll.'):
+        return True
+    return info.parent_type.name == 'Query' and info.field_name in _get_payroll_query_fields()
+
+
+def _get_payroll_query_fields():
+    global _payroll_query_fields
+    if _payroll_query_fields is None:
+        from payroll.schema import Query
+        _payroll_query_fields = {to_camel_case(name) for name in Query._meta.fields}
+    return _payroll_query_fields
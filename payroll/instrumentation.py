@@ -0,0 +1,144 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from payroll.apps import PayrollConfig
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsBackend:
+    """
+    Receiver of the stage and gateway request measurements, the base class only logs them.
+    """
+
+    def observe_stage(self, stage, duration, status, strategy=None, rows=None):
+        pass
+
+    def observe_gateway_request(self, gateway, endpoint, duration, status):
+        pass
+
+
+class PrometheusMetricsBackend(MetricsBackend):
+    """
+    Histograms of stage and gateway request durations, from which throughput and tail latencies are queried.
+    Payroll ids are only part of the logs, as label values they would create a time series per payroll.
+    """
+
+    def __init__(self):
+        from prometheus_client import Counter, Histogram
+        self.stage_duration = Histogram(
+            'payroll_stage_duration_seconds', 'Duration of payroll lifecycle stages',
+            ['stage', 'strategy', 'status'],
+        )
+        self.stage_rows = Counter(
+            'payroll_stage_rows_total', 'Rows processed by payroll lifecycle stages', ['stage', 'strategy'],
+        )
+        self.gateway_duration = Histogram(
+            'payroll_gateway_request_duration_seconds', 'Duration of payment gateway requests',
+            ['gateway', 'endpoint', 'status'],
+        )
+
+    def observe_stage(self, stage, duration, status, strategy=None, rows=None):
+        self.stage_duration.labels(stage, strategy or '', status).observe(duration)
+        if rows:
+            self.stage_rows.labels(stage, strategy or '').inc(rows)
+
+    def observe_gateway_request(self, gateway, endpoint, duration, status):
+        self.gateway_duration.labels(gateway, endpoint, str(status)).observe(duration)
+
+
+class StatsdMetricsBackend(MetricsBackend):
+
+    def __init__(self):
+        from statsd import StatsClient
+        self.client = StatsClient(
+            PayrollConfig.instrumentation_statsd_host,
+            PayrollConfig.instrumentation_statsd_port,
+            prefix=PayrollConfig.instrumentation_statsd_prefix,
+        )
+
+    def observe_stage(self, stage, duration, status, strategy=None, rows=None):
+        metric = f"stage.{stage}.{strategy}" if strategy else f"stage.{stage}"
+        self.client.timing(f"{metric}.{status}", duration * 1000)
+        if rows:
+            self.client.incr(f"{metric}.rows", rows)
+
+    def observe_gateway_request(self, gateway, endpoint, duration, status):
+        metric = f"gateway.{gateway}.{endpoint.strip('/').replace('/', '_')}"
+        self.client.timing(metric, duration * 1000)
+        self.client.incr(f"{metric}.{status}")
+
+
+METRICS_BACKENDS = {
+    'prometheus': PrometheusMetricsBackend,
+    'statsd': StatsdMetricsBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_metrics_backend():
+    """
+    Backend selected by `instrumentation_metrics_backend`, created once per process. Falls back to logs only
+    when the client library of the backend is not installed.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_class = METRICS_BACKENDS.get(PayrollConfig.instrumentation_metrics_backend, MetricsBackend)
+                try:
+                    _backend = backend_class()
+                except ImportError as exc:
+                    logger.warning(f"Payroll metrics backend {backend_class.__name__} not available: {exc}")
+                    _backend = MetricsBackend()
+    return _backend
+
+
+@contextmanager
+def timed_stage(stage, payroll=None, strategy=None, **tags):
+    """
+    Time the block and log it as a structured `payroll_timing` record tagged with the payroll id, the strategy
+    and the other tags. The block can add tags to the yielded dict, e.g. `rows` once the number of processed
+    rows is known, which adds `rows_per_second` to the record.
+    """
+    if payroll is not None:
+        tags['payroll_id'] = str(getattr(payroll, 'id', payroll))
+    if strategy is not None:
+        tags['strategy'] = strategy if isinstance(strategy, str) else strategy.__name__
+    status = 'success'
+    start = time.perf_counter()
+    try:
+        yield tags
+    except Exception:
+        status = 'error'
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        rows = tags.get('rows')
+        record = {'stage': stage, 'status': status, 'duration_seconds': round(duration, 6), **tags}
+        if rows and duration > 0:
+            record['rows_per_second'] = round(rows / duration, 2)
+        logger.info(json.dumps(record, default=str), extra={'payroll_timing': record})
+        try:
+            get_metrics_backend().observe_stage(stage, duration, status, tags.get('strategy'), rows)
+        except Exception as exc:
+            logger.debug(f"Failed to record payroll stage metrics: {exc}")
+
+
+def observe_gateway_request(gateway, endpoint, duration, status):
+    """
+    Record a payment gateway request, `status` is the HTTP status code or `error` when no response was received.
+    """
+    logger.debug(json.dumps({
+        'stage': 'gateway_request', 'gateway': gateway, 'endpoint': endpoint,
+        'status': status, 'duration_seconds': round(duration, 6),
+    }))
+    try:
+        get_metrics_backend().observe_gateway_request(gateway, endpoint, duration, status)
+    except Exception as exc:
+        logger.debug(f"Failed to record payment gateway metrics: {exc}")
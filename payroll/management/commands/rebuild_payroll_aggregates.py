@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from payroll.models import Payroll
+from payroll.services import PayrollAggregateService
+
+
+class Command(BaseCommand):
+    help = "Recompute PayrollAggregate rows from scratch from the benefits attached to the payrolls."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--payroll',
+            action='append',
+            dest='payroll_ids',
+            help="Id of the payroll to rebuild, can be repeated. All payrolls are rebuilt by default.",
+        )
+
+    def handle(self, *args, **options):
+        payroll_ids = options.get('payroll_ids')
+        payrolls = Payroll.objects.filter(is_deleted=False)
+        if payroll_ids:
+            payrolls = payrolls.filter(id__in=payroll_ids)
+
+        rebuilt = 0
+        for payroll_id in payrolls.values_list('id', flat=True).iterator():
+            PayrollAggregateService.rebuild(payroll_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt aggregates of {rebuilt} payroll(s)."))
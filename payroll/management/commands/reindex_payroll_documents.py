@@ -0,0 +1,143 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Reindex the payroll opensearch documents with parallel bulk workers. The rows of every document are split "
+        "into id range shards, each shard is indexed by a worker thread. Index refresh is disabled and replicas "
+        "are dropped during the load and both settings are restored at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            help="Name of the payroll model to reindex (e.g. BenefitConsumption), can be repeated. "
+                 "All payroll documents are reindexed by default.",
+        )
+        parser.add_argument('--workers', type=int, default=4, help="Number of parallel bulk workers.")
+        parser.add_argument('--shard-size', type=int, default=100000, help="Number of rows of one id range shard.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Number of documents of one bulk request.")
+        parser.add_argument(
+            '--delete-legacy-indices',
+            action='store_true',
+            help="Delete the indices listed in LEGACY_INDEX_NAMES of a document once it was reindexed without errors.",
+        )
+
+    def handle(self, *args, **options):
+        if 'opensearch_reports' not in apps.app_configs:
+            raise CommandError("opensearch_reports module is not installed.")
+
+        for document_class in self._get_documents(options.get('models')):
+            failed = self._reindex_document(
+                document_class, options['workers'], options['shard_size'], options['chunk_size'])
+            if options['delete_legacy_indices'] and not failed:
+                self._delete_legacy_indices(document_class)
+
+    def _get_documents(self, models):
+        from django_opensearch_dsl.registries import registry
+        documents = [
+            document_class for document_class in registry.get_documents()
+            if document_class.Django.model._meta.app_label == 'payroll'
+            and (not models or document_class.Django.model.__name__ in models)
+        ]
+        if not documents:
+            raise CommandError(f"No payroll documents registered for models: {models}")
+        return sorted(documents, key=lambda document_class: document_class.__name__)
+
+    def _reindex_document(self, document_class, workers, shard_size, chunk_size):
+        document = document_class()
+        index_name = document._index._name
+        client = document._get_connection()
+        if not document._index.exists():
+            document._index.create()
+        shards = self._get_shards(document, shard_size)
+        self.stdout.write(f"Reindexing {index_name} in {len(shards)} shard(s) with {workers} worker(s).")
+
+        original_settings = self._disable_refresh_and_replicas(client, index_name)
+        indexed, failed = 0, 0
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(self._index_shard, document_class, lower, upper, chunk_size)
+                    for lower, upper in shards
+                ]
+                for future in as_completed(futures):
+                    shard_indexed, shard_failed = future.result()
+                    indexed += shard_indexed
+                    failed += shard_failed
+        finally:
+            self._restore_settings(client, index_name, original_settings)
+
+        message = f"{index_name}: indexed {indexed} document(s), {failed} failed."
+        self.stdout.write(self.style.SUCCESS(message) if not failed else self.style.WARNING(message))
+        return failed
+
+    def _delete_legacy_indices(self, document_class):
+        client = document_class()._get_connection()
+        for index_name in getattr(document_class, 'LEGACY_INDEX_NAMES', ()):
+            if client.indices.exists(index=index_name):
+                client.indices.delete(index=index_name)
+                self.stdout.write(f"Deleted legacy index {index_name}.")
+
+    def _get_queryset(self, document):
+        return document.get_queryset().select_related(*getattr(document, 'INDEXING_SELECT_RELATED', ()))
+
+    def _get_shards(self, document, shard_size):
+        """
+        Shard boundaries are taken in a single pass over the ordered primary keys, so the ranges are correct
+        for any database ordering of the ids. The last shard has no upper bound.
+        """
+        boundaries = []
+        ids = document.get_queryset().order_by('pk').values_list('pk', flat=True)
+        for position, pk in enumerate(ids.iterator(chunk_size=shard_size)):
+            if position % shard_size == 0:
+                boundaries.append(pk)
+        return [
+            (lower, boundaries[index + 1] if index + 1 < len(boundaries) else None)
+            for index, lower in enumerate(boundaries)
+        ]
+
+    def _index_shard(self, document_class, lower, upper, chunk_size):
+        from opensearchpy.helpers import bulk
+        document = document_class()
+        try:
+            queryset = self._get_queryset(document).filter(pk__gte=lower).order_by('pk')
+            if upper is not None:
+                queryset = queryset.filter(pk__lt=upper)
+            indexed, errors = bulk(
+                client=document._get_connection(),
+                actions=document._get_actions(queryset.iterator(chunk_size=chunk_size), 'index'),
+                chunk_size=chunk_size,
+                refresh=False,
+                raise_on_error=False,
+            )
+            for error in errors:
+                logger.error(f"Failed to index {document_class.__name__} document: {error}")
+            return indexed, len(errors)
+        finally:
+            # every worker thread opens its own database connection
+            connection.close()
+
+    def _disable_refresh_and_replicas(self, client, index_name):
+        index_settings = client.indices.get_settings(index=index_name)[index_name]['settings']['index']
+        original_settings = {
+            'refresh_interval': index_settings.get('refresh_interval', '1s'),
+            'number_of_replicas': index_settings.get('number_of_replicas', 0),
+        }
+        client.indices.put_settings(index=index_name, body={
+            'index': {'refresh_interval': '-1', 'number_of_replicas': 0}
+        })
+        return original_settings
+
+    def _restore_settings(self, client, index_name, original_settings):
+        client.indices.put_settings(index=index_name, body={'index': original_settings})
+        client.indices.refresh(index=index_name)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import User
+from payroll.services import PayrollService
+
+
+class Command(BaseCommand):
+    help = "Dispatch the failed chunks of the background generation of payrolls again."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--payroll',
+            action='append',
+            dest='payroll_ids',
+            required=True,
+            help="Id of the payroll whose failed chunks are retried, can be repeated.",
+        )
+        parser.add_argument(
+            '--username',
+            required=True,
+            help="Username of the user generating the benefits.",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if not user:
+            raise CommandError(f"User {options['username']} not found.")
+
+        service = PayrollService(user)
+        for payroll_id in options['payroll_ids']:
+            retried = service.retry_failed_generation_chunks(payroll_id)
+            self.stdout.write(self.style.SUCCESS(f"Dispatched {retried} failed chunk(s) of payroll {payroll_id}."))
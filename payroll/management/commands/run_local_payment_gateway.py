@@ -0,0 +1,61 @@
+import asyncio
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.apps import PayrollConfig
+from payroll.payment_gateway.local_gateway_server import LatencyDistribution, LocalPaymentGatewayServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local payment gateway simulator answering the payment and reconciliation endpoints of the "
+        "configuration, with configurable latency, error, timeout, rejection and throttling behaviour. Point "
+        "gateway_base_url to the printed url to load test the connectors without network access."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8070)
+        parser.add_argument(
+            '--latency',
+            default='fixed:0',
+            help="Latency distribution in seconds: fixed:<s>, uniform:<min>,<max>, normal:<mean>,<stddev> "
+                 "or lognormal:<mean>,<stddev>.",
+        )
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with 500.")
+        parser.add_argument('--timeout-rate', type=float, default=0.0, help="Share of requests never answered.")
+        parser.add_argument('--timeout-delay', type=float, default=30.0,
+                            help="Seconds after which an unanswered connection is closed.")
+        parser.add_argument('--rejection-rate', type=float, default=0.0, help="Share of rejected payments.")
+        parser.add_argument('--rate-limit', type=int, default=None,
+                            help="Requests per second above which 429 is returned.")
+        parser.add_argument('--seed', type=int, default=None, help="Seed of the random outcomes.")
+
+    def handle(self, *args, **options):
+        try:
+            latency = LatencyDistribution.parse(options['latency'], seed=options['seed'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        server = LocalPaymentGatewayServer(
+            endpoint_payment=PayrollConfig.endpoint_payment,
+            endpoint_reconciliation=PayrollConfig.endpoint_reconciliation,
+            base_path=urlsplit(PayrollConfig.gateway_base_url).path,
+            latency=latency,
+            error_rate=options['error_rate'],
+            timeout_rate=options['timeout_rate'],
+            timeout_delay=options['timeout_delay'],
+            rejection_rate=options['rejection_rate'],
+            rate_limit=options['rate_limit'],
+            seed=options['seed'],
+        )
+
+        async def serve():
+            await server.start(options['host'], options['port'])
+            self.stdout.write(f"Local payment gateway listening on {server.base_url}")
+            await server.serve_forever()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            self.stdout.write(f"Stopped, requests by outcome: {dict(server.stats)}")
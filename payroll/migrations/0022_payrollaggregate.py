@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2024-08-05 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0021_auto_20240715_0855'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollAggregate',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status_summary', models.JSONField(blank=True, default=dict)),
+                ('total_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('reconciled_amount', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('payroll', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, related_name='aggregate', to='payroll.payroll')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
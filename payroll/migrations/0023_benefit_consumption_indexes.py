@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2024-08-06 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0022_payrollaggregate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='benefitconsumption',
+            index=models.Index(fields=['code'], name='payroll_bc_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='benefitconsumption',
+            index=models.Index(fields=['receipt'], name='payroll_bc_receipt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='benefitconsumption',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['status'], name='payroll_bc_active_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollbenefitconsumption',
+            index=models.Index(fields=['payroll', 'is_deleted', 'benefit'], name='payroll_pbc_payroll_benef_idx'),
+        ),
+    ]
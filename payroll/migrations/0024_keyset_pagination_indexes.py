@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2024-08-07 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0023_benefit_consumption_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='benefitconsumption',
+            index=models.Index(fields=['date_created', 'id'], name='payroll_bc_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollbenefitconsumption',
+            index=models.Index(fields=['date_created', 'id'], name='payroll_pbc_keyset_idx'),
+        ),
+    ]
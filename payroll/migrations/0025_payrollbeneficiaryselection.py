@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2024-08-08 08:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_protection', '0008_benefitplandatauploadrecords_historicalbenefitplandatauploadrecords'),
+        ('payroll', '0024_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollBeneficiarySelection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('beneficiary', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='payroll_selections', to='social_protection.beneficiary')),
+                ('payroll', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='beneficiary_selection', to='payroll.payroll')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='payrollbeneficiaryselection',
+            constraint=models.UniqueConstraint(fields=('payroll', 'beneficiary'), name='payroll_unique_beneficiary_selection'),
+        ),
+    ]
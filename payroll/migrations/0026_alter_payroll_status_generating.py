@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2024-08-12 07:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0025_payrollbeneficiaryselection'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicalpayroll',
+            name='status',
+            field=models.CharField(choices=[('GENERATING', 'GENERATING'), ('PENDING_APPROVAL', 'PENDING_APPROVAL'), ('APPROVE_FOR_PAYMENT', 'APPROVE_FOR_PAYMENT'), ('REJECTED', 'REJECTED'), ('RECONCILED', 'RECONCILED')], default='PENDING_APPROVAL', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='payroll',
+            name='status',
+            field=models.CharField(choices=[('GENERATING', 'GENERATING'), ('PENDING_APPROVAL', 'PENDING_APPROVAL'), ('APPROVE_FOR_PAYMENT', 'APPROVE_FOR_PAYMENT'), ('REJECTED', 'REJECTED'), ('RECONCILED', 'RECONCILED')], default='PENDING_APPROVAL', max_length=100),
+        ),
+    ]
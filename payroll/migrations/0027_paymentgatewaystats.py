@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2024-08-20 09:30
+
+from django.db import migrations, models
+import core.fields
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0026_alter_payroll_status_generating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentGatewayStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('gateway', models.CharField(max_length=255)),
+                ('endpoint', models.CharField(max_length=255)),
+                ('period_start', core.fields.DateTimeField()),
+                ('period_end', core.fields.DateTimeField()),
+                ('request_count', models.IntegerField(default=0)),
+                ('error_count', models.IntegerField(default=0)),
+                ('retry_count', models.IntegerField(default=0)),
+                ('status_counts', models.JSONField(blank=True, default=dict)),
+                ('latency_buckets', models.JSONField(blank=True, default=dict)),
+                ('latency_sum_ms', models.FloatField(default=0)),
+                ('latency_max_ms', models.FloatField(default=0)),
+                ('latency_p50_ms', models.FloatField(blank=True, null=True)),
+                ('latency_p95_ms', models.FloatField(blank=True, null=True)),
+                ('latency_p99_ms', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
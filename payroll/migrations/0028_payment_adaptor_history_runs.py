@@ -0,0 +1,104 @@
+# Generated by Django 3.2.25 on 2024-08-22 11:05
+
+import core.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0027_paymentgatewaystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalpaymentadaptorhistory',
+            name='accepted_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicalpaymentadaptorhistory',
+            name='date_finished',
+            field=core.fields.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalpaymentadaptorhistory',
+            name='date_started',
+            field=core.fields.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalpaymentadaptorhistory',
+            name='gateway',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalpaymentadaptorhistory',
+            name='rejected_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='historicalpaymentadaptorhistory',
+            name='requests_per_second',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalpaymentadaptorhistory',
+            name='run_type',
+            field=models.CharField(choices=[('PAYMENT', 'PAYMENT'), ('RECONCILIATION', 'RECONCILIATION')], default='PAYMENT', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='historicalpaymentadaptorhistory',
+            name='sent_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='paymentadaptorhistory',
+            name='accepted_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='paymentadaptorhistory',
+            name='date_finished',
+            field=core.fields.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentadaptorhistory',
+            name='date_started',
+            field=core.fields.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentadaptorhistory',
+            name='gateway',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentadaptorhistory',
+            name='rejected_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='paymentadaptorhistory',
+            name='requests_per_second',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentadaptorhistory',
+            name='run_type',
+            field=models.CharField(choices=[('PAYMENT', 'PAYMENT'), ('RECONCILIATION', 'RECONCILIATION')], default='PAYMENT', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='paymentadaptorhistory',
+            name='sent_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PaymentAdaptorHistoryBenefit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('accepted', models.BooleanField()),
+                ('benefit', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='payroll.benefitconsumption')),
+                ('history', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='benefits', to='payroll.paymentadaptorhistory')),
+            ],
+        ),
+    ]
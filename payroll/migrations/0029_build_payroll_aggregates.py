@@ -0,0 +1,58 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+RECONCILED = 'RECONCILED'
+BATCH_SIZE = 1000
+
+
+def build_payroll_aggregates(apps, schema_editor):
+    """
+    Create the aggregates of the payrolls existing before PayrollAggregate was introduced, the same summary as
+    PayrollAggregateService.rebuild computed with a single grouped query.
+    """
+    Payroll = apps.get_model('payroll', 'Payroll')
+    PayrollAggregate = apps.get_model('payroll', 'PayrollAggregate')
+    PayrollBenefitConsumption = apps.get_model('payroll', 'PayrollBenefitConsumption')
+
+    summaries = defaultdict(dict)
+    rows = PayrollBenefitConsumption.objects.filter(
+        is_deleted=False,
+        benefit__is_deleted=False,
+        payroll__aggregate__isnull=True,
+    ).order_by().values('payroll_id', 'benefit__status').annotate(count=Count('id'), amount=Sum('benefit__amount'))
+    for row in rows:
+        summaries[row['payroll_id']][row['benefit__status']] = {
+            'count': row['count'],
+            'amount': str(row['amount'] or Decimal(0)),
+        }
+
+    batch = []
+    payroll_ids = Payroll.objects.filter(aggregate__isnull=True).values_list('id', flat=True)
+    for payroll_id in payroll_ids.iterator():
+        status_summary = summaries.get(payroll_id, {})
+        batch.append(PayrollAggregate(
+            payroll_id=payroll_id,
+            status_summary=status_summary,
+            total_count=sum(entry['count'] for entry in status_summary.values()),
+            total_amount=sum((Decimal(entry['amount']) for entry in status_summary.values()), Decimal(0)),
+            reconciled_amount=Decimal(status_summary.get(RECONCILED, {}).get('amount', 0)),
+        ))
+        if len(batch) >= BATCH_SIZE:
+            PayrollAggregate.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        PayrollAggregate.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0028_payment_adaptor_history_runs'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_payroll_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2024-08-26 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0029_build_payroll_aggregates'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='benefitconsumption',
+            name='payroll_bc_keyset_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='payrollbenefitconsumption',
+            name='payroll_pbc_keyset_idx',
+        ),
+        migrations.AddIndex(
+            model_name='benefitconsumption',
+            index=models.Index(fields=['is_deleted', 'date_created', 'id'], name='payroll_bc_active_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollbenefitconsumption',
+            index=models.Index(fields=['payroll', 'date_created', 'id'], name='payroll_pbc_payroll_keyset_idx'),
+        ),
+    ]
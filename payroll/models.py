@@ -1,17 +1,19 @@
 from django.db import models
+from django.db.models import Q
 from django.utils.translation import gettext as _
 
 from core.models import HistoryModel, HistoryBusinessModel, User, UUIDModel, ObjectMutation, MutationLog
-from core.fields import DateField
+from core.fields import DateField, DateTimeField
 from invoice.models import Bill
 from location.models import Location
-from social_protection.models import BenefitPlan
+from social_protection.models import BenefitPlan, Beneficiary
 from payment_cycle.models import PaymentCycle
 from contribution_plan.models import PaymentPlan
 from individual.models import Individual
 
 
 class PayrollStatus(models.TextChoices):
+    GENERATING = "GENERATING", _("GENERATING")
     PENDING_APPROVAL = "PENDING_APPROVAL", _("PENDING_APPROVAL")
     APPROVE_FOR_PAYMENT = "APPROVE_FOR_PAYMENT", _("APPROVE_FOR_PAYMENT")
     REJECTED = "REJECTED", _("REJECTED")
@@ -55,9 +57,41 @@ class PayrollBill(HistoryModel):
 
 
 class PaymentAdaptorHistory(HistoryModel):
+    class RunType(models.TextChoices):
+        PAYMENT = "PAYMENT", _("PAYMENT")
+        RECONCILIATION = "RECONCILIATION", _("RECONCILIATION")
+
     payroll = models.ForeignKey(Payroll, on_delete=models.DO_NOTHING)
     total_amount = models.CharField(max_length=255, blank=True, null=True)
+    # left empty by the gateway runs, the benefits sent are stored in PaymentAdaptorHistoryBenefit
     bills_ids = models.JSONField()
+    run_type = models.CharField(max_length=100, choices=RunType.choices, default=RunType.PAYMENT)
+    gateway = models.CharField(max_length=255, blank=True, null=True)
+    date_started = DateTimeField(blank=True, null=True)
+    date_finished = DateTimeField(blank=True, null=True)
+    sent_count = models.IntegerField(default=0)
+    accepted_count = models.IntegerField(default=0)
+    rejected_count = models.IntegerField(default=0)
+    requests_per_second = models.FloatField(blank=True, null=True)
+
+
+class PaymentGatewayStats(UUIDModel):
+    # gateway request metrics of one endpoint collected by a process between two flushes of the registry,
+    # written once and never edited, so without history
+    gateway = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=255)
+    period_start = DateTimeField()
+    period_end = DateTimeField()
+    request_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    retry_count = models.IntegerField(default=0)
+    status_counts = models.JSONField(blank=True, default=dict)
+    latency_buckets = models.JSONField(blank=True, default=dict)
+    latency_sum_ms = models.FloatField(default=0)
+    latency_max_ms = models.FloatField(default=0)
+    latency_p50_ms = models.FloatField(null=True, blank=True)
+    latency_p95_ms = models.FloatField(null=True, blank=True)
+    latency_p99_ms = models.FloatField(null=True, blank=True)
 
 
 class BenefitConsumption(HistoryBusinessModel):
@@ -72,6 +106,16 @@ class BenefitConsumption(HistoryBusinessModel):
         max_length=100, choices=BenefitConsumptionStatus.choices, default=BenefitConsumptionStatus.ACCEPTED, null=False
     )
 
+    class Meta:
+        indexes = [
+            # CSV reconciliation and receipt generation look benefits up by code and receipt
+            models.Index(fields=['code'], name='payroll_bc_code_idx'),
+            models.Index(fields=['receipt'], name='payroll_bc_receipt_idx'),
+            models.Index(fields=['status'], name='payroll_bc_active_status_idx', condition=Q(is_deleted=False)),
+            # keyset pagination order of the non deleted benefits
+            models.Index(fields=['is_deleted', 'date_created', 'id'], name='payroll_bc_active_keyset_idx'),
+        ]
+
     def __str__(self):
         return f"Benefit Consumption {self.code} - {self.receipt} - {self.amount}"
 
@@ -86,6 +130,14 @@ class PayrollBenefitConsumption(HistoryModel):
     payroll = models.ForeignKey(Payroll, on_delete=models.DO_NOTHING)
     benefit = models.ForeignKey(BenefitConsumption, on_delete=models.DO_NOTHING)
 
+    class Meta:
+        indexes = [
+            # benefits of a payroll are always resolved through this join with is_deleted=False
+            models.Index(fields=['payroll', 'is_deleted', 'benefit'], name='payroll_pbc_payroll_benef_idx'),
+            # keyset pagination order within a payroll
+            models.Index(fields=['payroll', 'date_created', 'id'], name='payroll_pbc_payroll_keyset_idx'),
+        ]
+
 
 class CsvReconciliationUpload(HistoryModel):
     class Status(models.TextChoices):
@@ -106,3 +158,34 @@ class PayrollMutation(UUIDModel, ObjectMutation):
     payroll = models.ForeignKey(Payroll, models.DO_NOTHING, related_name='mutations')
     mutation = models.ForeignKey(
         MutationLog, models.DO_NOTHING, related_name='payroll')
+
+
+class PayrollAggregate(UUIDModel):
+    # 1:1 materialized summary of the benefits attached to a payroll, maintained by PayrollAggregateService
+    payroll = models.OneToOneField(Payroll, models.DO_NOTHING, related_name='aggregate')
+    status_summary = models.JSONField(blank=True, default=dict)
+    total_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    reconciled_amount = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    date_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Payroll Aggregate {self.payroll_id} - {self.total_count} - {self.total_amount}"
+
+
+class PaymentAdaptorHistoryBenefit(models.Model):
+    # benefits sent to the gateway in a payment adaptor run and the answer of the gateway
+    history = models.ForeignKey(PaymentAdaptorHistory, models.DO_NOTHING, related_name='benefits')
+    benefit = models.ForeignKey(BenefitConsumption, models.DO_NOTHING, related_name='+')
+    accepted = models.BooleanField()
+
+
+class PayrollBeneficiarySelection(models.Model):
+    # beneficiaries selected by the payroll criteria, resolved once when the payroll is created
+    payroll = models.ForeignKey(Payroll, models.DO_NOTHING, related_name='beneficiary_selection')
+    beneficiary = models.ForeignKey(Beneficiary, models.DO_NOTHING, related_name='payroll_selections')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['payroll', 'beneficiary'], name='payroll_unique_beneficiary_selection'),
+        ]
@@ -0,0 +1,87 @@
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import models, transaction
+
+from payroll.apps import PayrollConfig
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+@contextmanager
+def deferred_document_sync():
+    """
+    Collect opensearch document updates of payroll models made inside the block and index them in bulk by a
+    Celery task once the transaction commits, instead of indexing every saved instance inline.
+    Nested blocks share the buffer of the outermost one. Can be used as a decorator.
+    """
+    if not PayrollConfig.opensearch_deferred_sync or getattr(_state, 'buffer', None) is not None:
+        yield
+        return
+
+    _state.buffer = defaultdict(set)
+    try:
+        yield
+    finally:
+        buffer = _state.buffer
+        _state.buffer = None
+        _schedule_flush(buffer)
+
+
+def defer_document_update(model, thing):
+    """
+    Add the ids of `thing` (an instance, a queryset or an iterable of instances) to the buffer of the current
+    deferred block. Returns False if there is no such block and the update has to be done inline.
+    """
+    buffer = getattr(_state, 'buffer', None)
+    if buffer is None:
+        return False
+    if isinstance(thing, models.Model):
+        ids = [thing.pk]
+    elif isinstance(thing, models.QuerySet):
+        ids = thing.values_list('pk', flat=True)
+    else:
+        ids = [instance.pk for instance in thing]
+    buffer[model._meta.label].update(str(pk) for pk in ids)
+    return True
+
+
+def sync_documents(model_label, ids):
+    from django_opensearch_dsl.registries import registry
+    model = apps.get_model(model_label)
+    for document_class in registry.get_documents(models=[model]):
+        document = document_class()
+        queryset = document.get_queryset() \
+            .select_related(*getattr(document, 'INDEXING_SELECT_RELATED', ())) \
+            .filter(pk__in=ids)
+        document.update(queryset, 'index', refresh=False)
+
+
+def _schedule_flush(buffer):
+    from payroll.tasks import sync_deferred_documents
+    batch_size = PayrollConfig.opensearch_sync_batch_size
+    for model_label, ids in buffer.items():
+        ids = sorted(ids)
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            transaction.on_commit(
+                lambda model_label=model_label, batch=batch: sync_deferred_documents.delay(model_label, batch)
+            )
+
+
+class DeferredSyncDocumentMixin:
+    """
+    Document mixin buffering index updates made inside `deferred_document_sync`. Deletions are always
+    done inline, as the instances no longer exist when the buffer is flushed.
+    """
+
+    def update(self, thing, *args, **kwargs):
+        action = args[0] if args else kwargs.get('action', 'index')
+        if action == 'index' and defer_document_update(self.Django.model, thing):
+            return None
+        return super().update(thing, *args, **kwargs)
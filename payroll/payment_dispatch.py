@@ -0,0 +1,137 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from payroll.apps import PayrollConfig
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket allowing `rate` acquisitions per second, with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PaymentDispatcher:
+    """
+    Pool of gateway workers shared by all payrolls of a payment batch. Calls are limited to
+    `payment_gateway_rate_limit` per second across all workers. Only gateway requests are run in the workers,
+    database writes stay in the calling thread.
+    """
+
+    def __init__(self, max_workers=None, rate=None):
+        max_workers = max_workers or PayrollConfig.payment_gateway_max_workers
+        rate = rate if rate is not None else PayrollConfig.payment_gateway_rate_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='payment-gateway')
+        self._bucket = TokenBucket(rate) if rate else None
+
+    def update_rate(self, rate):
+        """
+        Apply a reloaded `payment_gateway_rate_limit`, the size of the pool is kept.
+        """
+        self._bucket = TokenBucket(rate) if rate else None
+
+    def map(self, function, items):
+        """
+        Call `function` for every item in the pool and return the results in the order of the items.
+        A failing call results in False.
+        """
+        return list(self._executor.map(lambda item: self._call(function, item), items))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _call(self, function, item):
+        bucket = self._bucket
+        if bucket:
+            bucket.acquire()
+        try:
+            return function(item)
+        except Exception as exc:
+            logger.error(f"Payment gateway call failed for {item}", exc_info=exc)
+            return False
+
+
+class PaymentDispatchProgress:
+    """
+    Aggregate progress of a payment batch, reported in `client_mutation_details` of the mutation log
+    under the `payment_dispatch` key.
+    """
+    IN_PROGRESS = 'IN_PROGRESS'
+    COMPLETED = 'COMPLETED'
+
+    def __init__(self, client_mutation_id, total_payrolls):
+        self.client_mutation_id = client_mutation_id
+        self.progress = {
+            'status': self.IN_PROGRESS,
+            'total_payrolls': total_payrolls,
+            'processed_payrolls': 0,
+            'failed_payrolls': 0,
+            'sent_payments': 0,
+            'accepted_payments': 0,
+            'rejected_payments': 0,
+        }
+        self._save()
+
+    def payroll_processed(self, result=None):
+        self.progress['processed_payrolls'] += 1
+        for key in ('sent_payments', 'accepted_payments', 'rejected_payments'):
+            self.progress[key] += (result or {}).get(key, 0)
+        self._save()
+
+    def payroll_failed(self):
+        self.progress['processed_payrolls'] += 1
+        self.progress['failed_payrolls'] += 1
+        self._save()
+
+    def complete(self):
+        self.progress['status'] = self.COMPLETED
+        self._save()
+
+    def _save(self):
+        if not self.client_mutation_id:
+            return
+        from core.models import MutationLog
+        mutation_log = MutationLog.objects.filter(client_mutation_id=self.client_mutation_id).first()
+        if not mutation_log:
+            return
+        MutationLog.objects.filter(id=mutation_log.id).update(
+            client_mutation_details=json.dumps(self._merge_details(mutation_log.client_mutation_details))
+        )
+
+    def _merge_details(self, client_mutation_details):
+        try:
+            details = json.loads(client_mutation_details) if client_mutation_details else {}
+        except (TypeError, ValueError):
+            details = client_mutation_details
+        if not isinstance(details, dict):
+            details = {'details': details}
+        return {**details, 'payment_dispatch': self.progress}
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyDistribution:
+    """
+    Response delay of the simulated gateway in seconds. `kind` is one of `fixed` (always `mean`), `uniform`
+    (between `minimum` and `maximum`), `normal` or `lognormal` (with `mean` and `stddev`). Samples are clipped
+    to [minimum, maximum].
+    """
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal')
+
+    def __init__(self, kind='fixed', mean=0.0, stddev=0.0, minimum=0.0, maximum=None, seed=None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind}, expected one of {self.KINDS}")
+        if kind == 'uniform' and maximum is None:
+            raise ValueError("uniform latency distribution requires a maximum")
+        if kind == 'lognormal' and mean <= 0:
+            raise ValueError("lognormal latency distribution requires a positive mean")
+        self.kind = kind
+        self.mean = mean
+        self.stddev = stddev
+        self.minimum = minimum
+        self.maximum = maximum
+        self._random = random.Random(seed)
+
+    @classmethod
+    def parse(cls, value, seed=None):
+        """
+        Build the distribution from `<kind>:<parameters>`, e.g. `fixed:0.05`, `uniform:0.01,0.2`,
+        `normal:0.05,0.01` or `lognormal:0.05,0.02`.
+        """
+        kind, _, parameters = value.partition(':')
+        numbers = [float(number) for number in parameters.split(',') if number.strip()]
+        if kind == 'uniform':
+            if len(numbers) != 2:
+                raise ValueError("uniform latency expects minimum and maximum, e.g. uniform:0.01,0.2")
+            return cls(kind, minimum=numbers[0], maximum=numbers[1], seed=seed)
+        if kind in ('normal', 'lognormal'):
+            if len(numbers) != 2:
+                raise ValueError(f"{kind} latency expects mean and stddev, e.g. {kind}:0.05,0.01")
+            return cls(kind, mean=numbers[0], stddev=numbers[1], seed=seed)
+        return cls(kind, mean=numbers[0] if numbers else 0.0, seed=seed)
+
+    def sample(self):
+        if self.kind == 'fixed':
+            delay = self.mean
+        elif self.kind == 'uniform':
+            delay = self._random.uniform(self.minimum, self.maximum)
+        elif self.kind == 'normal':
+            delay = self._random.gauss(self.mean, self.stddev)
+        else:
+            # parameters of the underlying normal distribution giving the requested mean and stddev
+            sigma_squared = math.log(1 + (self.stddev / self.mean) ** 2)
+            delay = self._random.lognormvariate(math.log(self.mean) - sigma_squared / 2, math.sqrt(sigma_squared))
+        delay = max(self.minimum, delay)
+        return min(self.maximum, delay) if self.maximum is not None else delay
+
+
+class LocalPaymentGatewayServer:
+    """
+    Asyncio HTTP server simulating a payment gateway, answering like the remote mock expected by
+    `MockedPaymentGatewayConnector`, so connectors can be load tested without network access.
+
+    Every POST to the payment or reconciliation endpoint is delayed by a sample of `latency`. Of the requests
+    `timeout_rate` are never answered (the connection is closed after `timeout_delay` seconds), `error_rate`
+    are answered with 500 and `rejection_rate` of the payments are rejected. Above `rate_limit` requests per
+    second the server answers with 429. `<endpoint>/batch` accepts a JSON list of `{invoiceId, amount}` and
+    answers with a JSON list of `{invoiceId, amount, accepted}`.
+    """
+    PAYMENT = 'payment'
+    RECONCILIATION = 'reconciliation'
+    BATCH_SUFFIX = '/batch'
+
+    def __init__(self, endpoint_payment='mock/payment', endpoint_reconciliation='mock/reconciliation',
+                 base_path='/api/mobile/v1/', latency=None, error_rate=0.0, timeout_rate=0.0, timeout_delay=30.0,
+                 rejection_rate=0.0, rate_limit=None, seed=None):
+        self.base_path = f"/{base_path.strip('/')}/" if base_path.strip('/') else '/'
+        self.latency = latency or LatencyDistribution(seed=seed)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_delay = timeout_delay
+        self.rejection_rate = rejection_rate
+        self.rate_limit = rate_limit
+        self.stats = Counter()
+        self.host = None
+        self.port = None
+        self._routes = {}
+        for kind, endpoint in ((self.PAYMENT, endpoint_payment), (self.RECONCILIATION, endpoint_reconciliation)):
+            path = f"{self.base_path}{endpoint.strip('/')}"
+            self._routes[path] = (kind, False)
+            self._routes[f"{path}{self.BATCH_SUFFIX}"] = (kind, True)
+        self._random = random.Random(seed)
+        self._window_start = 0.0
+        self._window_requests = 0
+        self._server = None
+        self._connections = set()
+        self._loop = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}{self.base_path}"
+
+    async def start(self, host='127.0.0.1', port=0):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        logger.info(f"Local payment gateway listening on {self.base_url}")
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        """
+        Run the server in a daemon thread with its own event loop. Returns once the server accepts connections.
+        """
+        started = threading.Event()
+        errors = []
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.start(host, port))
+            except Exception as exc:
+                errors.append(exc)
+                started.set()
+                return
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._shutdown())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name='local-payment-gateway', daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop(self):
+        if self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+            self._loop = None
+
+    def __enter__(self):
+        return self.start_in_thread() if not self._thread else self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    async def _shutdown(self):
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                response = await self._dispatch(method, path, body)
+                if response is None:
+                    break
+                writer.write(response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # connection cancelled by the shutdown of the server
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        method, target, version = request_line.decode('latin-1').split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        body = await reader.readexactly(length) if length else b''
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        return method, urlsplit(target).path, body, keep_alive
+
+    async def _dispatch(self, method, path, body):
+        self.stats['requests'] += 1
+        route = self._routes.get(path.rstrip('/'))
+        if method != 'POST' or route is None:
+            return self._response(HTTPStatus.NOT_FOUND, 'Not Found')
+        if self._is_throttled():
+            return self._response(HTTPStatus.TOO_MANY_REQUESTS, 'Too Many Requests', headers={'Retry-After': '1'})
+
+        roll = self._random.random()
+        if roll < self.timeout_rate:
+            self.stats['timeouts'] += 1
+            await asyncio.sleep(self.timeout_delay)
+            return None
+        await asyncio.sleep(self.latency.sample())
+        if roll < self.timeout_rate + self.error_rate:
+            return self._response(HTTPStatus.INTERNAL_SERVER_ERROR, 'Internal Server Error')
+
+        kind, batch = route
+        try:
+            payload = json.loads(body or b'null')
+            if batch:
+                items = payload if isinstance(payload, list) else None
+                if items is None:
+                    raise ValueError("batch payload must be a list")
+                return self._response(HTTPStatus.OK, json.dumps([self._process(kind, item) for item in items]),
+                                      content_type='application/json')
+            result = self._process(kind, payload)
+        except (ValueError, TypeError, AttributeError) as exc:
+            return self._response(HTTPStatus.BAD_REQUEST, str(exc))
+        return self._response(HTTPStatus.OK, self._get_message(kind, result))
+
+    def _process(self, kind, item):
+        accepted = self._random.random() >= self.rejection_rate
+        self.stats[f'{kind}_{"accepted" if accepted else "rejected"}'] += 1
+        return {'invoiceId': item['invoiceId'], 'amount': item['amount'], 'accepted': accepted}
+
+    def _get_message(self, kind, result):
+        if kind == self.RECONCILIATION:
+            return 'true' if result['accepted'] else 'false'
+        outcome = 'accepted to be paid' if result['accepted'] else 'rejected'
+        return f"{result['invoiceId']} invoice of {result['amount']} {outcome}"
+
+    def _is_throttled(self):
+        """
+        Fixed one second window allowing `rate_limit` requests.
+        """
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 1:
+            self._window_start = now
+            self._window_requests = 0
+        self._window_requests += 1
+        return self._window_requests > self.rate_limit
+
+    def _response(self, status, text, content_type='text/plain', headers=None):
+        self.stats[int(status)] += 1
+        body = text.encode('utf-8')
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            *(f"{name}: {value}" for name, value in (headers or {}).items()),
+        ]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
@@ -5,6 +5,7 @@ from payroll.apps import PayrollConfig
 
 class PaymentGatewayConfig:
     def __init__(self):
+        PayrollConfig.refresh_if_stale()
         self.gateway_base_url = PayrollConfig.gateway_base_url
         self.endpoint_payment = PayrollConfig.endpoint_payment
         self.endpoint_reconciliation = PayrollConfig.endpoint_reconciliation
@@ -12,6 +13,8 @@ class PaymentGatewayConfig:
         self.basic_auth_username = PayrollConfig.payment_gateway_basic_auth_username
         self.basic_auth_password = PayrollConfig.payment_gateway_basic_auth_password
         self.timeout = PayrollConfig.payment_gateway_timeout
+        self.retries = PayrollConfig.payment_gateway_retries or 0
+        self.retry_backoff = PayrollConfig.payment_gateway_retry_backoff or 0
         self.auth_type = PayrollConfig.payment_gateway_auth_type
 
     def get_headers(self):
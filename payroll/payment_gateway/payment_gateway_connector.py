@@ -1,5 +1,11 @@
 import logging
+import threading
+import time
+
 import requests
+
+from payroll.gateway_metrics import registry as gateway_metrics
+from payroll.instrumentation import observe_gateway_request
 from payroll.payment_gateway.payment_gateway_config import PaymentGatewayConfig
 
 logger = logging.getLogger(__name__)
@@ -8,18 +14,58 @@ logger = logging.getLogger(__name__)
 class PaymentGatewayConnector:
     def __init__(self):
         self.config = PaymentGatewayConfig()
-        self.session = requests.Session()
-        self.session.headers.update(self.config.get_headers())
+        # the connector is shared by the PaymentDispatcher workers and requests.Session is not thread safe,
+        # so every thread keeps its own session and connection pool
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.config.get_headers())
+            self._local.session = session
+        return session
 
     def send_request(self, endpoint, payload):
+        """
+        POST the payload to the endpoint. Connection errors, 429 and 5xx responses are retried up to
+        `payment_gateway_retries` times with exponential backoff (or the Retry-After of a 429).
+        """
         url = f'{self.config.gateway_base_url}{endpoint}'
+        retries = 0
+        start = time.perf_counter()
+        while True:
+            response, status, error = self._post(url, payload)
+            if error is None or retries >= self.config.retries or not self._is_retryable(status):
+                break
+            retries += 1
+            time.sleep(self._get_retry_delay(retries, response))
+        duration = time.perf_counter() - start
+        observe_gateway_request(type(self).__name__, endpoint, duration, status)
+        gateway_metrics.record(type(self).__name__, endpoint, duration, status, retries)
+        if error is not None:
+            logger.error(f"Request failed: {error}")
+            return None
+        return response
+
+    def _post(self, url, payload):
+        response = None
         try:
-            response = self.session.post(url, json=payload)
+            response = self.session.post(url, json=payload, timeout=self.config.timeout)
             response.raise_for_status()
-            return response
+            return response, response.status_code, None
         except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed: {e}")
-            return None
+            return response, response.status_code if response is not None else 'error', e
+
+    def _is_retryable(self, status):
+        return status == 'error' or status == 429 or status >= 500
+
+    def _get_retry_delay(self, retries, response):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+        return self.config.retry_backoff * 2 ** (retries - 1)
 
     def send_payment(self, invoice_id, amount, **kwargs):
         pass
@@ -0,0 +1,32 @@
+import threading
+
+from payroll.apps import PayrollConfig
+
+
+class ConfigurationResponseCache:
+    """
+    Process level cache of GraphQL responses depending only on the deployment, i.e. on the registered payment
+    methods and the payroll module configuration. Cleared when the configuration is reloaded.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get_or_set(self, key, factory):
+        PayrollConfig.refresh_if_stale()
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        value = factory()
+        with self._lock:
+            return self._values.setdefault(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+response_cache = ConfigurationResponseCache()
+
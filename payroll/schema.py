@@ -14,15 +14,18 @@ from payroll.apps import PayrollConfig
 from payroll.gql_mutations import CreatePaymentPointMutation, UpdatePaymentPointMutation, DeletePaymentPointMutation, \
     CreatePayrollMutation, DeletePayrollMutation, ClosePayrollMutation, \
     RejectPayrollMutation, MakePaymentForPayrollMutation, DeleteBenefitConsumptionMutation
+from payroll.gql_pagination import KeysetOrderedDjangoFilterConnectionField
 from payroll.gql_queries import BenefitConsumptionGQLType, PaymentPointGQLType, \
     PayrollGQLType, PaymentMethodGQLType, \
     PaymentMethodListGQLType, BenefitAttachmentListGQLType, \
     CsvReconciliationUploadGQLType, PayrollBenefitConsumptionGQLType, \
-    PaymentGatewayConfigGQLType, BenefitsSummaryGQLType
+    PaymentGatewayConfigGQLType, BenefitsSummaryGQLType, PaymentGatewayStatsGQLType
 from payroll.models import PaymentPoint, Payroll, \
     BenefitConsumption, BenefitAttachment, \
-    CsvReconciliationUpload, PayrollBenefitConsumption, BenefitConsumptionStatus
+    CsvReconciliationUpload, PayrollBenefitConsumption, BenefitConsumptionStatus, PaymentGatewayStats
 from payroll.payments_registry import PaymentMethodStorage
+from payroll.response_cache import response_cache
+from payroll.services import PayrollAggregateService
 from social_protection.models import BenefitPlan
 
 
@@ -68,7 +71,12 @@ class Query(graphene.ObjectType):
         PaymentGatewayConfigGQLType,
     )
 
-    benefit_consumption_by_payroll = OrderedDjangoFilterConnectionField(
+    payment_gateway_stats = OrderedDjangoFilterConnectionField(
+        PaymentGatewayStatsGQLType,
+        orderBy=graphene.List(of_type=graphene.String),
+    )
+
+    benefit_consumption_by_payroll = KeysetOrderedDjangoFilterConnectionField(
         BenefitConsumptionGQLType,
         orderBy=graphene.List(of_type=graphene.String),
         dateValidFrom__Gte=graphene.DateTime(),
@@ -94,7 +102,7 @@ class Query(graphene.ObjectType):
         orderBy=graphene.List(of_type=graphene.String),
     )
 
-    payroll_benefit_consumption = OrderedDjangoFilterConnectionField(
+    payroll_benefit_consumption = KeysetOrderedDjangoFilterConnectionField(
         PayrollBenefitConsumptionGQLType,
         orderBy=graphene.List(of_type=graphene.String),
         dateValidFrom__Gte=graphene.DateTime(),
@@ -194,7 +202,7 @@ class Query(graphene.ObjectType):
             wait_for_mutation(client_mutation_id)
             filters.append(Q(mutations__mutation__client_mutation_id=client_mutation_id))
 
-        query = Payroll.objects.filter(*filters)
+        query = Payroll.objects.filter(*filters).select_related('aggregate')
         return gql_optimizer.query(query, info)
 
     def resolve_payroll_benefit_consumption(self, info, **kwargs):
@@ -239,16 +247,21 @@ class Query(graphene.ObjectType):
         if type(user) is AnonymousUser or not user.id:
             raise PermissionError("Unauthorized")
 
-        payment_methods = PaymentMethodStorage.get_all_available_payment_methods()
-        gql_payment_methods = Query._build_payment_method_options(payment_methods)
-        return PaymentMethodListGQLType(gql_payment_methods)
+        return response_cache.get_or_set('payment_methods', lambda: PaymentMethodListGQLType(
+            Query._build_payment_method_options(PaymentMethodStorage.get_all_available_payment_methods())
+        ))
 
     def resolve_payment_gateway_config(self, info):
-        return PaymentGatewayConfigGQLType(
-            base_url=PayrollConfig.payment_gateway_base_url,
+        return response_cache.get_or_set('payment_gateway_config', lambda: PaymentGatewayConfigGQLType(
+            base_url=PayrollConfig.gateway_base_url,
             api_key=PayrollConfig.payment_gateway_api_key,
             timeout=PayrollConfig.payment_gateway_timeout,
-        )
+        ))
+
+    def resolve_payment_gateway_stats(self, info, **kwargs):
+        Query._check_permissions(info.context.user, PayrollConfig.gql_payroll_search_perms)
+        query = PaymentGatewayStats.objects.all()
+        return gql_optimizer.query(query, info)
 
     def resolve_csv_reconciliation_upload(self, info, **kwargs):
         Query._check_permissions(info.context.user, PayrollConfig.gql_csv_reconciliation_search_perms)
@@ -266,6 +279,13 @@ class Query(graphene.ObjectType):
         benefit_plan_uuid = kwargs.get("benefitPlanUuid", None)
         payment_cycle_uuid = kwargs.get("paymentCycleUuid", None)
 
+        if payroll_id and not (filters or individual_id or benefit_plan_uuid or payment_cycle_uuid):
+            aggregate = PayrollAggregateService.get_for_payroll(payroll_id)
+            return BenefitsSummaryGQLType(
+                total_amount_received=aggregate.reconciled_amount,
+                total_amount_due=aggregate.total_amount - aggregate.reconciled_amount,
+            )
+
         if individual_id:
             filters.append(Q(individual__id=individual_id))
 
@@ -1,9 +1,18 @@
 import logging
+import tempfile
+import threading
+import zipfile
 import pandas as pd
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
 from io import BytesIO
 
 from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
 from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Now
 from django.utils.translation import gettext as _
 
 from core import datetime
@@ -11,6 +20,7 @@ from core.custom_filters import CustomFilterWizardStorage
 from core.models import InteractiveUser
 from core.services import BaseService
 from core.signals import register_service_signal
+from core.utils import DefaultStorageFileHandler
 from invoice.models import Bill, PaymentInvoice, DetailPaymentInvoice
 from invoice.services import PaymentInvoiceService
 from payment_cycle.models import PaymentCycle
@@ -18,17 +28,29 @@ from payroll.apps import PayrollConfig
 from payroll.models import (
     PaymentPoint,
     Payroll,
+    PayrollBill,
+    PayrollStatus,
+    PayrollAggregate,
+    PayrollBeneficiarySelection,
     PayrollBenefitConsumption,
     BenefitConsumption,
     BenefitAttachment,
     BenefitConsumptionStatus
 )
-from payroll.tasks import send_requests_to_gateway_payment
+from payroll.tasks import (
+    send_payments_for_payrolls,
+    generate_payroll_benefits,
+    export_payment_cycle_reconciliation
+)
 from payroll.payments_registry import PaymentMethodStorage
+from payroll.opensearch_sync import deferred_document_sync
+from payroll.instrumentation import timed_stage
 from payroll.validation import PaymentPointValidation, PayrollValidation, BenefitConsumptionValidation
 from payroll.strategies import StrategyOfPaymentInterface
+from payroll.utils import bulk_create_history_models, save_stored_file
 from calculation.services import get_calculation_object
 from core.services.utils import output_exception, check_authentication
+from core.services.utils.serviceUtils import model_representation
 from contribution_plan.models import PaymentPlan
 from social_protection.models import Beneficiary, BeneficiaryStatus
 from tasks_management.apps import TasksManagementConfig
@@ -65,6 +87,7 @@ class PayrollService(BaseService):
 
     @check_authentication
     @register_service_signal('payroll_service.create')
+    @deferred_document_sync()
     def create(self, obj_data):
         try:
             with transaction.atomic():
@@ -74,19 +97,29 @@ class PayrollService(BaseService):
                 payment_cycle = self._get_payment_cycle(obj_data)
                 date_valid_from, date_valid_to = self._get_dates_parameter(obj_data)
                 payroll, dict_representation = self._save_payroll(obj_data)
+                strategy = payroll.payment_method
                 if not bool(from_failed_invoices_payroll_id):
-                    beneficiaries_queryset = self._select_beneficiary_based_on_criteria(obj_data, payment_plan)
-                    self._generate_benefits(
-                        payment_plan,
-                        beneficiaries_queryset,
-                        date_valid_from,
-                        date_valid_to,
-                        payroll,
-                        payment_cycle
-                    )
+                    with timed_stage('payroll_create.selection', payroll, strategy) as tags:
+                        beneficiaries_queryset = self.get_beneficiary_selection(payroll, obj_data, payment_plan)
+                        tags['rows'] = payroll.json_ext['beneficiary_selection']['count']
+                    if self._is_background_generation_required(payroll):
+                        self._start_background_generation(payroll, date_valid_from, date_valid_to)
+                        return dict_representation
+                    with timed_stage('payroll_create.calculation', payroll, strategy, rows=tags['rows']), \
+                            PayrollAggregateService.collect_attached():
+                        self._generate_benefits(
+                            payment_plan,
+                            beneficiaries_queryset,
+                            date_valid_from,
+                            date_valid_to,
+                            payroll,
+                            payment_cycle
+                        )
                 else:
-                    self._move_benefit_consumptions(payroll, from_failed_invoices_payroll_id)
-                self.create_accept_payroll_task(payroll.id, obj_data)
+                    with timed_stage('payroll_create.move_benefits', payroll, strategy):
+                        self._move_benefit_consumptions(payroll, from_failed_invoices_payroll_id)
+                with timed_stage('payroll_create.task', payroll, strategy):
+                    self.create_accept_payroll_task(payroll.id, obj_data)
                 return dict_representation
         except Exception as exc:
             return output_exception(model_name=self.OBJECT_TYPE.__name__, method="create", exception=exc)
@@ -112,8 +145,33 @@ class PayrollService(BaseService):
     @check_authentication
     @register_service_signal('payroll_service.attach_benefit_to_payroll')
     def attach_benefit_to_payroll(self, payroll_id, benefit_id):
+        """
+        Called by the calculation once per generated benefit. Inside `PayrollAggregateService.collect_attached`
+        the aggregate is updated once at the end of the block instead of for every benefit.
+        """
         payroll_benefit = PayrollBenefitConsumption(payroll_id=payroll_id, benefit_id=benefit_id)
         payroll_benefit.save(username=self.user.username)
+        PayrollAggregateService.record_attached(payroll_id, [benefit_id])
+
+    @check_authentication
+    @register_service_signal('payroll_service.attach_benefits_to_payroll')
+    def attach_benefits_to_payroll(self, benefit_payroll_pairs):
+        """
+        Bulk variant of attach_benefit_to_payroll.
+
+        :param benefit_payroll_pairs: iterable of (benefit, payroll) pairs, instances or ids
+        """
+        payroll_benefits = [
+            PayrollBenefitConsumption(benefit_id=_get_id(benefit), payroll_id=_get_id(payroll))
+            for benefit, payroll in benefit_payroll_pairs
+        ]
+        bulk_create_history_models(payroll_benefits, self.user, PayrollConfig.bulk_create_batch_size)
+
+        benefit_ids_by_payroll = defaultdict(list)
+        for payroll_benefit in payroll_benefits:
+            benefit_ids_by_payroll[payroll_benefit.payroll_id].append(payroll_benefit.benefit_id)
+        for payroll_id, benefit_ids in benefit_ids_by_payroll.items():
+            PayrollAggregateService.record_attached(payroll_id, benefit_ids)
 
     @register_service_signal('payroll_service.create_task')
     def create_accept_payroll_task(self, payroll_id, obj_data):
@@ -155,8 +213,17 @@ class PayrollService(BaseService):
         })
 
     def make_payment_for_payroll(self, obj_data):
-        payroll_id = obj_data['id']
-        send_requests_to_gateway_payment.delay(payroll_id, self.user.id)
+        self.make_payment_for_payrolls([obj_data['id']])
+
+    def make_payment_for_payrolls(self, payroll_ids, client_mutation_id=None):
+        """
+        Publish a single batch job sending the payments of all payrolls once the current transaction commits,
+        so that the workers see the committed state.
+        """
+        payroll_ids = [str(payroll_id) for payroll_id in payroll_ids]
+        transaction.on_commit(
+            lambda: send_payments_for_payrolls.delay(payroll_ids, self.user.id, client_mutation_id)
+        )
 
     def _save_payroll(self, obj_data):
         obj_ = self.OBJECT_TYPE(**obj_data)
@@ -203,6 +270,155 @@ class PayrollService(BaseService):
 
         return beneficiaries_queryset
 
+    def get_beneficiary_selection(self, payroll, obj_data=None, payment_plan=None):
+        """
+        Return the beneficiaries selected for the payroll. The criteria are evaluated only once, the resolved ids
+        are stored as PayrollBeneficiarySelection rows which are reused by retries and later steps.
+        """
+        if not PayrollBeneficiarySelection.objects.filter(payroll=payroll).exists():
+            beneficiaries_queryset = self._select_beneficiary_based_on_criteria(
+                obj_data or {'json_ext': payroll.json_ext},
+                payment_plan or payroll.payment_plan,
+            )
+            self._save_beneficiary_selection(payroll, beneficiaries_queryset)
+        return Beneficiary.objects.filter(payroll_selections__payroll=payroll)
+
+    def _save_beneficiary_selection(self, payroll, beneficiaries_queryset):
+        batch_size = PayrollConfig.bulk_create_batch_size
+        selected_count = 0
+        batch = []
+        for beneficiary_id in beneficiaries_queryset.values_list('id', flat=True).iterator(chunk_size=batch_size):
+            batch.append(PayrollBeneficiarySelection(payroll=payroll, beneficiary_id=beneficiary_id))
+            if len(batch) >= batch_size:
+                PayrollBeneficiarySelection.objects.bulk_create(batch)
+                selected_count += len(batch)
+                batch = []
+        if batch:
+            PayrollBeneficiarySelection.objects.bulk_create(batch)
+            selected_count += len(batch)
+
+        json_ext = payroll.json_ext or {}
+        json_ext['beneficiary_selection'] = {
+            'count': selected_count,
+            'date': str(datetime.datetime.now()),
+        }
+        payroll.json_ext = json_ext
+        payroll.save(username=self.user.username)
+
+    def generate_benefits_for_selection_range(self, payroll, start_id, end_id, date_from, date_to):
+        """
+        Generate the benefits of the beneficiaries whose selection rows have ids in [start_id, end_id).
+        """
+        beneficiaries_queryset = Beneficiary.objects.filter(
+            payroll_selections__payroll=payroll,
+            payroll_selections__id__gte=start_id,
+            payroll_selections__id__lt=end_id,
+        )
+        with transaction.atomic(), PayrollAggregateService.collect_attached():
+            self._generate_benefits(
+                payroll.payment_plan,
+                beneficiaries_queryset,
+                date_from,
+                date_to,
+                payroll,
+                payroll.payment_cycle
+            )
+        return beneficiaries_queryset.count()
+
+    def get_generation_chunks(self, payroll):
+        """
+        Split the beneficiary selection of the payroll into [start_id, end_id) ranges of selection row ids.
+        """
+        chunk_size = PayrollConfig.payroll_generation_chunk_size
+        selection = PayrollBeneficiarySelection.objects.filter(payroll=payroll).order_by('id')
+        first_id = selection.values_list('id', flat=True).first()
+        last_id = selection.values_list('id', flat=True).last()
+        if first_id is None:
+            return []
+        return [[start_id, min(start_id + chunk_size, last_id + 1)]
+                for start_id in range(first_id, last_id + 1, chunk_size)]
+
+    @transaction.atomic
+    def complete_generation_chunk(self, payroll_id, chunk, processed_beneficiaries, failed=False):
+        payroll = Payroll.objects.select_for_update().get(id=payroll_id)
+        json_ext = payroll.json_ext or {}
+        generation = json_ext.get('generation', {})
+        generation['processed_beneficiaries'] = generation.get('processed_beneficiaries', 0) + processed_beneficiaries
+        if failed:
+            generation['failed_chunks'] = [*generation.get('failed_chunks', []), chunk]
+        else:
+            generation['completed_chunks'] = generation.get('completed_chunks', 0) + 1
+
+        finished = generation['completed_chunks'] + len(generation.get('failed_chunks', [])) \
+            >= generation['total_chunks']
+        if finished:
+            generation['date_finished'] = str(datetime.datetime.now())
+            if generation.get('failed_chunks'):
+                generation['status'] = 'FAILED'
+            else:
+                generation['status'] = 'COMPLETED'
+                payroll.status = generation.get('requested_status', PayrollStatus.PENDING_APPROVAL)
+
+        json_ext['generation'] = generation
+        payroll.json_ext = json_ext
+        payroll.save(username=self.user.username)
+        if finished and generation['status'] == 'COMPLETED':
+            self.create_accept_payroll_task(payroll.id, model_representation(payroll))
+
+    def retry_failed_generation_chunks(self, payroll_id, date_from=None, date_to=None):
+        """
+        Dispatch the failed chunks of a background generation again, by default with the validity dates of the
+        original generation. Returns the number of dispatched chunks.
+        """
+        with transaction.atomic():
+            payroll = Payroll.objects.select_for_update().get(id=payroll_id)
+            generation = (payroll.json_ext or {}).get('generation', {})
+            failed_chunks = generation.get('failed_chunks', [])
+            if not failed_chunks:
+                return 0
+            date_from = str(date_from) if date_from else generation.get('date_valid_from')
+            date_to = str(date_to) if date_to else generation.get('date_valid_to')
+            generation['failed_chunks'] = []
+            generation['status'] = 'IN_PROGRESS'
+            payroll.json_ext['generation'] = generation
+            payroll.save(username=self.user.username)
+            transaction.on_commit(
+                lambda: generate_payroll_benefits.delay(payroll.id, self.user.id, failed_chunks, date_from, date_to)
+            )
+        return len(failed_chunks)
+
+    def _is_background_generation_required(self, payroll):
+        threshold = PayrollConfig.payroll_background_generation_threshold
+        if threshold is None:
+            return False
+        return payroll.json_ext['beneficiary_selection']['count'] > threshold
+
+    def _start_background_generation(self, payroll, date_from, date_to):
+        chunks = self.get_generation_chunks(payroll)
+        date_from = str(date_from) if date_from else None
+        date_to = str(date_to) if date_to else None
+        json_ext = payroll.json_ext or {}
+        json_ext['generation'] = {
+            'status': 'IN_PROGRESS',
+            'requested_status': payroll.status,
+            'total_chunks': len(chunks),
+            'completed_chunks': 0,
+            'failed_chunks': [],
+            'total_beneficiaries': json_ext['beneficiary_selection']['count'],
+            'processed_beneficiaries': 0,
+            'date_started': str(datetime.datetime.now()),
+            'date_valid_from': date_from,
+            'date_valid_to': date_to,
+        }
+        payroll.json_ext = json_ext
+        payroll.status = PayrollStatus.GENERATING
+        payroll.save(username=self.user.username)
+        # the chunks only apply deltas, the row has to exist before they run in parallel
+        PayrollAggregateService.rebuild(payroll.id)
+        transaction.on_commit(
+            lambda: generate_payroll_benefits.delay(payroll.id, self.user.id, chunks, date_from, date_to)
+        )
+
     def _generate_benefits(self, payment_plan, beneficiaries_queryset, date_from, date_to, payroll, payment_cycle):
         calculation = get_calculation_object(payment_plan.calculation)
         calculation.calculate_if_active_for_object(
@@ -216,13 +432,45 @@ class PayrollService(BaseService):
 
     @transaction.atomic
     def _move_benefit_consumptions(self, payroll, from_payroll_id):
+        """
+        Move the unpaid benefits of the source payroll to the new one. The selection is a subquery over the
+        source payroll links, so every table is updated with a single statement regardless of the payroll size.
+        The links are moved last, as the selection depends on them.
+        """
         payroll_benefits = PayrollBenefitConsumption.objects.filter(
             payroll_id=from_payroll_id,
+            is_deleted=False,
+            benefit__is_deleted=False,
             benefit__status__in=[BenefitConsumptionStatus.ACCEPTED, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT]
         )
+        selected_benefit_ids = payroll_benefits.values('benefit_id')
+        moved_summary = PayrollAggregateService.summarize(
+            BenefitConsumption.objects.filter(id__in=selected_benefit_ids)
+        )
+        if not moved_summary:
+            return
+
+        BenefitConsumption.objects.filter(id__in=selected_benefit_ids).update(
+            status=BenefitConsumptionStatus.ACCEPTED
+        )
+        PayrollBill.objects.filter(
+            payroll_id=from_payroll_id,
+            is_deleted=False,
+            bill_id__in=BenefitAttachment.objects.filter(
+                benefit_id__in=selected_benefit_ids, is_deleted=False
+            ).values('bill_id'),
+        ).update(payroll=payroll)
         payroll_benefits.update(payroll=payroll)
-        benefits = BenefitConsumption.objects.filter(payrollbenefitconsumption__payroll=payroll)
-        benefits.update(status=BenefitConsumptionStatus.ACCEPTED)
+
+        delta = PayrollAggregateDelta()
+        delta.add_summary(from_payroll_id, moved_summary, sign=-1)
+        delta.add(
+            payroll.id,
+            BenefitConsumptionStatus.ACCEPTED,
+            sum((amount for _count, amount in moved_summary.values()), Decimal(0)),
+            count=sum(count for count, _amount in moved_summary.values()),
+        )
+        delta.apply()
 
 
 class BenefitConsumptionService(BaseService):
@@ -238,14 +486,23 @@ class BenefitConsumptionService(BaseService):
 
     @register_service_signal('benefit_consumption_service.update')
     def update(self, obj_data):
-        return super().update(obj_data)
+        previous = BenefitConsumption.objects.filter(id=obj_data.get('id')).values('status', 'amount').first()
+        result = super().update(obj_data)
+        if previous and result.get('success', False):
+            benefit = BenefitConsumption.objects.get(id=obj_data['id'])
+            PayrollAggregateService.record_update(benefit, previous['status'], previous['amount'])
+        return result
 
     @check_authentication
     @register_service_signal('benefit_consumption_service.delete')
     def delete(self, obj_data):
         benefit_to_delete = BenefitConsumption.objects.get(id=obj_data['id'])
+        previous_status = benefit_to_delete.status
         benefit_to_delete.status = BenefitConsumptionStatus.PENDING_DELETION
         benefit_to_delete.save(username=self.user.username)
+        PayrollAggregateService.record_status_change(
+            [(benefit_to_delete, previous_status)], BenefitConsumptionStatus.PENDING_DELETION
+        )
         data = {'id': benefit_to_delete.id}
         TaskService(self.user).create({
             'source': 'benefit_delete',
@@ -266,73 +523,401 @@ class BenefitConsumptionService(BaseService):
             benefit_attachment = BenefitAttachment(bill_id=bill.id, benefit_id=benefit_id)
             benefit_attachment.save(username=self.user.username)
 
+    @check_authentication
+    @register_service_signal('benefit_consumption_service.create_or_update_benefit_attachments')
+    def create_or_update_benefit_attachments(self, benefit_bill_pairs):
+        """
+        Bulk variant of create_or_update_benefit_attachment, old attachments of all given benefits are replaced.
+
+        :param benefit_bill_pairs: iterable of (benefit, bill) pairs, instances or ids
+        """
+        benefit_attachments = [
+            BenefitAttachment(benefit_id=_get_id(benefit), bill_id=_get_id(bill))
+            for benefit, bill in benefit_bill_pairs
+        ]
+        if not benefit_attachments:
+            return
+        batch_size = PayrollConfig.bulk_create_batch_size
+        benefit_ids = list({benefit_attachment.benefit_id for benefit_attachment in benefit_attachments})
+        for start in range(0, len(benefit_ids), batch_size):
+            BenefitAttachment.objects.filter(benefit_id__in=benefit_ids[start:start + batch_size]).delete()
+        bulk_create_history_models(benefit_attachments, self.user, batch_size)
+
+
+def _get_id(obj):
+    return getattr(obj, 'id', obj)
+
+
+_aggregate_state = threading.local()
+
+
+class PayrollAggregateDelta:
+    """
+    Accumulates per payroll and per status changes of benefit counts and amounts, so that a loop over many
+    benefits results in a single aggregate update per payroll.
+    """
+
+    def __init__(self):
+        self._deltas = defaultdict(lambda: defaultdict(lambda: [0, Decimal(0)]))
+
+    def add(self, payroll_id, status, amount, count=1):
+        entry = self._deltas[payroll_id][status]
+        entry[0] += count
+        entry[1] += Decimal(amount or 0)
+
+    def remove(self, payroll_id, status, amount, count=1):
+        self.add(payroll_id, status, -Decimal(amount or 0), -count)
+
+    def transition(self, payroll_id, old_status, new_status, amount):
+        if old_status == new_status:
+            return
+        self.remove(payroll_id, old_status, amount)
+        self.add(payroll_id, new_status, amount)
+
+    def add_summary(self, payroll_id, summary, sign=1):
+        for status, (count, amount) in summary.items():
+            self.add(payroll_id, status, sign * Decimal(amount or 0), sign * count)
+
+    def apply(self):
+        for payroll_id, deltas in self._deltas.items():
+            PayrollAggregateService.apply_delta(payroll_id, deltas)
+        self._deltas.clear()
+
+
+class PayrollAggregateService:
+    """
+    Maintains PayrollAggregate rows incrementally. Deltas have to be applied after the benefit changes they
+    describe, a missing aggregate is rebuilt from the current state of the database instead.
+    """
+
+    @classmethod
+    def get_for_payroll(cls, payroll_id):
+        """
+        Read only, a missing aggregate reads as empty until rebuild_payroll_aggregates fills it.
+        """
+        return PayrollAggregate.objects.filter(payroll_id=payroll_id).first() or PayrollAggregate(payroll_id=payroll_id)
+
+    @classmethod
+    def get_or_rebuild(cls, payroll_id):
+        return PayrollAggregate.objects.filter(payroll_id=payroll_id).first() or cls.rebuild(payroll_id)
+
+    @classmethod
+    @transaction.atomic
+    def apply_delta(cls, payroll_id, deltas):
+        """
+        Add the per status (count, amount) deltas to the aggregate. The totals are incremented with a single
+        UPDATE, which also locks the row for the merge of the status summary, so the lock is held from the end
+        of the caller's work until its commit only.
+        """
+        count = sum(entry[0] for entry in deltas.values())
+        amount = sum((Decimal(entry[1]) for entry in deltas.values()), Decimal(0))
+        reconciled_amount = Decimal(deltas.get(BenefitConsumptionStatus.RECONCILED, (0, 0))[1])
+        updated = PayrollAggregate.objects.filter(payroll_id=payroll_id).update(
+            total_count=F('total_count') + count,
+            total_amount=F('total_amount') + amount,
+            reconciled_amount=F('reconciled_amount') + reconciled_amount,
+            date_updated=Now(),
+        )
+        if not updated:
+            cls.rebuild(payroll_id)
+            return
+        status_summary = PayrollAggregate.objects.filter(payroll_id=payroll_id) \
+            .values_list('status_summary', flat=True).first() or {}
+        for status, (status_count, status_amount) in deltas.items():
+            entry = status_summary.get(status, {'count': 0, 'amount': '0'})
+            status_summary[status] = {
+                'count': entry['count'] + status_count,
+                'amount': str(Decimal(entry['amount']) + Decimal(status_amount)),
+            }
+        PayrollAggregate.objects.filter(payroll_id=payroll_id).update(status_summary=status_summary)
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls, payroll_id):
+        summary = cls.summarize(BenefitConsumption.objects.filter(
+            payrollbenefitconsumption__payroll_id=payroll_id,
+            payrollbenefitconsumption__is_deleted=False,
+            is_deleted=False,
+        ))
+        status_summary = {status: {'count': count, 'amount': str(amount)} for status, (count, amount) in summary.items()}
+        aggregate = PayrollAggregate.objects.select_for_update().filter(payroll_id=payroll_id).first()
+        if not aggregate:
+            aggregate = PayrollAggregate(payroll_id=payroll_id)
+        cls._save_summary(aggregate, status_summary)
+        return aggregate
+
+    @classmethod
+    def reset(cls, payroll_id):
+        aggregate = PayrollAggregate.objects.filter(payroll_id=payroll_id).first() \
+            or PayrollAggregate(payroll_id=payroll_id)
+        cls._save_summary(aggregate, {})
+
+    @classmethod
+    def summarize(cls, benefits_queryset):
+        rows = benefits_queryset.order_by().values('status').annotate(count=Count('id'), amount=Sum('amount'))
+        return {row['status']: (row['count'], row['amount'] or Decimal(0)) for row in rows}
+
+    @classmethod
+    def get_payroll_ids_by_benefit(cls, benefit_ids):
+        payroll_ids_by_benefit = defaultdict(list)
+        payroll_benefits = PayrollBenefitConsumption.objects.filter(
+            benefit_id__in=benefit_ids,
+            is_deleted=False,
+        ).values_list('benefit_id', 'payroll_id')
+        for benefit_id, payroll_id in payroll_benefits:
+            payroll_ids_by_benefit[benefit_id].append(payroll_id)
+        return payroll_ids_by_benefit
+
+    @classmethod
+    def record_status_change(cls, benefits_with_old_status, new_status):
+        """
+        :param benefits_with_old_status: list of (benefit, old_status) tuples, benefits are already saved
+        """
+        if not benefits_with_old_status:
+            return
+        payroll_ids_by_benefit = cls.get_payroll_ids_by_benefit(
+            [benefit.id for benefit, _old_status in benefits_with_old_status]
+        )
+        delta = PayrollAggregateDelta()
+        for benefit, old_status in benefits_with_old_status:
+            for payroll_id in payroll_ids_by_benefit.get(benefit.id, []):
+                delta.transition(payroll_id, old_status, new_status, benefit.amount)
+        delta.apply()
+
+    @classmethod
+    def record_update(cls, benefit, old_status, old_amount):
+        delta = PayrollAggregateDelta()
+        for payroll_id in cls.get_payroll_ids_by_benefit([benefit.id]).get(benefit.id, []):
+            delta.remove(payroll_id, old_status, old_amount)
+            delta.add(payroll_id, benefit.status, benefit.amount)
+        delta.apply()
+
+    @classmethod
+    def prepare_removal_delta(cls, benefit_ids):
+        """
+        Has to be called before the benefits are detached from their payrolls.
+        """
+        summaries = PayrollBenefitConsumption.objects.filter(
+            benefit_id__in=benefit_ids,
+            is_deleted=False,
+            benefit__is_deleted=False,
+        ).order_by().values('payroll_id', 'benefit__status').annotate(count=Count('id'), amount=Sum('benefit__amount'))
+        delta = PayrollAggregateDelta()
+        for row in summaries:
+            delta.remove(row['payroll_id'], row['benefit__status'], row['amount'], count=row['count'])
+        return delta
+
+    @classmethod
+    @contextmanager
+    def collect_attached(cls):
+        """
+        Collect the benefits attached inside the block and apply them to the aggregates as one delta per payroll
+        once the block succeeds, e.g. around a calculation attaching its benefits one by one. Nested blocks share
+        the collection of the outermost one.
+        """
+        if getattr(_aggregate_state, 'attached', None) is not None:
+            yield
+            return
+        _aggregate_state.attached = defaultdict(list)
+        try:
+            yield
+            attached = _aggregate_state.attached
+        finally:
+            _aggregate_state.attached = None
+        for payroll_id, benefit_ids in attached.items():
+            cls.record_attached(payroll_id, benefit_ids)
+
+    @classmethod
+    def record_attached(cls, payroll_id, benefit_ids):
+        collected = getattr(_aggregate_state, 'attached', None)
+        if collected is not None:
+            collected[payroll_id].extend(benefit_ids)
+            return
+        batch_size = PayrollConfig.bulk_create_batch_size
+        delta = PayrollAggregateDelta()
+        for start in range(0, len(benefit_ids), batch_size):
+            summary = cls.summarize(BenefitConsumption.objects.filter(
+                id__in=benefit_ids[start:start + batch_size],
+                is_deleted=False,
+            ))
+            delta.add_summary(payroll_id, summary)
+        delta.apply()
+
+    @classmethod
+    def _save_summary(cls, aggregate, status_summary):
+        aggregate.status_summary = status_summary
+        aggregate.total_count = sum(entry['count'] for entry in status_summary.values())
+        aggregate.total_amount = sum((Decimal(entry['amount']) for entry in status_summary.values()), Decimal(0))
+        aggregate.reconciled_amount = Decimal(
+            status_summary.get(BenefitConsumptionStatus.RECONCILED, {}).get('amount', 0)
+        )
+        aggregate.save()
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
 
 class CsvReconciliationService:
     def __init__(self, user: InteractiveUser):
         self.user = user
 
-    def download_reconciliation(self, payroll_id) -> BytesIO:
+    FORMAT_CSV = 'csv'
+    FORMAT_PARQUET = 'parquet'
+    EXPORT_FORMATS = (FORMAT_CSV, FORMAT_PARQUET)
+
+    def download_reconciliation(self, payroll_id, file_format=FORMAT_CSV) -> BytesIO:
+        if file_format not in self.EXPORT_FORMATS:
+            raise ValueError('csv_reconciliation.validation.unsupported_format')
         payroll = self._resolve_payroll(payroll_id)
-        bc_qs = self._get_benefit_consumption_qs(payroll)
-        # Retrieve the basic fields
+        with timed_stage('reconciliation_download.query', payroll, payroll.payment_method) as tags:
+            bc_qs = self._get_benefit_consumption_qs(payroll)
+            df = self._build_reconciliation_dataframe(bc_qs)
+            tags['rows'] = len(df)
+
+        in_memory_file = BytesIO()
+        with timed_stage('reconciliation_download.write', payroll, payroll.payment_method,
+                         rows=len(df), file_format=file_format):
+            if file_format == self.FORMAT_PARQUET:
+                self._write_parquet(df, in_memory_file)
+            else:
+                # BytesIO is duck-typed as a file object, so it can be passed to df.to_csv
+                # noinspection PyTypeChecker
+                df.to_csv(in_memory_file, index=False)
+        return in_memory_file
+
+    def _build_reconciliation_dataframe(self, bc_qs):
         field_keys = list(PayrollConfig.csv_reconciliation_field_mapping.keys())
-        records = list(bc_qs.values(*field_keys))
-
-        # Collect all extra_info keys to ensure all columns are present in the DataFrame
-        extra_info_keys = set()
-        extra_info_dicts = []  # To store extra_info dicts for each record
-        for record in records:
-            bc = bc_qs.get(code=record['code'])
-            extra_info = bc.json_ext.get('extra_info', {}) if bc.json_ext else {}
-            extra_info_keys.update(extra_info.keys())
-            extra_info_dicts.append(extra_info)
-
-        # Convert to DataFrame
-        df = pd.DataFrame.from_records(records)
-
-        for key in extra_info_keys:
-            if key not in df.columns:
-                df[key] = None
-
-        # Add paid extra field
-        df[PayrollConfig.csv_reconciliation_paid_extra_field] = df.apply(
-            lambda row: self._fill_paid_column(row), axis=1
-        )
+        records = list(bc_qs.values(*field_keys, 'json_ext'))
+        extra_info_dicts = [self._get_extra_info(record.pop('json_ext')) for record in records]
+        return self._records_to_dataframe(records, extra_info_dicts)
+
+    def _records_to_dataframe(self, records, extra_info_dicts):
+        field_keys = list(PayrollConfig.csv_reconciliation_field_mapping.keys())
+        df = pd.DataFrame.from_records(records, columns=field_keys)
         df.rename(columns=PayrollConfig.csv_reconciliation_field_mapping, inplace=True)
 
-        # Add extra_info fields at the end of the DataFrame
-        for key in extra_info_keys:
-            df[key] = [extra_info_dict.get(key, None) for extra_info_dict in extra_info_dicts]
+        # the paid column is left empty for the paying agency to fill in, as the export always did
+        df[PayrollConfig.csv_reconciliation_paid_extra_field] = None
 
-        in_memory_file = BytesIO()
-        # BytesIO is duck-typed as a file object, so it can be passed to df.to_csv
-        # noinspection PyTypeChecker
-        df.to_csv(in_memory_file, index=False)
-        return in_memory_file
+        # extra_info keys become columns at the end of the DataFrame, missing keys are filled with NaN
+        extra_info_df = pd.DataFrame(extra_info_dicts, index=df.index)
+        overlapping_columns = df.columns.intersection(extra_info_df.columns)
+        return df.drop(columns=overlapping_columns).join(extra_info_df)
 
-    def upload_reconciliation(self, payroll_id, file, upload):
+    @staticmethod
+    def _get_extra_info(json_ext):
+        return (json_ext or {}).get('extra_info') or {}
+
+    def _write_parquet(self, df, file):
+        """
+        Write the reconciliation frame as Parquet. Columns coming from the field mapping are typed
+        after the model fields they point to (decimals, dates, dictionary-encoded choices), everything
+        else, including the extra_info columns, is written as strings.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError('csv_reconciliation.validation.parquet_requires_pyarrow')
+
+        column_types = self._get_parquet_column_types(pa)
+        arrays = []
+        for column in df.columns:
+            values = df[column]
+            arrow_type = column_types.get(column, pa.string())
+            if pa.types.is_dictionary(arrow_type):
+                array = pa.array(values.astype('category'))
+            elif pa.types.is_string(arrow_type):
+                array = pa.array([None if _is_missing(value) else str(value) for value in values], type=arrow_type)
+            else:
+                array = pa.array(values, type=arrow_type, from_pandas=True)
+            arrays.append(array)
+
+        table = pa.Table.from_arrays(arrays, names=[str(column) for column in df.columns])
+        pq.write_table(table, file)
+
+    def _get_parquet_column_types(self, pa):
+        column_types = {}
+        for lookup, column in PayrollConfig.csv_reconciliation_field_mapping.items():
+            field = self._resolve_lookup_field(BenefitConsumption, lookup)
+            if field is None:
+                continue
+            if field.choices:
+                column_types[column] = pa.dictionary(pa.int32(), pa.string())
+            elif field.get_internal_type() == 'DecimalField':
+                column_types[column] = pa.decimal128(field.max_digits, field.decimal_places)
+            elif field.get_internal_type() == 'DateField':
+                column_types[column] = pa.date32()
+            elif field.get_internal_type() == 'DateTimeField':
+                column_types[column] = pa.timestamp('us')
+        return column_types
+
+    @staticmethod
+    def _resolve_lookup_field(model, lookup):
+        field = None
+        for part in lookup.split('__'):
+            if model is None:
+                return None
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return None
+            model = field.related_model
+        return field
+
+    @deferred_document_sync()
+    @PayrollConfig.pinned()
+    def upload_reconciliation(self, payroll_id, file, upload=None, dry_run=False):
+        """
+        Reconcile the uploaded file chunk by chunk, so that memory usage does not depend on the file size.
+        The annotated file with the errors column is written incrementally to a temporary file, which the caller
+        closes once it is stored.
+        In dry run mode the rows are only validated with read queries, nothing is written and no annotated
+        file is returned.
+        """
         payroll = self._resolve_payroll(payroll_id)
-        upload.payroll = payroll
-        upload.status = upload.Status.IN_PROGRESS
-        upload.save(username=self.user.login_name)
+        if not dry_run:
+            upload.payroll = payroll
+            upload.status = upload.Status.IN_PROGRESS
+            upload.save(username=self.user.login_name)
         if not file:
             raise ValueError(_('csv_reconciliation.validation.file_required'))
-        df = pd.read_csv(file)
-        self._validate_dataframe(df)
-        df.rename(columns={v: k for k, v in PayrollConfig.csv_reconciliation_field_mapping.items()}, inplace=True)
+        self._check_file_not_reconciled(file)
 
+        errors_column = PayrollConfig.csv_reconciliation_errors_column
         affected_rows = 0
         skipped_items = 0
-        total_number_of_benefits_in_file = len(df)
-
-        df[PayrollConfig.csv_reconciliation_errors_column] = df.apply(lambda row: self._reconcile_row(payroll, row),
-                                                                      axis=1)
-
-        for _, row in df.iterrows():
-            if not pd.isna(row[PayrollConfig.csv_reconciliation_errors_column]):
-                skipped_items += 1
-            else:
-                affected_rows += 1
+        total_number_of_benefits_in_file = 0
+        errors = {}
+        annotated_file = None if dry_run else tempfile.TemporaryFile()
+        try:
+            for chunk in self._read_csv_chunks(file):
+                self._validate_chunk(chunk)
+                chunk.rename(columns={v: k for k, v in PayrollConfig.csv_reconciliation_field_mapping.items()},
+                             inplace=True)
+                with timed_stage('reconciliation_upload.reconcile_chunk', payroll, payroll.payment_method,
+                                 rows=len(chunk), dry_run=dry_run):
+                    chunk[errors_column] = self._reconcile_chunk(payroll, chunk, dry_run)
+
+                chunk_skipped_items = int(chunk[errors_column].notna().sum())
+                skipped_items += chunk_skipped_items
+                affected_rows += len(chunk) - chunk_skipped_items
+                error_chunk = chunk[chunk[errors_column].apply(lambda x: bool(x))]
+                errors.update(
+                    error_chunk.set_index(PayrollConfig.csv_reconciliation_code_column)[errors_column].to_dict())
+
+                if annotated_file:
+                    chunk.rename(columns=PayrollConfig.csv_reconciliation_field_mapping, inplace=True)
+                    # temporary files are duck-typed as a file object, so they can be passed to df.to_csv
+                    # noinspection PyTypeChecker
+                    chunk.to_csv(annotated_file, index=False, header=total_number_of_benefits_in_file == 0)
+                total_number_of_benefits_in_file += len(chunk)
+        except BaseException:
+            # the caller only gets the annotated file on success
+            if annotated_file:
+                annotated_file.close()
+            raise
 
         summary = {
             'affected_rows': affected_rows,
@@ -340,38 +925,86 @@ class CsvReconciliationService:
             'skipped_items': skipped_items
         }
 
-        error_df = df[df[PayrollConfig.csv_reconciliation_errors_column].apply(lambda x: bool(x))]
-        if not error_df.empty:
-            in_memory_file = BytesIO()
-            df.rename(columns={k: v for k, v in PayrollConfig.csv_reconciliation_field_mapping.items()}, inplace=True)
-            df.to_csv(in_memory_file, index=False)
-            return in_memory_file, error_df.set_index(PayrollConfig.csv_reconciliation_code_column)\
-                                   [PayrollConfig.csv_reconciliation_errors_column].to_dict(), summary
+        if dry_run:
+            return None, errors or None, summary
+        if errors:
+            annotated_file.seek(0)
+            return annotated_file, errors, summary
+        annotated_file.close()
+        file.seek(0)
         return file, None, summary
 
+    def _check_file_not_reconciled(self, file):
+        """
+        First pass reading only the status column, so that an empty or an already reconciled file is rejected
+        before any benefit is reconciled.
+        """
+        status_column = PayrollConfig.csv_reconciliation_status_column
+        try:
+            header = pd.read_csv(file, nrows=0).columns
+        except pd.errors.EmptyDataError:
+            header = pd.Index([])
+        file.seek(0)
+        if header.empty:
+            raise ValueError(_("Import file is empty"))
+
+        rows = 0
+        all_reconciled = status_column in header
+        for chunk in pd.read_csv(file, usecols=[status_column if all_reconciled else header[0]], dtype=str,
+                                 chunksize=PayrollConfig.csv_reconciliation_chunk_size):
+            rows += len(chunk)
+            all_reconciled = all_reconciled and self._is_chunk_reconciled(chunk)
+        file.seek(0)
+        if rows == 0:
+            raise ValueError(_("Import file is empty"))
+        if all_reconciled:
+            raise ValueError(_("All of the Benefit Consumptions have been already reconciled."))
+
+    def _read_csv_chunks(self, file):
+        mapping = PayrollConfig.csv_reconciliation_field_mapping
+        try:
+            yield from pd.read_csv(
+                file,
+                chunksize=PayrollConfig.csv_reconciliation_chunk_size,
+                dtype={mapping.get('code', 'code'): str, mapping.get('receipt', 'receipt'): str},
+            )
+        except pd.errors.EmptyDataError:
+            return
+
+    def _reconcile_chunk(self, payroll, chunk, dry_run=False):
+        codes = chunk[PayrollConfig.csv_reconciliation_code_column].dropna().unique().tolist()
+        benefits = BenefitConsumption.objects.filter(code__in=codes, is_deleted=False)
+        if dry_run:
+            benefits = benefits.only('id', 'code', 'status')
+        benefits_by_code = {bc.code: bc for bc in benefits}
+        benefit_ids_in_payroll = set(PayrollBenefitConsumption.objects.filter(
+            payroll=payroll,
+            benefit_id__in=[bc.id for bc in benefits_by_code.values()],
+        ).values_list('benefit_id', flat=True))
+        process_row = self._validate_row if dry_run else self._reconcile_row
+        return chunk.apply(
+            lambda row: process_row(
+                row, benefits_by_code.get(row[PayrollConfig.csv_reconciliation_code_column]), benefit_ids_in_payroll
+            ),
+            axis=1
+        )
+
     def _get_benefit_consumption_qs(self, payroll):
         qs = BenefitConsumption.objects.filter(payrollbenefitconsumption__payroll=payroll, is_deleted=False)
         if not qs.exists():
             raise ValueError('csv_reconciliation.validation.no_benefit_consumption_for_payroll')
         return qs
 
-    def _validate_dataframe(self, df):
-        if df is None:
+    def _validate_chunk(self, chunk):
+        if chunk is None:
             raise ValueError(_("Unknown error while loading import file"))
-        if df.empty:
-            raise ValueError(_("Import file is empty"))
-        if PayrollConfig.csv_reconciliation_errors_column in df.columns:
+        if PayrollConfig.csv_reconciliation_errors_column in chunk.columns:
             raise ValueError(_("Column errors in csv."))
-        if 'Status' in df.columns:
-            if (df[PayrollConfig.csv_reconciliation_status_column] == BenefitConsumptionStatus.RECONCILED).all():
-                raise ValueError(_("All of the Benefit Consumptions have been already reconciled."))
-
-    def _fill_paid_column(self, row):
-        if (PayrollConfig.csv_reconciliation_status_column in row
-                and row[PayrollConfig.csv_reconciliation_status_column] == BenefitConsumptionStatus.RECONCILED):
-            return PayrollConfig.csv_reconciliation_paid_yes
-        else:
-            return None
+
+    def _is_chunk_reconciled(self, chunk):
+        status_column = PayrollConfig.csv_reconciliation_status_column
+        return status_column in chunk.columns \
+            and (chunk[status_column] == BenefitConsumptionStatus.RECONCILED).all()
 
     def _resolve_payroll(self, payroll_id):
         if not payroll_id:
@@ -381,12 +1014,11 @@ class CsvReconciliationService:
             raise ValueError('csv_reconciliation.validation.payroll_not_found')
         return payroll
 
-    def _reconcile_row(self, payroll, row):
+    def _validate_row(self, row, bc, benefit_ids_in_payroll):
         errors = []
-        bc = BenefitConsumption.objects.filter(code=row['code'], is_deleted=False).first()
         if not bc:
             errors.append(_('benefit_consumption_not_found'))
-        if not bc.payrollbenefitconsumption_set.filter(payroll=payroll).exists():
+        elif bc.id not in benefit_ids_in_payroll:
             errors.append(_('benefit_consumption_not_in_payroll'))
         if (row[PayrollConfig.csv_reconciliation_paid_extra_field]
                 and row[PayrollConfig.csv_reconciliation_paid_extra_field]
@@ -399,20 +1031,25 @@ class CsvReconciliationService:
         if bc and bc.status != row['status']:
             errors.append(_('status_not_matching'))
 
+        return errors if errors else None
+
+    def _reconcile_row(self, row, bc, benefit_ids_in_payroll):
+        errors = self._validate_row(row, bc, benefit_ids_in_payroll)
         if (not errors
                 and (row[PayrollConfig.csv_reconciliation_paid_extra_field] == PayrollConfig.csv_reconciliation_paid_yes
                      and bc.status == BenefitConsumptionStatus.ACCEPTED)):
             self._reconcile_bc(row, bc)
-
-        return errors if errors else None
+        return errors
 
     def _reconcile_bc(self, row, bc):
-        bc.status = BenefitConsumptionStatus.RECONCILED
         bc.receipt = row[PayrollConfig.csv_reconciliation_receipt_column]
         extra_info = {k: row[k] for k in row.index
                       if k not in PayrollConfig.csv_reconciliation_field_mapping and not pd.isna(row[k])}
         bc.json_ext = {'extra_info': extra_info}
+        previous_status = bc.status
+        bc.status = BenefitConsumptionStatus.RECONCILED
         bc.save(username=self.user.login_name)
+        PayrollAggregateService.record_status_change([(bc, previous_status)], BenefitConsumptionStatus.RECONCILED)
         bill = Bill.objects.filter(benefitattachment__benefit=bc, is_deleted=False).first()
         if bill:
             self._reconcile_bill(row, bill)
@@ -450,3 +1087,83 @@ class CsvReconciliationService:
         bill_payment_details = DetailPaymentInvoice(**bill_payment_details)
         payment_service = PaymentInvoiceService(self.user)
         payment_service.create_with_detail(bill_payment, bill_payment_details)
+
+
+class PaymentCycleExportService:
+    """
+    Exports the reconciliation data of all payrolls of a payment cycle as a zip of CSV shards. The benefits
+    are read in a single pass over the payroll join and every `payment_cycle_export_rows_per_file` rows
+    are written as a separate file.
+    """
+    PAYROLL_ID_COLUMN = 'Payroll ID'
+
+    def __init__(self, user: InteractiveUser):
+        self.user = user
+
+    def request_export(self, payment_cycle_id):
+        payment_cycle = self._resolve_payment_cycle(payment_cycle_id)
+        if not self._get_payrolls(payment_cycle).exists():
+            raise ValueError('payment_cycle_export.validation.no_payrolls_for_payment_cycle')
+        file_name = f"payment_cycle_{payment_cycle.id}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.zip"
+        file_handler = DefaultStorageFileHandler(
+            PayrollConfig.get_payment_cycle_export_file_path(payment_cycle.id, file_name))
+        file_handler.check_file_path()
+        transaction.on_commit(
+            lambda: export_payment_cycle_reconciliation.delay(str(payment_cycle.id), self.user.id, file_name)
+        )
+        return file_name
+
+    def export(self, payment_cycle_id, file_name):
+        payment_cycle = self._resolve_payment_cycle(payment_cycle_id)
+        with tempfile.TemporaryFile() as zip_file:
+            with zipfile.ZipFile(zip_file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                for index, df in enumerate(self._iter_shards(payment_cycle), start=1):
+                    archive.writestr(f"payment_cycle_{payment_cycle.id}_part_{index:04d}.csv",
+                                     df.to_csv(index=False))
+            zip_file.seek(0)
+            save_stored_file(PayrollConfig.get_payment_cycle_export_file_path(payment_cycle.id, file_name), zip_file)
+        logger.info(f"Payment cycle {payment_cycle.code} exported to {file_name}")
+
+    def _iter_shards(self, payment_cycle):
+        rows_per_file = PayrollConfig.payment_cycle_export_rows_per_file
+        records, extra_info_dicts, payroll_ids = [], [], []
+        for record in self._get_records(payment_cycle):
+            payroll_ids.append(str(record.pop('payrollbenefitconsumption__payroll_id')))
+            extra_info_dicts.append(CsvReconciliationService._get_extra_info(record.pop('json_ext')))
+            records.append(record)
+            if len(records) >= rows_per_file:
+                yield self._to_shard(records, extra_info_dicts, payroll_ids)
+                records, extra_info_dicts, payroll_ids = [], [], []
+        if records:
+            yield self._to_shard(records, extra_info_dicts, payroll_ids)
+
+    def _to_shard(self, records, extra_info_dicts, payroll_ids):
+        df = CsvReconciliationService(self.user)._records_to_dataframe(records, extra_info_dicts)
+        df.insert(0, self.PAYROLL_ID_COLUMN, payroll_ids)
+        return df
+
+    def _get_records(self, payment_cycle):
+        field_keys = list(PayrollConfig.csv_reconciliation_field_mapping.keys())
+        # all conditions on the payroll relation are in a single filter() call, so the values below are read
+        # from the same join
+        return BenefitConsumption.objects.filter(
+            is_deleted=False,
+            payrollbenefitconsumption__is_deleted=False,
+            payrollbenefitconsumption__payroll__is_deleted=False,
+            payrollbenefitconsumption__payroll__payment_cycle=payment_cycle,
+        ).order_by(
+            'payrollbenefitconsumption__payroll_id', 'code'
+        ).values(
+            *field_keys, 'json_ext', 'payrollbenefitconsumption__payroll_id'
+        ).iterator(chunk_size=PayrollConfig.csv_reconciliation_chunk_size)
+
+    def _get_payrolls(self, payment_cycle):
+        return Payroll.objects.filter(payment_cycle=payment_cycle, is_deleted=False)
+
+    def _resolve_payment_cycle(self, payment_cycle_id):
+        if not payment_cycle_id:
+            raise ValueError('payment_cycle_export.validation.payment_cycle_id_required')
+        payment_cycle = PaymentCycle.objects.filter(id=payment_cycle_id, is_deleted=False).first()
+        if not payment_cycle:
+            raise ValueError('payment_cycle_export.validation.payment_cycle_not_found')
+        return payment_cycle
@@ -8,7 +8,8 @@ from tasks_management.models import Task
 from payroll.apps import PayrollConfig
 from payroll.models import Payroll, BenefitConsumption, BenefitConsumptionStatus
 from payroll.payments_registry import PaymentMethodStorage
-from payroll.services import PayrollService
+from payroll.opensearch_sync import deferred_document_sync
+from payroll.services import PayrollService, PayrollAggregateService
 from payroll.strategies import StrategyOfPaymentInterface
 
 
@@ -18,10 +19,12 @@ imis_modules = openimis_apps()
 
 def bind_service_signals():
     def on_task_complete_accept_payroll(**kwargs):
+        @deferred_document_sync()
         def accept_payroll(payroll, strategy, user):
             if strategy:
                 strategy.accept_payroll(payroll, user)
 
+        @deferred_document_sync()
         def reject_payroll(payroll, strategy, user):
             if strategy:
                 strategy.reject_payroll(payroll, user)
@@ -44,6 +47,7 @@ def bind_service_signals():
             logger.error("Error while executing on_task_complete_accept_payroll", exc_info=exc)
 
     def on_task_complete_payroll_reconcilation(**kwargs):
+        @deferred_document_sync()
         def reconcile_payroll(payroll, user):
             strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
             if strategy:
@@ -63,6 +67,7 @@ def bind_service_signals():
             logger.error("Error while executing on_task_complete_payroll_reconciliation", exc_info=exc)
 
     def on_task_complete_payroll_reject_approved_payroll(**kwargs):
+        @deferred_document_sync()
         def reject_approved_payroll(payroll, user):
             strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
             if strategy:
@@ -82,6 +87,7 @@ def bind_service_signals():
             logger.error("Error while executing on_task_complete_reject_approved_payroll", exc_info=exc)
 
     def on_task_delete_payroll(**kwargs):
+        @deferred_document_sync()
         def delete_payroll(payroll, user):
             strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
             if strategy:
@@ -102,6 +108,7 @@ def bind_service_signals():
             logger.error("Error while executing on_task_complete_delete_payroll", exc_info=exc)
 
     def on_task_delete_benefit(**kwargs):
+        @deferred_document_sync()
         def delete_benefit(benefit, user):
             StrategyOfPaymentInterface.remove_benefit_from_payroll(benefit=benefit)
         try:
@@ -117,8 +124,12 @@ def bind_service_signals():
                     delete_benefit(benefit, user)
                 if task_status == Task.Status.FAILED:
                     benefit = BenefitConsumption.objects.get(id=task['entity_id'])
+                    previous_status = benefit.status
                     benefit.status = BenefitConsumptionStatus.ACCEPTED
                     benefit.save(username=user.username)
+                    PayrollAggregateService.record_status_change(
+                        [(benefit, previous_status)], BenefitConsumptionStatus.ACCEPTED
+                    )
         except Exception as exc:
             logger.error("Error while executing on_task_complete_delete_benefit", exc_info=exc)
 
@@ -35,7 +35,7 @@ class StrategyOfPaymentInterface(object,  metaclass=abc.ABCMeta):
             PaymentInvoice,
             Bill
         )
-        from payroll.services import PayrollService
+        from payroll.services import PayrollService, PayrollAggregateService
 
         benefit_data = BenefitConsumption.objects.filter(
             payrollbenefitconsumption__payroll=payroll,
@@ -54,10 +54,13 @@ class StrategyOfPaymentInterface(object,  metaclass=abc.ABCMeta):
             detail_payment_invoices.delete()
             PaymentInvoice.objects.filter(id__in=payment_invoice_ids).delete()
 
+        benefits_with_old_status = []
         for benefit in benefit_data:
+            benefits_with_old_status.append((benefit, benefit.status))
             benefit.receipt = None
             benefit.status = BenefitConsumptionStatus.ACCEPTED
             benefit.save(username=user.username)
+        PayrollAggregateService.record_status_change(benefits_with_old_status, BenefitConsumptionStatus.ACCEPTED)
         cls.change_status_of_payroll(payroll, PayrollStatus.PENDING_APPROVAL, user)
         PayrollService(user).create_accept_payroll_task(payroll.id, model_representation(payroll))
 
@@ -85,6 +88,7 @@ class StrategyOfPaymentInterface(object,  metaclass=abc.ABCMeta):
             Bill,
             BillItem
         )
+        from payroll.services import PayrollAggregateService
 
         benefit_data = BenefitConsumption.objects.filter(
             payrollbenefitconsumption__payroll=payroll,
@@ -113,6 +117,8 @@ class StrategyOfPaymentInterface(object,  metaclass=abc.ABCMeta):
                 is_deleted=False
             ).delete()
 
+            PayrollAggregateService.reset(payroll.id)
+
     @classmethod
     def remove_benefit_from_payroll(cls, benefit):
         from payroll.models import (
@@ -124,6 +130,7 @@ class StrategyOfPaymentInterface(object,  metaclass=abc.ABCMeta):
             Bill,
             BillItem
         )
+        from payroll.services import PayrollAggregateService
 
         benefit_data = BenefitConsumption.objects.filter(
             id=benefit.id,
@@ -132,6 +139,7 @@ class StrategyOfPaymentInterface(object,  metaclass=abc.ABCMeta):
 
         if len(benefit_data) > 0:
             benefits, related_bills = zip(*benefit_data)
+            aggregate_delta = PayrollAggregateService.prepare_removal_delta(benefits)
 
             BenefitAttachment.objects.filter(
                 benefit_id__in=benefits
@@ -151,3 +159,5 @@ class StrategyOfPaymentInterface(object,  metaclass=abc.ABCMeta):
                 id__in=benefits,
                 is_deleted=False
             ).delete()
+
+            aggregate_delta.apply()
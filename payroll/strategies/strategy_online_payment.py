@@ -1,9 +1,11 @@
 import logging
+import time
 
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.db import transaction
 
 from core.signals import register_service_signal
+from payroll.instrumentation import timed_stage
 from payroll.strategies.strategy_of_payments_interface import StrategyOfPaymentInterface
 from payroll.utils import CodeGenerator
 
@@ -24,22 +26,25 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
 
     @classmethod
     def accept_payroll(cls, payroll, user, **kwargs):
-        cls._process_accepted_payroll(payroll, user, **kwargs)
+        with timed_stage('online_payment.accept_payroll', payroll, cls):
+            cls._process_accepted_payroll(payroll, user, **kwargs)
 
     @classmethod
     def make_payment_for_payroll(cls, payroll, user, **kwargs):
-        cls._send_payment_data_to_gateway(payroll, user)
+        return cls._send_payment_data_to_gateway(payroll, user, kwargs.get('dispatcher'))
 
     @classmethod
     def acknowledge_of_reponse_view(cls, payroll, response_from_gateway, user, rejected_bills):
         # save response coming from payment gateway in json_ext
-        cls._save_payroll_data(payroll, user, response_from_gateway)
+        with timed_stage('online_payment.acknowledge_response', payroll, cls):
+            cls._save_payroll_data(payroll, user, response_from_gateway)
 
     @classmethod
     @transaction.atomic
     def reconcile_payroll(cls, payroll, user):
         from payroll.tasks import send_request_to_reconcile
-        send_request_to_reconcile.delay(payroll.id, user.id)
+        with timed_stage('online_payment.reconcile_payroll', payroll, cls):
+            send_request_to_reconcile.delay(payroll.id, user.id)
 
     @classmethod
     def get_benefits_attached_to_payroll(cls, payroll, status):
@@ -57,18 +62,25 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
     @classmethod
     def approve_for_payment_benefit_consumption(cls, benefits, user):
         from payroll.models import BenefitConsumptionStatus
+        from payroll.services import PayrollAggregateService
+        approved_benefits = []
         for benefit in benefits:
             try:
+                previous_status = benefit.status
                 benefit.status = BenefitConsumptionStatus.APPROVE_FOR_PAYMENT
                 benefit.save(username=user.login_name)
+                approved_benefits.append((benefit, previous_status))
             except Exception as e:
                 logger.debug(f"Failed to approve benefit consumption {benefit.code}: {str(e)}")
+        PayrollAggregateService.record_status_change(approved_benefits, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT)
 
     @classmethod
     def reconcile_benefit_consumption(cls, benefits, user):
         from payroll.models import BenefitConsumptionStatus
         from payroll.apps import PayrollConfig
         from invoice.models import Bill
+        from payroll.services import PayrollAggregateService
+        reconciled_benefits = []
         for benefit in benefits:
             try:
                 receipt = CodeGenerator.generate_unique_code(
@@ -77,9 +89,11 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
                     'receipt',
                     PayrollConfig.receipt_length,
                 )
+                previous_status = benefit.status
                 benefit.receipt = receipt
                 benefit.status = BenefitConsumptionStatus.RECONCILED
                 benefit.save(username=user.login_name)
+                reconciled_benefits.append((benefit, previous_status))
                 bill = Bill.objects.filter(
                     benefitattachment__benefit=benefit,
                     is_deleted=False
@@ -88,6 +102,7 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
                     cls._create_bill_payment_for_paid_bill(benefit, bill, user)
             except Exception as e:
                 logger.debug(f"Failed to approve benefit consumption {benefit.code}: {str(e)}")
+        PayrollAggregateService.record_status_change(reconciled_benefits, BenefitConsumptionStatus.RECONCILED)
 
     @classmethod
     def _create_bill_payment_for_paid_bill(cls, benefit, bill, user):
@@ -130,11 +145,40 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
 
     @classmethod
     def _get_payroll_bills_amount(cls, payroll):
-        from payroll.models import Payroll
-        payroll_with_benefit_sum = Payroll.objects.filter(id=payroll.id).annotate(
-            total_benefit_amount=Sum('payrollbenefitconsumption__benefit__amount')
-        ).first()
-        return payroll_with_benefit_sum.total_benefit_amount
+        from payroll.services import PayrollAggregateService
+        return PayrollAggregateService.get_or_rebuild(payroll.id).total_amount
+
+    @classmethod
+    def record_adaptor_history(cls, payroll, user, run_type, date_started, gateway_seconds, benefits, results):
+        """
+        Save a PaymentAdaptorHistory of a gateway run, with the answer of the gateway for every benefit sent and
+        the achieved requests per second of the gateway phase.
+        """
+        from core import datetime
+        from payroll.apps import PayrollConfig
+        from payroll.models import PaymentAdaptorHistory, PaymentAdaptorHistoryBenefit
+        outcomes = [bool(result) for result in results]
+        accepted_count = sum(outcomes)
+        history = PaymentAdaptorHistory(
+            payroll=payroll,
+            run_type=run_type,
+            gateway=type(cls.PAYMENT_GATEWAY).__name__,
+            date_started=date_started,
+            date_finished=datetime.datetime.now(),
+            sent_count=len(benefits),
+            accepted_count=accepted_count,
+            rejected_count=len(benefits) - accepted_count,
+            total_amount=str(sum(benefit.amount or 0 for benefit in benefits)),
+            requests_per_second=round(len(benefits) / gateway_seconds, 2) if gateway_seconds > 0 else None,
+            # the benefits of the run are in PaymentAdaptorHistoryBenefit, their number in sent_count
+            bills_ids=[],
+        )
+        history.save(username=user.username)
+        PaymentAdaptorHistoryBenefit.objects.bulk_create([
+            PaymentAdaptorHistoryBenefit(history=history, benefit_id=benefit.id, accepted=accepted)
+            for benefit, accepted in zip(benefits, outcomes)
+        ], batch_size=PayrollConfig.bulk_create_batch_size)
+        return history
 
     @classmethod
     def _get_benefits_to_string(cls, benefits):
@@ -143,19 +187,38 @@ class StrategyOnlinePayment(StrategyOfPaymentInterface):
         return benefits_uuids_string
 
     @classmethod
-    def _send_payment_data_to_gateway(cls, payroll, user):
-        from payroll.models import BenefitConsumptionStatus
-        benefits = cls.get_benefits_attached_to_payroll(payroll, BenefitConsumptionStatus.ACCEPTED)
+    def _send_payment_data_to_gateway(cls, payroll, user, dispatcher=None):
+        from core import datetime
+        from payroll.models import BenefitConsumptionStatus, PaymentAdaptorHistory
+        date_started = datetime.datetime.now()
+        benefits = list(cls.get_benefits_attached_to_payroll(payroll, BenefitConsumptionStatus.ACCEPTED))
         payment_gateway_connector = cls.PAYMENT_GATEWAY
+
+        def send_payment(benefit):
+            return payment_gateway_connector.send_payment(benefit.code, benefit.amount)
+
+        # with a dispatcher the requests run in its shared rate limited pool, the results are handled here
+        with timed_stage('online_payment.send_payments', payroll, cls, rows=len(benefits)):
+            start = time.perf_counter()
+            results = dispatcher.map(send_payment, benefits) if dispatcher else list(map(send_payment, benefits))
+            gateway_seconds = time.perf_counter() - start
         benefits_to_approve = []
-        for benefit in benefits:
-            if payment_gateway_connector.send_payment(benefit.code, benefit.amount):
+        for benefit, accepted in zip(benefits, results):
+            if accepted:
                 benefits_to_approve.append(benefit)
             else:
                 # Handle the case where a benefit payment is rejected
                 logger.info(f"Payment for benefit ({benefit.code}) was rejected.")
         if benefits_to_approve:
-            cls.approve_for_payment_benefit_consumption(benefits_to_approve, user)
+            with timed_stage('online_payment.approve_for_payment', payroll, cls, rows=len(benefits_to_approve)):
+                cls.approve_for_payment_benefit_consumption(benefits_to_approve, user)
+        cls.record_adaptor_history(
+            payroll, user, PaymentAdaptorHistory.RunType.PAYMENT, date_started, gateway_seconds, benefits, results)
+        return {
+            'sent_payments': len(benefits),
+            'accepted_payments': len(benefits_to_approve),
+            'rejected_payments': len(benefits) - len(benefits_to_approve),
+        }
 
     @classmethod
     def _process_accepted_payroll(cls, payroll, user, **kwargs):
@@ -1,36 +1,119 @@
 import logging
+import time
 from celery import shared_task
 
+from core import datetime
 from core.models import User
-from payroll.models import Payroll, PayrollStatus, BenefitConsumptionStatus
+from payroll.apps import PayrollConfig
+from payroll.models import Payroll, PayrollStatus, BenefitConsumptionStatus, PaymentAdaptorHistory
 from payroll.strategies import StrategyOnlinePayment
 from payroll.payments_registry import PaymentMethodStorage
+from payroll.opensearch_sync import deferred_document_sync, sync_documents
+from payroll.gateway_metrics import registry as gateway_metrics
+from payroll.instrumentation import timed_stage
+from payroll.payment_dispatch import PaymentDispatcher, PaymentDispatchProgress
 
 logger = logging.getLogger(__name__)
 
 
 @shared_task
+@deferred_document_sync()
+@PayrollConfig.pinned()
 def send_requests_to_gateway_payment(payroll_id, user_id):
     payroll = Payroll.objects.get(id=payroll_id)
     strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
     if strategy:
         user = User.objects.get(id=user_id)
         strategy.initialize_payment_gateway()
-        strategy.make_payment_for_payroll(payroll, user)
+        try:
+            strategy.make_payment_for_payroll(payroll, user)
+        finally:
+            gateway_metrics.flush()
 
 
 @shared_task
+def send_payments_for_payrolls(payroll_ids, user_id, client_mutation_id=None):
+    """
+    Send the payments of several payrolls through one rate limited pool of gateway workers. Every payroll is
+    handled in its own deferred sync block, the aggregate progress is reported in the mutation log.
+    """
+    PayrollConfig.refresh_if_stale()
+    user = User.objects.get(id=user_id)
+    payrolls = list(Payroll.objects.filter(id__in=payroll_ids, is_deleted=False))
+    progress = PaymentDispatchProgress(client_mutation_id, len(payrolls))
+    with PaymentDispatcher() as dispatcher:
+        for payroll in payrolls:
+            try:
+                # a reloaded configuration is picked up between the payrolls of the batch
+                with PayrollConfig.pinned() as reloaded, deferred_document_sync():
+                    if reloaded:
+                        dispatcher.update_rate(PayrollConfig.payment_gateway_rate_limit)
+                    result = _make_payment_for_payroll(payroll, user, dispatcher)
+                progress.payroll_processed(result)
+            except Exception as exc:
+                logger.error(f"Failed to send payments of payroll {payroll.id}", exc_info=exc)
+                progress.payroll_failed()
+            finally:
+                gateway_metrics.flush()
+    progress.complete()
+
+
+def _make_payment_for_payroll(payroll, user, dispatcher):
+    strategy = PaymentMethodStorage.get_chosen_payment_method(payroll.payment_method)
+    if not strategy:
+        return None
+    strategy.initialize_payment_gateway()
+    return strategy.make_payment_for_payroll(payroll, user, dispatcher=dispatcher)
+
+
+@shared_task
+def generate_payroll_benefits(payroll_id, user_id, chunks, date_valid_from, date_valid_to):
+    for start_id, end_id in chunks:
+        generate_payroll_benefits_chunk.delay(payroll_id, user_id, start_id, end_id, date_valid_from, date_valid_to)
+
+
+@shared_task
+@deferred_document_sync()
+@PayrollConfig.pinned()
+def generate_payroll_benefits_chunk(payroll_id, user_id, start_id, end_id, date_valid_from, date_valid_to):
+    from payroll.services import PayrollService
+    payroll = Payroll.objects.get(id=payroll_id)
+    user = User.objects.get(id=user_id)
+    service = PayrollService(user)
+    try:
+        processed_beneficiaries = service.generate_benefits_for_selection_range(
+            payroll, start_id, end_id, date_valid_from, date_valid_to
+        )
+        service.complete_generation_chunk(payroll_id, [start_id, end_id], processed_beneficiaries)
+    except Exception as exc:
+        logger.error(f"Failed to generate benefits of payroll {payroll_id} for chunk [{start_id}, {end_id})",
+                     exc_info=exc)
+        service.complete_generation_chunk(payroll_id, [start_id, end_id], 0, failed=True)
+
+
+@shared_task
+@deferred_document_sync()
+@PayrollConfig.pinned()
 def send_request_to_reconcile(payroll_id, user_id):
+    date_started = datetime.datetime.now()
     payroll = Payroll.objects.get(id=payroll_id)
     user = User.objects.get(id=user_id)
     strategy = StrategyOnlinePayment
     strategy.initialize_payment_gateway()
     strategy.change_status_of_payroll(payroll, PayrollStatus.RECONCILED, user)
-    benefits = strategy.get_benefits_attached_to_payroll(payroll, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT)
+    benefits = list(
+        strategy.get_benefits_attached_to_payroll(payroll, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT)
+    )
     payment_gateway_connector = strategy.PAYMENT_GATEWAY
+    try:
+        with timed_stage('online_payment.send_reconciliations', payroll, strategy, rows=len(benefits)):
+            start = time.perf_counter()
+            results = [payment_gateway_connector.reconcile(benefit.code, benefit.amount) for benefit in benefits]
+            gateway_seconds = time.perf_counter() - start
+    finally:
+        gateway_metrics.flush()
     benefits_to_reconcile = []
-    for benefit in benefits:
-        is_reconciled = payment_gateway_connector.reconcile(benefit.code, benefit.amount)
+    for benefit, is_reconciled in zip(benefits, results):
         # Initialize json_ext if it is None
         if benefit.json_ext is None:
             benefit.json_ext = {}
@@ -49,4 +132,23 @@ def send_request_to_reconcile(payroll_id, user_id):
             benefit.save(username=user.login_name)
             logger.info(f"Payment for benefit ({benefit.code}) was rejected.")
     if benefits_to_reconcile:
-        strategy.reconcile_benefit_consumption(benefits_to_reconcile, user)
+        with timed_stage('online_payment.reconcile_benefits', payroll, strategy, rows=len(benefits_to_reconcile)):
+            strategy.reconcile_benefit_consumption(benefits_to_reconcile, user)
+    strategy.record_adaptor_history(
+        payroll, user, PaymentAdaptorHistory.RunType.RECONCILIATION, date_started, gateway_seconds, benefits, results)
+
+
+@shared_task
+def export_payment_cycle_reconciliation(payment_cycle_id, user_id, file_name):
+    from payroll.services import PaymentCycleExportService
+    user = User.objects.get(id=user_id)
+    try:
+        PaymentCycleExportService(user).export(payment_cycle_id, file_name)
+    except Exception as exc:
+        logger.error(f"Failed to export payment cycle {payment_cycle_id} to {file_name}", exc_info=exc)
+        raise
+
+
+@shared_task
+def sync_deferred_documents(model_label, ids):
+    sync_documents(model_label, ids)
@@ -0,0 +1,135 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from unittest import mock, skipUnless
+
+import pandas as pd
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumptionStatus, CsvReconciliationUpload, PayrollStatus
+from payroll.services import PayrollService, CsvReconciliationService
+from payroll.strategies import StrategyOnlinePayment
+from payroll.tasks import send_request_to_reconcile
+from payroll.tests.helpers import PayrollHelper
+
+BENCHMARK_SIZES = [
+    int(size) for size in os.getenv('PAYROLL_BENCHMARK_SIZES', '1000,10000,100000').split(',') if size.strip()
+]
+
+
+@skipUnless(os.getenv('PAYROLL_BENCHMARK'), "set PAYROLL_BENCHMARK=1 to run the payroll benchmarks")
+class PayrollBenchmarkTestCase(TestCase):
+    """
+    Wall time and query counts of the payroll flows for synthetic payrolls of BENCHMARK_SIZES benefits.
+    The results are written as JSON to PAYROLL_BENCHMARK_OUTPUT (payroll_benchmark.json by default), so they
+    can be compared between releases. Seeding is not measured.
+    """
+    user = None
+    helper = None
+    results = []
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+        cls.individual = cls.helper.create_individual()
+        cls.payment_cycle = cls.helper.create_payment_cycle("Benchmark")
+        cls.results = []
+
+    @classmethod
+    def tearDownClass(cls):
+        output = os.getenv('PAYROLL_BENCHMARK_OUTPUT', 'payroll_benchmark.json')
+        with open(output, 'w') as file:
+            json.dump(cls.results, file, indent=2)
+        super().tearDownClass()
+
+    @contextmanager
+    def _measure(self, flow, size):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            yield
+            wall_time = time.perf_counter() - start
+        self.results.append({
+            'flow': flow,
+            'benefits': size,
+            'wall_time_seconds': round(wall_time, 4),
+            'queries': len(queries),
+        })
+
+    def _seed_payroll(self, name, size, status=BenefitConsumptionStatus.ACCEPTED, **kwargs):
+        payroll = self.helper.create_payroll(name, **kwargs)
+        self.helper.seed_benefits(payroll, self.individual, size, status=status, code_prefix=name)
+        return payroll
+
+    def test_create(self):
+        for size in BENCHMARK_SIZES:
+            with self.subTest(size=size):
+                benefit_plan = self.helper.create_benefit_plan(code=f"BENCH-BP-{size}")
+                payment_plan = self.helper.create_payment_plan(benefit_plan, code=f"BENCH-PP-{size}")
+                self.helper.seed_beneficiaries(benefit_plan, size)
+                obj_data = {
+                    'name': f"BenchmarkCreate{size}",
+                    'payment_plan_id': payment_plan.id,
+                    'payment_cycle_id': self.payment_cycle.id,
+                    'payment_method': "StrategyOnlinePayment",
+                    'status': PayrollStatus.PENDING_APPROVAL,
+                }
+                # benefits are generated inline, background generation would only measure the task publishing
+                with mock.patch.object(PayrollConfig, 'payroll_background_generation_threshold', None), \
+                        self._measure('PayrollService.create', size):
+                    result = PayrollService(self.user).create(obj_data)
+                self.assertTrue(result.get('success'), result)
+
+    def test_reconciliation_download_and_upload(self):
+        for size in BENCHMARK_SIZES:
+            with self.subTest(size=size):
+                payroll = self._seed_payroll(f"BenchmarkReconciliation{size}", size)
+                service = CsvReconciliationService(self.user)
+                with self._measure('CsvReconciliationService.download_reconciliation', size):
+                    csv_file = service.download_reconciliation(payroll.id)
+
+                df = pd.read_csv(BytesIO(csv_file.getvalue()), dtype=str)
+                df[PayrollConfig.csv_reconciliation_paid_extra_field] = PayrollConfig.csv_reconciliation_paid_yes
+                df[PayrollConfig.csv_reconciliation_receipt_column] = 'RECEIPT'
+                upload_file = BytesIO()
+                df.to_csv(upload_file, index=False)
+                upload_file.seek(0)
+                upload = CsvReconciliationUpload()
+                upload.save(username=self.user.login_name)
+                with self._measure('CsvReconciliationService.upload_reconciliation', size):
+                    _, errors, _ = service.upload_reconciliation(payroll.id, upload_file, upload)
+                self.assertFalse(errors)
+
+    def test_gateway_payment_and_reconciliation(self):
+        gateway_class = 'payroll.tests.helpers.StubPaymentGatewayConnector'
+        with mock.patch.object(PayrollConfig, 'payment_gateway_class', gateway_class):
+            StrategyOnlinePayment.initialize_payment_gateway()
+            for size in BENCHMARK_SIZES:
+                with self.subTest(size=size):
+                    payroll = self._seed_payroll(
+                        f"BenchmarkGateway{size}", size, payment_method="StrategyOnlinePayment")
+                    with self._measure('StrategyOnlinePayment._send_payment_data_to_gateway', size):
+                        result = StrategyOnlinePayment._send_payment_data_to_gateway(payroll, self.user)
+                    self.assertEqual(result['accepted_payments'], size)
+
+                    with self._measure('send_request_to_reconcile', size):
+                        send_request_to_reconcile(payroll.id, self.user.id)
+
+    def test_reject_and_remove_benefits(self):
+        for size in BENCHMARK_SIZES:
+            with self.subTest(size=size):
+                # the rejection reverts reconciled benefits, so they are seeded as reconciled
+                payroll = self._seed_payroll(
+                    f"BenchmarkReject{size}", size, status=BenefitConsumptionStatus.RECONCILED,
+                    payment_method="StrategyOnlinePayment")
+                with self._measure('StrategyOnlinePayment.reject_approved_payroll', size):
+                    StrategyOnlinePayment.reject_approved_payroll(payroll, self.user)
+                with self._measure('StrategyOnlinePayment.remove_benefits_from_rejected_payroll', size):
+                    StrategyOnlinePayment.remove_benefits_from_rejected_payroll(payroll)
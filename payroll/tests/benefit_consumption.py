@@ -65,6 +65,23 @@ class BenefitConsumptionServiceTest(TestCase):
         benefit_attachments = BenefitAttachment.objects.filter(benefit=benefit)
         self.assertEqual(benefit_attachments.count(), 2)
 
+    def test_add_attachments_to_benefit_consumptions_in_bulk(self):
+        benefits = []
+        for code in ["BC-BULK-1", "BC-BULK-2"]:
+            result = self.service.create({**benefit_consumption_data_test, 'code': code})
+            self.assertTrue(result.get('success', False), result.get('detail', "No details provided"))
+            benefits.append(BenefitConsumption.objects.get(id=result['data']['uuid']))
+        bill_1, bill_2 = list(self.bills_queryset)
+        self.service.create_or_update_benefit_attachments([
+            (benefits[0], bill_1), (benefits[0], bill_2), (benefits[1], bill_2)
+        ])
+        self.assertEqual(BenefitAttachment.objects.filter(benefit=benefits[0]).count(), 2)
+        self.assertEqual(BenefitAttachment.objects.filter(benefit=benefits[1]).count(), 1)
+        self.assertEqual(BenefitAttachment.history.filter(benefit=benefits[0]).count(), 2)
+
+        self.service.create_or_update_benefit_attachments([(benefits[0], bill_1)])
+        self.assertEqual(BenefitAttachment.objects.filter(benefit=benefits[0]).count(), 1)
+
     @classmethod
     def __create_test_individual(cls):
         individual = Individual(**service_add_individual_payload)
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import TestCase
+
+from core.models import ModuleConfiguration
+from payroll.apps import PayrollConfig, DEFAULT_CONFIG, CONFIG_VERSION_CACHE_KEY
+from payroll.payment_dispatch import PaymentDispatcher
+
+
+class PayrollConfigReloadTestCase(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(PayrollConfig.reload_config)
+        self.addCleanup(cache.delete, CONFIG_VERSION_CACHE_KEY)
+
+    def _make_stale(self):
+        PayrollConfig._config_checked_at = 0.0
+
+    def test_bump_config_version(self):
+        cache.delete(CONFIG_VERSION_CACHE_KEY)
+        self.assertEqual(PayrollConfig.bump_config_version(), 1)
+        self.assertEqual(PayrollConfig.bump_config_version(), 2)
+
+    def test_refresh_reloads_changed_version(self):
+        PayrollConfig.reload_config()
+        self._make_stale()
+        self.assertFalse(PayrollConfig.refresh_if_stale())
+
+        with mock.patch.dict(DEFAULT_CONFIG, payment_gateway_rate_limit=7):
+            version = PayrollConfig.bump_config_version()
+            self._make_stale()
+            self.assertTrue(PayrollConfig.refresh_if_stale())
+
+        self.assertEqual(PayrollConfig.config_version, version)
+        self.assertEqual(PayrollConfig.payment_gateway_rate_limit, 7)
+
+    def test_refresh_is_throttled(self):
+        PayrollConfig.reload_config()
+        self._make_stale()
+        with mock.patch.object(PayrollConfig, 'config_refresh_interval', 3600):
+            self.assertFalse(PayrollConfig.refresh_if_stale())
+            PayrollConfig.bump_config_version()
+            self.assertFalse(PayrollConfig.refresh_if_stale())
+
+    def test_configuration_change_reloads_on_commit(self):
+        with mock.patch.dict(DEFAULT_CONFIG, payment_gateway_rate_limit=7):
+            with self.captureOnCommitCallbacks(execute=True):
+                post_save.send(sender=ModuleConfiguration, instance=ModuleConfiguration(module='payroll'),
+                               created=False)
+                self.assertNotEqual(PayrollConfig.payment_gateway_rate_limit, 7)
+
+        self.assertEqual(PayrollConfig.payment_gateway_rate_limit, 7)
+        self.assertEqual(PayrollConfig.config_version, cache.get(CONFIG_VERSION_CACHE_KEY))
+
+    def test_reload_is_postponed_while_pinned(self):
+        PayrollConfig.reload_config()
+        previous_rate_limit = PayrollConfig.payment_gateway_rate_limit
+        with mock.patch.dict(DEFAULT_CONFIG, payment_gateway_rate_limit=7):
+            with PayrollConfig.pinned():
+                self.assertFalse(PayrollConfig.reload_config(PayrollConfig.bump_config_version()))
+                self.assertEqual(PayrollConfig.payment_gateway_rate_limit, previous_rate_limit)
+            self.assertEqual(PayrollConfig.payment_gateway_rate_limit, 7)
+
+    def test_other_module_configuration_is_ignored(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            post_save.send(sender=ModuleConfiguration, instance=ModuleConfiguration(module='core'), created=False)
+        self.assertEqual(callbacks, [])
+
+    def test_dispatcher_applies_reloaded_rate(self):
+        with PaymentDispatcher(max_workers=1, rate=0) as dispatcher:
+            dispatcher.update_rate(5)
+            self.assertEqual(dispatcher._bucket.rate, 5)
+            dispatcher.update_rate(0)
+            self.assertIsNone(dispatcher._bucket)
@@ -0,0 +1,60 @@
+from unittest import skipIf
+
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumptionStatus
+from payroll.services import CsvReconciliationService
+from payroll.tests.helpers import PayrollHelper
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class CsvReconciliationExportTestCase(TestCase):
+    user = None
+    helper = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+        cls.individual = cls.helper.create_individual()
+        cls.payroll = cls.helper.create_payroll("ReconciliationExport")
+        cls.benefits = cls.helper.create_benefits(cls.payroll, cls.individual, 3, amount=12.5)
+        cls.benefits[0].json_ext = {'extra_info': {'phone': '123'}}
+        cls.benefits[0].save(username=cls.user.username)
+
+    def test_csv_export_contains_mapped_and_extra_columns(self):
+        csv_file = CsvReconciliationService(self.user).download_reconciliation(self.payroll.id)
+        header = csv_file.getvalue().decode('utf-8').splitlines()[0].split(',')
+
+        for column in PayrollConfig.csv_reconciliation_field_mapping.values():
+            self.assertIn(column, header)
+        self.assertIn(PayrollConfig.csv_reconciliation_paid_extra_field, header)
+        self.assertIn('phone', header)
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            CsvReconciliationService(self.user).download_reconciliation(self.payroll.id, 'xlsx')
+
+    @skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_export_is_typed(self):
+        parquet_file = CsvReconciliationService(self.user).download_reconciliation(
+            self.payroll.id, CsvReconciliationService.FORMAT_PARQUET)
+        parquet_file.seek(0)
+        table = pyarrow.parquet.read_table(parquet_file)
+        mapping = PayrollConfig.csv_reconciliation_field_mapping
+
+        self.assertEqual(table.num_rows, 3)
+        self.assertTrue(pyarrow.types.is_decimal(table.schema.field(mapping['amount']).type))
+        self.assertTrue(pyarrow.types.is_date32(table.schema.field(mapping['individual__dob']).type))
+        self.assertTrue(pyarrow.types.is_dictionary(table.schema.field(mapping['status']).type))
+        self.assertTrue(pyarrow.types.is_string(table.schema.field('phone').type))
+        self.assertEqual(
+            set(table.column(mapping['status']).to_pylist()), {BenefitConsumptionStatus.ACCEPTED})
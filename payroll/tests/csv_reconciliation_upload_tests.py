@@ -0,0 +1,67 @@
+from io import BytesIO
+from unittest import mock
+
+import pandas as pd
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, CsvReconciliationUpload
+from payroll.services import CsvReconciliationService
+from payroll.tests.helpers import PayrollHelper
+
+
+class CsvReconciliationDryRunTestCase(TestCase):
+    user = None
+    helper = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+        cls.individual = cls.helper.create_individual()
+        cls.payroll = cls.helper.create_payroll("ReconciliationDryRun")
+        cls.benefits = cls.helper.create_benefits(cls.payroll, cls.individual, 3)
+
+    def _reconciliation_file(self):
+        service = CsvReconciliationService(self.user)
+        df = pd.read_csv(BytesIO(service.download_reconciliation(self.payroll.id).getvalue()), dtype=str)
+        df[PayrollConfig.csv_reconciliation_paid_extra_field] = PayrollConfig.csv_reconciliation_paid_yes
+        df[PayrollConfig.csv_reconciliation_field_mapping['receipt']] = 'RECEIPT'
+        # unknown code and invalid paid value
+        df.loc[0, PayrollConfig.csv_reconciliation_field_mapping['code']] = 'UNKNOWN'
+        df.loc[1, PayrollConfig.csv_reconciliation_paid_extra_field] = 'Maybe'
+        file = BytesIO()
+        df.to_csv(file, index=False)
+        file.seek(0)
+        return file
+
+    def test_dry_run_reports_errors_without_writes(self):
+        uploads_before = CsvReconciliationUpload.objects.count()
+
+        annotated_file, errors, summary = CsvReconciliationService(self.user).upload_reconciliation(
+            self.payroll.id, self._reconciliation_file(), dry_run=True)
+
+        self.assertIsNone(annotated_file)
+        self.assertEqual(len(errors), 2)
+        self.assertIn('UNKNOWN', errors)
+        self.assertEqual(summary['total_number_of_benefits_in_file'], 3)
+        self.assertEqual(summary['affected_rows'], 1)
+        self.assertEqual(CsvReconciliationUpload.objects.count(), uploads_before)
+        self.assertFalse(BenefitConsumption.objects.filter(
+            id__in=[benefit.id for benefit in self.benefits], status=BenefitConsumptionStatus.RECONCILED
+        ).exists())
+
+    def test_reconciled_file_is_rejected_before_reconciling(self):
+        service = CsvReconciliationService(self.user)
+        df = pd.read_csv(BytesIO(service.download_reconciliation(self.payroll.id).getvalue()), dtype=str)
+        df[PayrollConfig.csv_reconciliation_status_column] = BenefitConsumptionStatus.RECONCILED
+        file = BytesIO()
+        df.to_csv(file, index=False)
+        file.seek(0)
+
+        with mock.patch.object(CsvReconciliationService, '_reconcile_chunk') as reconcile_chunk:
+            with self.assertRaisesMessage(ValueError, "already reconciled"):
+                service.upload_reconciliation(self.payroll.id, file, dry_run=True)
+        reconcile_chunk.assert_not_called()
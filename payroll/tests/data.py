@@ -1,5 +1,18 @@
 from datetime import date
 
+service_add_payment_plan_payload = {
+    'is_deleted': False,
+    'code': "PP-E",
+    'name': "Example Payment Plan",
+    'periodicity': 1,
+    'calculation': "32d96b58-898a-460a-b357-5fd4b95cd87c",
+    'json_ext': {
+        'calculation_rule': {
+            'fixed_batch': 2,
+            'limit_per_single_transaction': 100
+        }
+    },
+}
 
 gql_payment_point_query = """
 query q1 {
@@ -151,3 +164,21 @@ query q2 {
   }
 }
 """
+
+gql_benefit_consumption_by_payroll_keyset_query = """
+query q3 {
+  benefitConsumptionByPayroll(payrollUuid: "%s", keyset: true, first: %s%s%s) {
+    totalCount
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+    edges {
+      node {
+        id
+        code
+      }
+    }
+  }
+}
+"""
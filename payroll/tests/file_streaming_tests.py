@@ -0,0 +1,56 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, RequestFactory
+
+from payroll.utils import save_stored_file, stream_stored_file
+
+
+class StoredFileStreamingTestCase(SimpleTestCase):
+    PATH = 'csv_reconciliation/payroll_1/reconciliation.csv'
+    CONTENT = b'code,amount\n' + b''.join(f'BC-{index},100\n'.encode() for index in range(1000))
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = FileSystemStorage(location=self.location)
+        save_stored_file(self.PATH, BytesIO(self.CONTENT), storage=self.storage)
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def _get(self, **headers):
+        request = RequestFactory().get('/', **headers)
+        return stream_stored_file(request, self.PATH, 'text/csv', storage=self.storage, chunk_size=128)
+
+    def test_full_file_is_streamed(self):
+        response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Length'], str(len(self.CONTENT)))
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+
+    def test_range_request(self):
+        response = self._get(HTTP_RANGE='bytes=10-99')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-99/{len(self.CONTENT)}')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[10:100])
+
+    def test_suffix_range_request(self):
+        response = self._get(HTTP_RANGE='bytes=-20')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[-20:])
+
+    def test_unsatisfiable_range(self):
+        response = self._get(HTTP_RANGE=f'bytes={len(self.CONTENT)}-')
+
+        self.assertEqual(response.status_code, 416)
+
+    def test_missing_file(self):
+        request = RequestFactory().get('/')
+        with self.assertRaises(FileNotFoundError):
+            stream_stored_file(request, 'missing.csv', 'text/csv', storage=self.storage)
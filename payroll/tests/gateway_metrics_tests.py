@@ -0,0 +1,49 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from payroll.apps import PayrollConfig
+from payroll.gateway_metrics import GatewayMetricsRegistry, registry
+from payroll.models import PaymentGatewayStats
+from payroll.payment_gateway import MockedPaymentGatewayConnector
+from payroll.payment_gateway.local_gateway_server import LocalPaymentGatewayServer
+
+
+class GatewayMetricsTestCase(TestCase):
+
+    def test_flush_saves_histogram_and_counters(self):
+        metrics = GatewayMetricsRegistry()
+        for _ in range(98):
+            metrics.record('Gateway', 'mock/payment', 0.04, 200)
+        metrics.record('Gateway', 'mock/payment', 0.3, 500, retries=2)
+        metrics.record('Gateway', 'mock/payment', 12, 'error')
+
+        stats, = metrics.flush()
+
+        self.assertEqual(stats.request_count, 100)
+        self.assertEqual(stats.error_count, 2)
+        self.assertEqual(stats.retry_count, 2)
+        self.assertEqual(stats.status_counts, {'200': 98, '500': 1, 'error': 1})
+        self.assertEqual(stats.latency_buckets['50'], 98)
+        self.assertEqual(stats.latency_buckets['+Inf'], 1)
+        self.assertEqual(stats.latency_p50_ms, 50)
+        self.assertEqual(stats.latency_p99_ms, 500)
+        self.assertEqual(stats.latency_max_ms, 12000)
+        self.assertTrue(PaymentGatewayStats.objects.filter(id=stats.id).exists())
+        self.assertEqual(metrics.flush(), [])
+
+    def test_connector_retries_are_recorded(self):
+        registry.flush()
+        with LocalPaymentGatewayServer(error_rate=1) as server, \
+                mock.patch.object(PayrollConfig, 'gateway_base_url', server.base_url), \
+                mock.patch.object(PayrollConfig, 'endpoint_payment', 'mock/payment'), \
+                mock.patch.object(PayrollConfig, 'payment_gateway_retries', 2), \
+                mock.patch.object(PayrollConfig, 'payment_gateway_retry_backoff', 0):
+            self.assertFalse(MockedPaymentGatewayConnector().send_payment('BC-1', '10.00'))
+
+        stats, = registry.flush()
+        self.assertEqual(stats.gateway, 'MockedPaymentGatewayConnector')
+        self.assertEqual(stats.request_count, 1)
+        self.assertEqual(stats.retry_count, 2)
+        self.assertEqual(stats.status_counts, {'500': 1})
+        self.assertEqual(server.stats[500], 3)
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from graphene import Schema
+from graphene.test import Client
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig
+from payroll.gql_query_guard import QueryCountGuardMiddleware
+from payroll.models import PayrollAggregate
+from payroll.schema import Query, Mutation
+from payroll.tests.helpers import PayrollHelper, assert_field_queries_do_not_scale
+
+
+class QueryCountGuardTestCase(TestCase):
+    class GQLContext:
+        def __init__(self, user):
+            self.user = user
+
+    user = None
+    gql_client = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api(username='username_authorized')
+        cls.gql_client = Client(Schema(query=Query, mutation=Mutation))
+        helper = PayrollHelper(cls.user)
+        benefit_plan = helper.create_benefit_plan(code="GUARD-BP")
+        payment_plan = helper.create_payment_plan(benefit_plan, code="GUARD-PP")
+        for index in range(4):
+            helper.create_payroll(f"QueryGuard{index}", payment_plan=payment_plan)
+
+    def _query_payrolls(self, fields):
+        def execute(page_size, middleware):
+            output = self.gql_client.execute(
+                f'{{ payroll(first: {page_size}, name_Istartswith: "QueryGuard") {{ edges {{ node {{ {fields} }} }} }} }}',
+                context=self.GQLContext(self.user),
+                middleware=middleware,
+            )
+            self.assertEqual(output.get('errors'), None)
+            return output
+        return execute
+
+    def test_plain_fields_do_not_scale(self):
+        assert_field_queries_do_not_scale(self, self._query_payrolls('id name status'))
+
+    def test_aggregate_fields_do_not_scale(self):
+        assert_field_queries_do_not_scale(self, self._query_payrolls(
+            'id benefitsCount benefitsTotalAmount benefitsReconciledAmount benefitsStatusSummary'
+        ))
+        # the payrolls have no aggregate yet, reading them must not create one
+        self.assertFalse(PayrollAggregate.objects.filter(payroll__name__startswith="QueryGuard").exists())
+
+    def test_per_row_resolver_is_detected(self):
+        with self.assertRaises(AssertionError):
+            assert_field_queries_do_not_scale(self, self._query_payrolls('id benefitPlanNameCode'))
+
+    def test_threshold_is_logged(self):
+        with mock.patch.object(PayrollConfig, 'gql_query_guard_enabled', True), \
+                mock.patch.object(PayrollConfig, 'gql_query_guard_threshold', 2), \
+                self.assertLogs('payroll.gql_query_guard', level='WARNING') as logs:
+            self.gql_client.execute(
+                '{ payroll(first: 4, name_Istartswith: "QueryGuard") { edges { node { benefitPlanNameCode } } } }',
+                context=self.GQLContext(self.user),
+                middleware=[QueryCountGuardMiddleware()],
+            )
+        guard_logs = [output for output in logs.output if 'PayrollGQLType.benefitPlanNameCode' in output]
+        self.assertEqual(len(guard_logs), 1)
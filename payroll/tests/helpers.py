@@ -1,9 +1,24 @@
+from django.contrib.contenttypes.models import ContentType
+
+from contribution_plan.models import PaymentPlan
 from core.models import User
 from core.services import create_or_update_interactive_user, create_or_update_core_user
+from individual.models import Individual
+from individual.tests.data import service_add_individual_payload
+from invoice.models import Bill
 from location.models import Location
-from payroll.models import PaymentPoint
-from payroll.services import PaymentPointService
+from payment_cycle.models import PaymentCycle
+from payroll.apps import PayrollConfig
+from payroll.gql_query_guard import QueryCountGuardMiddleware, collect_field_query_counts
+from payroll.models import PaymentPoint, Payroll, PayrollStatus, BenefitConsumption, BenefitConsumptionStatus, \
+    PayrollBenefitConsumption, PayrollBill, BenefitAttachment
+from payroll.payment_gateway import PaymentGatewayConnector
+from payroll.services import PaymentPointService, PayrollService, PayrollAggregateService
+from payroll.tests.data import service_add_payment_plan_payload
+from payroll.utils import bulk_create_history_models
 from core.test_helpers import LogInHelper
+from social_protection.models import BenefitPlan, Beneficiary, BeneficiaryStatus
+from social_protection.tests.data import service_add_payload
 
 
 class PaymentPointHelper:
@@ -31,3 +46,140 @@ class PaymentPointHelper:
         )
         payment_point.save(username=user.username)
         return payment_point
+
+
+def assert_field_queries_do_not_scale(test_case, execute, page_sizes=(2, 4)):
+    """
+    Call `execute(page_size, middleware)` for every page size, `execute` runs the GraphQL query with the given
+    middleware. Fails when a payroll field runs more SQL queries for a larger page.
+    """
+    counts = []
+    for page_size in page_sizes:
+        with collect_field_query_counts() as field_counts:
+            execute(page_size, [QueryCountGuardMiddleware()])
+        counts.append(field_counts)
+    for smaller, larger in zip(counts, counts[1:]):
+        scaling = smaller.scaling_fields(larger)
+        test_case.assertFalse(scaling, f"SQL queries of GraphQL fields scale with the page size: {scaling}")
+
+
+class StubPaymentGatewayConnector(PaymentGatewayConnector):
+    """
+    In-process gateway accepting every payment and reconciliation without sending any request.
+    """
+
+    def send_payment(self, invoice_id, amount, **kwargs):
+        return True
+
+    def reconcile(self, invoice_id, amount, **kwargs):
+        return True
+
+
+class PayrollHelper:
+    def __init__(self, user):
+        self.user = user
+
+    def create_individual(self):
+        individual = Individual(**service_add_individual_payload)
+        individual.save(username=self.user.username)
+        return individual
+
+    def create_payment_cycle(self, code):
+        payment_cycle = PaymentCycle(
+            code=code,
+            start_date='2023-02-01',
+            end_date='2023-03-01',
+            type=ContentType.objects.get_for_model(BenefitPlan),
+        )
+        payment_cycle.save(username=self.user.username)
+        return payment_cycle
+
+    def create_payroll(self, name, **kwargs):
+        payroll = Payroll(name=name, status=PayrollStatus.PENDING_APPROVAL, **kwargs)
+        payroll.save(username=self.user.username)
+        return payroll
+
+    def create_benefits(self, payroll, individual, count, status=BenefitConsumptionStatus.ACCEPTED, amount=100,
+                        code_prefix="BC"):
+        benefits = []
+        for index in range(count):
+            benefit = BenefitConsumption(
+                individual=individual,
+                code=f"{code_prefix}-{payroll.name}-{index}",
+                amount=amount,
+                type="Cash",
+                status=status,
+            )
+            benefit.save(username=self.user.username)
+            PayrollService(self.user).attach_benefit_to_payroll(payroll.id, benefit.id)
+            benefits.append(benefit)
+        return benefits
+
+    def create_benefit_plan(self, code=None):
+        benefit_plan = BenefitPlan(**{**service_add_payload, 'code': code or service_add_payload['code']})
+        benefit_plan.save(username=self.user.username)
+        return benefit_plan
+
+    def create_payment_plan(self, benefit_plan, code=None):
+        payment_plan = PaymentPlan(
+            **{**service_add_payment_plan_payload, 'code': code or service_add_payment_plan_payload['code']},
+            benefit_plan=benefit_plan,
+        )
+        payment_plan.save(username=self.user.username)
+        return payment_plan
+
+    def seed_beneficiaries(self, benefit_plan, count):
+        """
+        Bulk insert `count` active beneficiaries of the benefit plan, each with its own individual.
+        """
+        batch_size = PayrollConfig.bulk_create_batch_size
+        individuals = bulk_create_history_models(
+            [Individual(**service_add_individual_payload) for _ in range(count)], self.user, batch_size
+        )
+        return bulk_create_history_models(
+            [Beneficiary(individual=individual, benefit_plan=benefit_plan, status=BeneficiaryStatus.ACTIVE)
+             for individual in individuals],
+            self.user, batch_size
+        )
+
+    def seed_benefits(self, payroll, individual, count, status=BenefitConsumptionStatus.ACCEPTED, amount=100,
+                      code_prefix="SEED", with_bills=True):
+        """
+        Bulk insert `count` benefits attached to the payroll. With bills every benefit gets a bill linked through
+        BenefitAttachment and PayrollBill, as generated by the payment plan calculation.
+        """
+        batch_size = PayrollConfig.bulk_create_batch_size
+        benefits = bulk_create_history_models([
+            BenefitConsumption(
+                individual=individual,
+                code=f"{code_prefix}-{payroll.name}-{index}",
+                amount=amount,
+                type="Cash",
+                status=status,
+            ) for index in range(count)
+        ], self.user, batch_size)
+        bulk_create_history_models(
+            [PayrollBenefitConsumption(payroll=payroll, benefit=benefit) for benefit in benefits],
+            self.user, batch_size
+        )
+        if with_bills:
+            subject_type = ContentType.objects.get_for_model(Individual)
+            bills = bulk_create_history_models([
+                Bill(
+                    subject_type=subject_type,
+                    subject_id=individual.id,
+                    status=Bill.Status.VALIDATED,
+                    code=f"{code_prefix}-BILL-{payroll.name}-{index}",
+                    amount_net=amount,
+                    amount_total=amount,
+                ) for index in range(count)
+            ], self.user, batch_size)
+            bulk_create_history_models(
+                [BenefitAttachment(benefit=benefit, bill=bill) for benefit, bill in zip(benefits, bills)],
+                self.user, batch_size
+            )
+            bulk_create_history_models(
+                [PayrollBill(payroll=payroll, bill=bill) for bill in bills], self.user, batch_size
+            )
+        PayrollAggregateService.rebuild(payroll.id)
+        return benefits
@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from payroll import instrumentation
+from payroll.instrumentation import MetricsBackend, timed_stage, observe_gateway_request
+
+
+class RecordingMetricsBackend(MetricsBackend):
+    def __init__(self):
+        self.stages = []
+        self.gateway_requests = []
+
+    def observe_stage(self, stage, duration, status, strategy=None, rows=None):
+        self.stages.append((stage, status, strategy, rows))
+
+    def observe_gateway_request(self, gateway, endpoint, duration, status):
+        self.gateway_requests.append((gateway, endpoint, status))
+
+
+class InstrumentationTestCase(SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.backend = RecordingMetricsBackend()
+        patcher = mock.patch.object(instrumentation, '_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_timed_stage_logs_structured_record(self):
+        with self.assertLogs('payroll.instrumentation', level='INFO') as logs:
+            with timed_stage('payroll_create.selection', 'payroll-id', 'StrategyOnlinePayment') as tags:
+                tags['rows'] = 10
+
+        record = logs.records[0].payroll_timing
+        self.assertEqual(record['stage'], 'payroll_create.selection')
+        self.assertEqual(record['payroll_id'], 'payroll-id')
+        self.assertEqual(record['strategy'], 'StrategyOnlinePayment')
+        self.assertEqual(record['rows'], 10)
+        self.assertIn('rows_per_second', record)
+        self.assertEqual(self.backend.stages, [('payroll_create.selection', 'success', 'StrategyOnlinePayment', 10)])
+
+    def test_timed_stage_records_errors(self):
+        with self.assertLogs('payroll.instrumentation', level='INFO'), self.assertRaises(ValueError):
+            with timed_stage('reconciliation_download.query'):
+                raise ValueError()
+
+        self.assertEqual(self.backend.stages, [('reconciliation_download.query', 'error', None, None)])
+
+    def test_gateway_request(self):
+        observe_gateway_request('MockedPaymentGatewayConnector', 'mock/payment', 0.1, 200)
+
+        self.assertEqual(self.backend.gateway_requests, [('MockedPaymentGatewayConnector', 'mock/payment', 200)])
@@ -0,0 +1,59 @@
+from graphene import Schema
+from graphene.test import Client
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.schema import Query, Mutation
+from payroll.tests.data import gql_benefit_consumption_by_payroll_keyset_query
+from payroll.tests.helpers import PayrollHelper
+
+
+class KeysetPaginationGQLTestCase(TestCase):
+    class GQLContext:
+        def __init__(self, user):
+            self.user = user
+
+    user = None
+    gql_client = None
+    gql_context = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api(username='username_authorized')
+        cls.gql_client = Client(Schema(query=Query, mutation=Mutation))
+        cls.gql_context = cls.GQLContext(cls.user)
+        helper = PayrollHelper(cls.user)
+        cls.payroll = helper.create_payroll("KeysetPayroll")
+        cls.benefits = helper.create_benefits(cls.payroll, helper.create_individual(), 5)
+
+    def _execute(self, first, after=None, order_by=None):
+        after_argument = f', after: "{after}"' if after else ''
+        order_by_argument = f', orderBy: ["{order_by}"]' if order_by else ''
+        payload = gql_benefit_consumption_by_payroll_keyset_query % (
+            self.payroll.id, first, after_argument, order_by_argument)
+        return self.gql_client.execute(payload, context=self.gql_context)
+
+    def _query_page(self, first, after=None):
+        output = self._execute(first, after)
+        self.assertEqual(output.get('errors'), None)
+        return output['data']['benefitConsumptionByPayroll']
+
+    def test_keyset_pages_cover_all_benefits_once(self):
+        seen_codes = []
+        after = None
+        while True:
+            page = self._query_page(2, after)
+            self.assertEqual(page['totalCount'], 5)
+            seen_codes.extend(edge['node']['code'] for edge in page['edges'])
+            if not page['pageInfo']['hasNextPage']:
+                break
+            after = page['pageInfo']['endCursor']
+
+        self.assertEqual(len(seen_codes), 5)
+        self.assertEqual(set(seen_codes), {benefit.code for benefit in self.benefits})
+
+    def test_keyset_rejects_order_by(self):
+        output = self._execute(2, order_by='-code')
+        error = next(iter(output.get('errors', [])), {}).get('message', None)
+        self.assertIn('orderBy', error)
@@ -0,0 +1,87 @@
+import http.client
+import json
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from payroll.apps import PayrollConfig
+from payroll.payment_gateway import MockedPaymentGatewayConnector
+from payroll.payment_gateway.local_gateway_server import LatencyDistribution, LocalPaymentGatewayServer
+
+
+class LocalPaymentGatewayServerTestCase(SimpleTestCase):
+
+    def _connector(self, server):
+        with mock.patch.object(PayrollConfig, 'gateway_base_url', server.base_url), \
+                mock.patch.object(PayrollConfig, 'endpoint_payment', 'mock/payment'), \
+                mock.patch.object(PayrollConfig, 'endpoint_reconciliation', 'mock/reconciliation'):
+            return MockedPaymentGatewayConnector()
+
+    def _post(self, server, path, payload, connection=None):
+        connection = connection or http.client.HTTPConnection(server.host, server.port, timeout=5)
+        connection.request('POST', f"{server.base_path}{path}", body=json.dumps(payload))
+        response = connection.getresponse()
+        return response.status, response.read().decode('utf-8')
+
+    def test_mocked_connector_against_local_server(self):
+        with LocalPaymentGatewayServer() as server:
+            connector = self._connector(server)
+            self.assertTrue(connector.send_payment('BC-1', '10.00'))
+            self.assertTrue(connector.reconcile('BC-1', '10.00'))
+        self.assertEqual(server.stats[200], 2)
+
+    def test_connector_keeps_a_session_per_thread(self):
+        with LocalPaymentGatewayServer() as server:
+            connector = self._connector(server)
+
+            def send(index):
+                return connector.send_payment(f'BC-{index}', '10.00'), threading.get_ident(), connector.session
+
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(send, range(20)))
+        self.assertTrue(all(sent for sent, _thread, _session in results))
+        sessions_by_thread = defaultdict(set)
+        for _sent, thread, session in results:
+            sessions_by_thread[thread].add(id(session))
+        self.assertTrue(all(len(sessions) == 1 for sessions in sessions_by_thread.values()))
+        self.assertEqual(len(set().union(*sessions_by_thread.values())), len(sessions_by_thread))
+        self.assertEqual(server.stats[200], 20)
+
+    def test_rejections_and_errors(self):
+        with LocalPaymentGatewayServer(rejection_rate=1) as server:
+            self.assertFalse(self._connector(server).send_payment('BC-1', '10.00'))
+        with LocalPaymentGatewayServer(error_rate=1) as server:
+            self.assertFalse(self._connector(server).reconcile('BC-1', '10.00'))
+        self.assertEqual(server.stats[500], 1)
+
+    def test_throttling(self):
+        with LocalPaymentGatewayServer(rate_limit=2) as server:
+            connection = http.client.HTTPConnection(server.host, server.port, timeout=5)
+            statuses = [
+                self._post(server, 'mock/payment', {'invoiceId': 'BC-1', 'amount': '1'}, connection)[0]
+                for _ in range(3)
+            ]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_batch_endpoint(self):
+        with LocalPaymentGatewayServer() as server:
+            status, body = self._post(server, 'mock/payment/batch', [
+                {'invoiceId': 'BC-1', 'amount': '1'},
+                {'invoiceId': 'BC-2', 'amount': '2'},
+            ])
+            bad_status, _ = self._post(server, 'mock/payment/batch', {'invoiceId': 'BC-1'})
+        self.assertEqual(status, 200)
+        self.assertEqual([result['invoiceId'] for result in json.loads(body)], ['BC-1', 'BC-2'])
+        self.assertTrue(all(result['accepted'] for result in json.loads(body)))
+        self.assertEqual(bad_status, 400)
+
+    def test_latency_distribution(self):
+        latency = LatencyDistribution.parse('uniform:0.01,0.02', seed=1)
+        self.assertTrue(all(0.01 <= latency.sample() <= 0.02 for _ in range(100)))
+        latency = LatencyDistribution.parse('lognormal:0.05,0.02', seed=1)
+        self.assertTrue(all(latency.sample() >= 0 for _ in range(100)))
+        with self.assertRaises(ValueError):
+            LatencyDistribution.parse('pareto:1')
@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumption, PayrollBenefitConsumption
+from payroll.opensearch_sync import deferred_document_sync, defer_document_update
+from payroll.tests.helpers import PayrollHelper
+
+
+class DeferredDocumentSyncTestCase(TestCase):
+    user = None
+    helper = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+        cls.individual = cls.helper.create_individual()
+        cls.payroll = cls.helper.create_payroll("DeferredSync")
+        cls.benefits = cls.helper.create_benefits(cls.payroll, cls.individual, 3)
+
+    def setUp(self):
+        self._deferred_sync = PayrollConfig.opensearch_deferred_sync
+        PayrollConfig.opensearch_deferred_sync = True
+
+    def tearDown(self):
+        PayrollConfig.opensearch_deferred_sync = self._deferred_sync
+
+    def test_update_outside_block_is_not_deferred(self):
+        self.assertFalse(defer_document_update(BenefitConsumption, self.benefits[0]))
+
+    @patch('payroll.tasks.sync_deferred_documents.delay')
+    def test_updates_are_flushed_after_commit(self, sync_delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            with deferred_document_sync():
+                self.assertTrue(defer_document_update(BenefitConsumption, self.benefits[0]))
+                with deferred_document_sync():
+                    defer_document_update(BenefitConsumption, self.benefits[1:])
+                    defer_document_update(
+                        PayrollBenefitConsumption, PayrollBenefitConsumption.objects.filter(payroll=self.payroll))
+                self.assertFalse(sync_delay.called)
+
+        synced = {call.args[0]: set(call.args[1]) for call in sync_delay.call_args_list}
+        self.assertEqual(synced[BenefitConsumption._meta.label], {str(benefit.id) for benefit in self.benefits})
+        self.assertEqual(len(synced[PayrollBenefitConsumption._meta.label]), 3)
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.models import BenefitConsumptionStatus, PaymentAdaptorHistory, PaymentAdaptorHistoryBenefit
+from payroll.strategies import StrategyOnlinePayment
+from payroll.tests.helpers import PayrollHelper, StubPaymentGatewayConnector
+
+
+class RejectingPaymentGatewayConnector(StubPaymentGatewayConnector):
+    def send_payment(self, invoice_id, amount, **kwargs):
+        return not invoice_id.endswith('-0')
+
+
+class PaymentAdaptorHistoryTestCase(TestCase):
+    user = None
+    helper = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+        cls.individual = cls.helper.create_individual()
+
+    def test_payment_run_is_recorded(self):
+        payroll = self.helper.create_payroll("AdaptorHistory", payment_method="StrategyOnlinePayment")
+        benefits = self.helper.create_benefits(payroll, self.individual, 3, amount=10)
+
+        with mock.patch.object(StrategyOnlinePayment, 'PAYMENT_GATEWAY', RejectingPaymentGatewayConnector()):
+            StrategyOnlinePayment._send_payment_data_to_gateway(payroll, self.user)
+
+        history = PaymentAdaptorHistory.objects.get(payroll=payroll)
+        self.assertEqual(history.run_type, PaymentAdaptorHistory.RunType.PAYMENT)
+        self.assertEqual(history.gateway, 'RejectingPaymentGatewayConnector')
+        self.assertEqual((history.sent_count, history.accepted_count, history.rejected_count), (3, 2, 1))
+        self.assertEqual(float(history.total_amount), 30)
+        self.assertEqual(history.bills_ids, [])
+        self.assertIsNotNone(history.date_finished)
+        self.assertEqual(
+            set(PaymentAdaptorHistoryBenefit.objects.filter(history=history, accepted=False)
+                .values_list('benefit_id', flat=True)),
+            {benefits[0].id}
+        )
+        self.assertEqual(
+            StrategyOnlinePayment.get_benefits_attached_to_payroll(
+                payroll, BenefitConsumptionStatus.APPROVE_FOR_PAYMENT).count(),
+            2
+        )
@@ -0,0 +1,49 @@
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig
+from payroll.services import PaymentCycleExportService
+from payroll.tests.helpers import PayrollHelper
+
+
+class PaymentCycleExportTestCase(TestCase):
+    user = None
+    helper = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+        cls.individual = cls.helper.create_individual()
+        cls.payment_cycle = cls.helper.create_payment_cycle("ExportCycle")
+        cls.payrolls = [
+            cls.helper.create_payroll("ExportPayrollA", payment_cycle=cls.payment_cycle),
+            cls.helper.create_payroll("ExportPayrollB", payment_cycle=cls.payment_cycle),
+        ]
+        for payroll in cls.payrolls:
+            cls.helper.create_benefits(payroll, cls.individual, 3)
+        other_payroll = cls.helper.create_payroll("ExportPayrollOther")
+        cls.helper.create_benefits(other_payroll, cls.individual, 2)
+
+    def setUp(self):
+        self._rows_per_file = PayrollConfig.payment_cycle_export_rows_per_file
+        PayrollConfig.payment_cycle_export_rows_per_file = 4
+
+    def tearDown(self):
+        PayrollConfig.payment_cycle_export_rows_per_file = self._rows_per_file
+
+    def test_shards_cover_all_payrolls_of_cycle(self):
+        shards = list(PaymentCycleExportService(self.user)._iter_shards(self.payment_cycle))
+
+        self.assertEqual([len(shard) for shard in shards], [4, 2])
+        payroll_ids = set()
+        for shard in shards:
+            self.assertEqual(shard.columns[0], PaymentCycleExportService.PAYROLL_ID_COLUMN)
+            payroll_ids.update(shard[PaymentCycleExportService.PAYROLL_ID_COLUMN])
+        self.assertEqual(payroll_ids, {str(payroll.id) for payroll in self.payrolls})
+
+    def test_request_export_without_payrolls(self):
+        payment_cycle = self.helper.create_payment_cycle("ExportCycleEmpty")
+        with self.assertRaises(ValueError):
+            PaymentCycleExportService(self.user).request_export(payment_cycle.id)
@@ -0,0 +1,56 @@
+import time
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.payment_dispatch import PaymentDispatcher, TokenBucket
+from payroll.services import PayrollService
+from payroll.tests.helpers import PayrollHelper
+
+
+class PaymentDispatcherTestCase(SimpleTestCase):
+
+    def test_results_keep_order_of_items(self):
+        def send(item):
+            if item == 3:
+                raise ConnectionError("gateway unavailable")
+            return item % 2 == 0
+
+        with PaymentDispatcher(max_workers=4, rate=0) as dispatcher:
+            results = dispatcher.map(send, range(6))
+
+        self.assertEqual(results, [True, False, True, False, True, False])
+
+    def test_rate_limit_is_shared_by_workers(self):
+        bucket = TokenBucket(rate=50, capacity=10)
+        start = time.monotonic()
+        for _ in range(20):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+
+        # 10 tokens of the initial burst, the other 10 are refilled at 50 per second
+        self.assertGreaterEqual(elapsed, 0.18)
+
+
+class MakePaymentForPayrollsTestCase(TestCase):
+    user = None
+    helper = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+        cls.payrolls = [cls.helper.create_payroll(f"PaymentBatch{index}") for index in range(3)]
+
+    @patch('payroll.services.send_payments_for_payrolls.delay')
+    def test_single_batch_job_is_published_on_commit(self, send_payments_delay):
+        payroll_ids = [payroll.id for payroll in self.payrolls]
+        with self.captureOnCommitCallbacks(execute=True):
+            PayrollService(self.user).make_payment_for_payrolls(payroll_ids, 'client-mutation')
+            self.assertFalse(send_payments_delay.called)
+
+        send_payments_delay.assert_called_once_with(
+            [str(payroll_id) for payroll_id in payroll_ids], self.user.id, 'client-mutation'
+        )
@@ -0,0 +1,139 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, PayrollAggregate, \
+    PayrollBeneficiarySelection, PayrollBenefitConsumption
+from payroll.services import PayrollAggregateService, PayrollService
+from payroll.strategies import StrategyOnlinePayment
+from payroll.tasks import generate_payroll_benefits_chunk
+from payroll.tests.helpers import PayrollHelper
+
+
+def _fake_calculation(service, payment_plan, beneficiaries_queryset, date_from, date_to, payroll, payment_cycle):
+    # stands in for the payment plan calculation, which attaches every benefit it generates one by one
+    for beneficiary in beneficiaries_queryset:
+        benefit = BenefitConsumption(individual=beneficiary.individual, code=f"GEN-{beneficiary.id}", amount=25,
+                                     type="Cash", status=BenefitConsumptionStatus.ACCEPTED)
+        benefit.save(username=service.user.username)
+        service.attach_benefit_to_payroll(payroll.id, benefit.id)
+
+
+class PayrollAggregateTestCase(TestCase):
+    user = None
+    helper = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+        cls.individual = cls.helper.create_individual()
+
+    def _select_beneficiaries(self, payroll, count):
+        benefit_plan = self.helper.create_benefit_plan(code=f"AGG{payroll.name[-6:]}")
+        beneficiaries = self.helper.seed_beneficiaries(benefit_plan, count)
+        PayrollBeneficiarySelection.objects.bulk_create(
+            [PayrollBeneficiarySelection(payroll=payroll, beneficiary=beneficiary) for beneficiary in beneficiaries]
+        )
+        return list(PayrollBeneficiarySelection.objects.filter(payroll=payroll).order_by('id')
+                    .values_list('id', flat=True))
+
+    def test_attach_updates_aggregate(self):
+        payroll = self.helper.create_payroll("AggregateAttach")
+        self.helper.create_benefits(payroll, self.individual, 3, amount=100)
+
+        aggregate = PayrollAggregate.objects.get(payroll=payroll)
+        self.assertEqual(aggregate.total_count, 3)
+        self.assertEqual(aggregate.total_amount, Decimal("300"))
+        self.assertEqual(aggregate.reconciled_amount, Decimal("0"))
+        self.assertEqual(aggregate.status_summary[BenefitConsumptionStatus.ACCEPTED]['count'], 3)
+
+    @mock.patch.object(PayrollService, '_generate_benefits', autospec=True, side_effect=_fake_calculation)
+    def test_generated_range_updates_aggregate_once(self, _generate_benefits):
+        payroll = self.helper.create_payroll("AggregateGenerated")
+        selection_ids = self._select_beneficiaries(payroll, 3)
+        PayrollAggregateService.rebuild(payroll.id)
+
+        with mock.patch.object(PayrollAggregateService, 'apply_delta',
+                               wraps=PayrollAggregateService.apply_delta) as apply_delta:
+            PayrollService(self.user).generate_benefits_for_selection_range(
+                payroll, selection_ids[0], selection_ids[-1] + 1, None, None)
+
+        self.assertEqual(apply_delta.call_count, 1)
+        aggregate = PayrollAggregate.objects.get(payroll=payroll)
+        self.assertEqual(aggregate.total_count, 3)
+        self.assertEqual(aggregate.total_amount, Decimal("75"))
+        self.assertEqual(aggregate.status_summary[BenefitConsumptionStatus.ACCEPTED]['count'], 3)
+
+    @mock.patch('payroll.services.generate_payroll_benefits.delay')
+    @mock.patch.object(PayrollService, '_generate_benefits', autospec=True, side_effect=_fake_calculation)
+    def test_generation_chunks_share_aggregate(self, _generate_benefits, generate_delay):
+        payroll = self.helper.create_payroll("AggregateChunks", json_ext={'beneficiary_selection': {'count': 4}})
+        self._select_beneficiaries(payroll, 4)
+        self.assertFalse(PayrollAggregate.objects.filter(payroll=payroll).exists())
+
+        with mock.patch.object(PayrollConfig, 'payroll_generation_chunk_size', 2), \
+                self.captureOnCommitCallbacks(execute=True):
+            PayrollService(self.user)._start_background_generation(payroll, None, None)
+        self.assertTrue(PayrollAggregate.objects.filter(payroll=payroll).exists())
+
+        _payroll_id, _user_id, chunks, _date_from, _date_to = generate_delay.call_args.args
+        self.assertEqual(len(chunks), 2)
+        for start_id, end_id in chunks:
+            generate_payroll_benefits_chunk(payroll.id, self.user.id, start_id, end_id, None, None)
+
+        payroll.refresh_from_db()
+        self.assertEqual(payroll.json_ext['generation']['failed_chunks'], [])
+        self.assertEqual(payroll.json_ext['generation']['status'], 'COMPLETED')
+        aggregate = PayrollAggregate.objects.get(payroll=payroll)
+        self.assertEqual(aggregate.total_count, 4)
+        self.assertEqual(aggregate.total_amount, Decimal("100"))
+        self.assertEqual(aggregate.status_summary[BenefitConsumptionStatus.ACCEPTED]['count'], 4)
+
+    def test_bulk_attach_updates_aggregate(self):
+        payroll = self.helper.create_payroll("AggregateBulkAttach")
+        source_payroll = self.helper.create_payroll("AggregateBulkAttachSource")
+        benefits = self.helper.create_benefits(source_payroll, self.individual, 3, amount=10)
+
+        PayrollService(self.user).attach_benefits_to_payroll([(benefit, payroll) for benefit in benefits])
+
+        self.assertEqual(PayrollBenefitConsumption.objects.filter(payroll=payroll).count(), 3)
+        self.assertEqual(PayrollBenefitConsumption.history.filter(payroll=payroll).count(), 3)
+        aggregate = PayrollAggregate.objects.get(payroll=payroll)
+        self.assertEqual(aggregate.total_count, 3)
+        self.assertEqual(aggregate.total_amount, Decimal("30"))
+
+    def test_transitions_match_rebuild(self):
+        payroll = self.helper.create_payroll("AggregateTransitions")
+        benefits = self.helper.create_benefits(payroll, self.individual, 4, amount=50)
+
+        StrategyOnlinePayment.approve_for_payment_benefit_consumption(benefits[:2], self.user)
+        StrategyOnlinePayment.reconcile_benefit_consumption(benefits[:1], self.user)
+
+        aggregate = PayrollAggregate.objects.get(payroll=payroll)
+        self.assertEqual(aggregate.total_count, 4)
+        self.assertEqual(aggregate.reconciled_amount, Decimal("50"))
+        self.assertEqual(aggregate.status_summary[BenefitConsumptionStatus.APPROVE_FOR_PAYMENT]['count'], 1)
+        self.assertEqual(aggregate.status_summary[BenefitConsumptionStatus.ACCEPTED]['count'], 2)
+
+        incremental_summary = aggregate.status_summary
+        rebuilt = PayrollAggregateService.rebuild(payroll.id)
+        self.assertEqual(
+            {status: entry['count'] for status, entry in incremental_summary.items() if entry['count']},
+            {status: entry['count'] for status, entry in rebuilt.status_summary.items()},
+        )
+        self.assertEqual(rebuilt.total_amount, Decimal("200"))
+
+    def test_remove_benefits_resets_aggregate(self):
+        payroll = self.helper.create_payroll("AggregateRemove")
+        self.helper.create_benefits(payroll, self.individual, 2)
+
+        StrategyOnlinePayment.remove_benefits_from_rejected_payroll(payroll)
+
+        aggregate = PayrollAggregate.objects.get(payroll=payroll)
+        self.assertEqual(aggregate.total_count, 0)
+        self.assertEqual(aggregate.total_amount, Decimal("0"))
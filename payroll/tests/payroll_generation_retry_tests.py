@@ -0,0 +1,44 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.models import PayrollStatus
+from payroll.tests.helpers import PayrollHelper
+
+
+class RetryPayrollGenerationCommandTestCase(TestCase):
+    user = None
+    helper = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+
+    @mock.patch('payroll.services.generate_payroll_benefits.delay')
+    def test_failed_chunks_are_dispatched_again(self, generate_delay):
+        payroll = self.helper.create_payroll("RetryGeneration", json_ext={'generation': {
+            'status': 'FAILED',
+            'total_chunks': 2,
+            'completed_chunks': 1,
+            'failed_chunks': [[3, 5]],
+            'date_valid_from': '2024-01-01',
+            'date_valid_to': '2024-12-31',
+        }})
+        payroll.status = PayrollStatus.GENERATING
+        payroll.save(username=self.user.username)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('retry_payroll_generation', '--payroll', str(payroll.id), '--username', self.user.username,
+                         stdout=out)
+
+        generate_delay.assert_called_once_with(payroll.id, self.user.id, [[3, 5]], '2024-01-01', '2024-12-31')
+        payroll.refresh_from_db()
+        self.assertEqual(payroll.json_ext['generation']['failed_chunks'], [])
+        self.assertEqual(payroll.json_ext['generation']['status'], 'IN_PROGRESS')
+        self.assertIn("Dispatched 1 failed chunk(s)", out.getvalue())
@@ -0,0 +1,96 @@
+import os
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase
+
+from core.test_helpers import LogInHelper
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, PayrollBenefitConsumption
+from payroll.tests.helpers import PayrollHelper
+
+
+@skipUnless(connection.vendor == 'postgresql', "index definitions are read from the PostgreSQL catalog")
+class PayrollIndexTestCase(TestCase):
+    """
+    Checks that the migrations create the indexes as declared on the models. The plans using them are checked by
+    PayrollIndexPlanTestCase on a seeded volume.
+    """
+
+    def _get_index(self, model, name):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+            cursor.execute('SELECT indexdef FROM pg_indexes WHERE indexname = %s', [name])
+            row = cursor.fetchone()
+        self.assertIn(name, constraints)
+        self.assertTrue(constraints[name]['index'])
+        return constraints[name]['columns'], row[0]
+
+    def _columns(self, model, *fields):
+        return [model._meta.get_field(field).column for field in fields]
+
+    def test_code_index(self):
+        columns, _definition = self._get_index(BenefitConsumption, 'payroll_bc_code_idx')
+        self.assertEqual(columns, self._columns(BenefitConsumption, 'code'))
+
+    def test_receipt_index(self):
+        columns, _definition = self._get_index(BenefitConsumption, 'payroll_bc_receipt_idx')
+        self.assertEqual(columns, self._columns(BenefitConsumption, 'receipt'))
+
+    def test_active_status_partial_index(self):
+        columns, definition = self._get_index(BenefitConsumption, 'payroll_bc_active_status_idx')
+        self.assertEqual(columns, self._columns(BenefitConsumption, 'status'))
+        self.assertIn('WHERE', definition)
+        self.assertIn(BenefitConsumption._meta.get_field('is_deleted').column, definition)
+
+    def test_payroll_join_composite_index(self):
+        columns, _definition = self._get_index(PayrollBenefitConsumption, 'payroll_pbc_payroll_benef_idx')
+        self.assertEqual(columns, self._columns(PayrollBenefitConsumption, 'payroll', 'is_deleted', 'benefit'))
+
+    def test_keyset_indexes_lead_with_filter_column(self):
+        columns, _definition = self._get_index(BenefitConsumption, 'payroll_bc_active_keyset_idx')
+        self.assertEqual(columns, self._columns(BenefitConsumption, 'is_deleted', 'date_created', 'id'))
+        columns, _definition = self._get_index(PayrollBenefitConsumption, 'payroll_pbc_payroll_keyset_idx')
+        self.assertEqual(columns, self._columns(PayrollBenefitConsumption, 'payroll', 'date_created', 'id'))
+
+
+@skipUnless(os.getenv('PAYROLL_BENCHMARK'), "set PAYROLL_BENCHMARK=1 to run the payroll benchmarks")
+@skipUnless(connection.vendor == 'postgresql', "EXPLAIN output is checked against the PostgreSQL planner")
+class PayrollIndexPlanTestCase(TestCase):
+    """
+    EXPLAIN of the hot lookups with the default planner settings on seeded and analyzed tables.
+    """
+    ROWS = int(os.getenv('PAYROLL_INDEX_BENCHMARK_ROWS', '50000'))
+    PENDING_ROWS = 50
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = LogInHelper().get_or_create_user_api()
+        helper = PayrollHelper(user)
+        individual = helper.create_individual()
+        cls.payroll = helper.create_payroll("IndexPlans")
+        helper.seed_benefits(cls.payroll, individual, cls.ROWS, status=BenefitConsumptionStatus.RECONCILED,
+                             code_prefix="IDX", with_bills=False)
+        helper.seed_benefits(cls.payroll, individual, cls.PENDING_ROWS,
+                             status=BenefitConsumptionStatus.APPROVE_FOR_PAYMENT, code_prefix="IDXP", with_bills=False)
+        BenefitConsumption.objects.filter(code__startswith="IDX-").update(receipt=F('code'))
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE "{BenefitConsumption._meta.db_table}"')
+            cursor.execute(f'ANALYZE "{PayrollBenefitConsumption._meta.db_table}"')
+
+    def assertIndexScan(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(f'Index Scan on {index_name}', plan.replace('Index Only Scan', 'Index Scan'), plan)
+
+    def test_code_lookup_uses_index(self):
+        self.assertIndexScan(BenefitConsumption.objects.filter(code="IDX-IndexPlans-1"), 'payroll_bc_code_idx')
+
+    def test_receipt_lookup_uses_index(self):
+        self.assertIndexScan(BenefitConsumption.objects.filter(receipt="IDX-IndexPlans-1"), 'payroll_bc_receipt_idx')
+
+    def test_active_status_filter_uses_partial_index(self):
+        self.assertIndexScan(
+            BenefitConsumption.objects.filter(status=BenefitConsumptionStatus.APPROVE_FOR_PAYMENT, is_deleted=False),
+            'payroll_bc_active_status_idx',
+        )
@@ -0,0 +1,47 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.test_helpers import LogInHelper
+from payroll.models import BenefitConsumption, BenefitConsumptionStatus, PayrollAggregate, PayrollBenefitConsumption
+from payroll.services import PayrollService
+from payroll.tests.helpers import PayrollHelper
+
+
+class MoveBenefitConsumptionsTestCase(TestCase):
+    user = None
+    helper = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api()
+        cls.helper = PayrollHelper(cls.user)
+        cls.individual = cls.helper.create_individual()
+
+    def _move(self, name, count):
+        source_payroll = self.helper.create_payroll(f"{name}Source")
+        self.helper.create_benefits(source_payroll, self.individual, count,
+                                    status=BenefitConsumptionStatus.APPROVE_FOR_PAYMENT, code_prefix=name)
+        self.helper.create_benefits(source_payroll, self.individual, 1,
+                                    status=BenefitConsumptionStatus.RECONCILED, code_prefix=f"{name}Paid")
+        payroll = self.helper.create_payroll(name)
+        with CaptureQueriesContext(connection) as queries:
+            PayrollService(self.user)._move_benefit_consumptions(payroll, source_payroll.id)
+        return source_payroll, payroll, len(queries)
+
+    def test_benefits_are_moved_with_reset_status(self):
+        source_payroll, payroll, _ = self._move("MoveBenefits", 3)
+
+        moved = BenefitConsumption.objects.filter(payrollbenefitconsumption__payroll=payroll)
+        self.assertEqual(moved.count(), 3)
+        self.assertFalse(moved.exclude(status=BenefitConsumptionStatus.ACCEPTED).exists())
+        self.assertEqual(PayrollBenefitConsumption.objects.filter(payroll=source_payroll).count(), 1)
+        self.assertEqual(PayrollAggregate.objects.get(payroll=payroll).total_count, 3)
+        self.assertEqual(PayrollAggregate.objects.get(payroll=source_payroll).total_count, 1)
+
+    def test_query_count_does_not_depend_on_payroll_size(self):
+        _, _, small_payroll_queries = self._move("MoveSmall", 2)
+        _, _, large_payroll_queries = self._move("MoveLarge", 20)
+
+        self.assertEqual(small_payroll_queries, large_payroll_queries)
@@ -0,0 +1,102 @@
+import os
+import time
+from decimal import Decimal
+from unittest import skipUnless
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from payroll.apps import PayrollConfig
+from payroll.models import BenefitConsumptionStatus
+from payroll.services import CsvReconciliationService
+
+
+def _legacy_records_to_dataframe(records, extra_info_dicts):
+    """
+    Row-wise construction used before the frame building was vectorized, kept as the benchmark baseline.
+    """
+    extra_info_keys = set()
+    for extra_info in extra_info_dicts:
+        extra_info_keys.update(extra_info.keys())
+
+    df = pd.DataFrame.from_records(records)
+    for key in extra_info_keys:
+        if key not in df.columns:
+            df[key] = None
+    # the status column is looked up before the rename, so the paid column stays empty
+    df[PayrollConfig.csv_reconciliation_paid_extra_field] = df.apply(
+        lambda row: PayrollConfig.csv_reconciliation_paid_yes
+        if PayrollConfig.csv_reconciliation_status_column in row
+        and row[PayrollConfig.csv_reconciliation_status_column] == BenefitConsumptionStatus.RECONCILED else None,
+        axis=1
+    )
+    df.rename(columns=PayrollConfig.csv_reconciliation_field_mapping, inplace=True)
+    for key in extra_info_keys:
+        df[key] = [extra_info_dict.get(key, None) for extra_info_dict in extra_info_dicts]
+    return df
+
+
+def _synthetic_rows(rows):
+    statuses = [BenefitConsumptionStatus.ACCEPTED, BenefitConsumptionStatus.RECONCILED]
+    records, extra_info_dicts = [], []
+    for index in range(rows):
+        record = {key: None for key in PayrollConfig.csv_reconciliation_field_mapping}
+        record.update({
+            'code': f"BC-{index}",
+            'status': statuses[index % 2],
+            'amount': Decimal('100.00'),
+        })
+        records.append(record)
+        extra_info_dicts.append({'phone': str(index), 'district': f"D{index % 10}", 'note': None}
+                                if index % 3 else {'phone': str(index)})
+    return records, extra_info_dicts
+
+
+class ReconciliationFrameTestCase(SimpleTestCase):
+
+    def test_vectorized_frame_matches_row_wise(self):
+        records, extra_info_dicts = _synthetic_rows(100)
+
+        legacy_df = _legacy_records_to_dataframe([dict(record) for record in records], extra_info_dicts)
+        df = CsvReconciliationService(None)._records_to_dataframe(
+            [dict(record) for record in records], extra_info_dicts)
+
+        self.assertEqual(len(df), len(records))
+        self.assertEqual(set(df.columns), set(legacy_df.columns))
+        for column in legacy_df.columns:
+            self.assertEqual(
+                df[column].astype(object).where(df[column].notna(), None).tolist(),
+                legacy_df[column].astype(object).where(legacy_df[column].notna(), None).tolist(),
+                column,
+            )
+
+    def test_paid_column_is_empty_for_reconciled_benefits(self):
+        records, extra_info_dicts = _synthetic_rows(4)
+
+        df = CsvReconciliationService(None)._records_to_dataframe(records, extra_info_dicts)
+
+        reconciled = df[PayrollConfig.csv_reconciliation_status_column] == BenefitConsumptionStatus.RECONCILED
+        self.assertTrue(reconciled.any())
+        self.assertTrue(df[PayrollConfig.csv_reconciliation_paid_extra_field].isna().all())
+
+
+@skipUnless(os.getenv('PAYROLL_BENCHMARK'), "set PAYROLL_BENCHMARK=1 to run the payroll benchmarks")
+class ReconciliationFrameBenchmarkTestCase(SimpleTestCase):
+    ROWS = 100_000
+
+    def test_vectorized_frame_is_faster_than_row_wise(self):
+        records, extra_info_dicts = _synthetic_rows(self.ROWS)
+        service = CsvReconciliationService(None)
+
+        start = time.perf_counter()
+        _legacy_records_to_dataframe([dict(record) for record in records], extra_info_dicts)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        service._records_to_dataframe([dict(record) for record in records], extra_info_dicts)
+        vectorized_time = time.perf_counter() - start
+
+        self.assertLess(
+            vectorized_time, legacy_time,
+            f"vectorized: {vectorized_time:.3f}s, row-wise: {legacy_time:.3f}s for {self.ROWS} rows"
+        )
@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.db.models.signals import post_save
+from django.test import TestCase
+from graphene import Schema
+from graphene.test import Client
+
+from core.models import ModuleConfiguration
+from core.test_helpers import LogInHelper
+from payroll.apps import PayrollConfig, DEFAULT_CONFIG
+from payroll.payments_registry import PaymentMethodStorage
+from payroll.response_cache import response_cache
+from payroll.schema import Query, Mutation
+
+
+class ConfigurationResponseCacheTestCase(TestCase):
+    class GQLContext:
+        def __init__(self, user):
+            self.user = user
+
+    user = None
+    gql_client = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = LogInHelper().get_or_create_user_api(username='username_authorized')
+        cls.gql_client = Client(Schema(query=Query, mutation=Mutation))
+
+    def setUp(self):
+        super().setUp()
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+
+    def _execute(self, query):
+        output = self.gql_client.execute(query, context=self.GQLContext(self.user))
+        self.assertEqual(output.get('errors'), None)
+        return output['data']
+
+    def test_payment_methods_are_built_once(self):
+        with mock.patch.object(PaymentMethodStorage, 'get_all_available_payment_methods',
+                               wraps=PaymentMethodStorage.get_all_available_payment_methods) as get_methods:
+            first = self._execute('{ paymentMethods { paymentMethods { name } } }')
+            second = self._execute('{ paymentMethods { paymentMethods { name } } }')
+
+        self.assertEqual(first, second)
+        self.assertEqual(get_methods.call_count, 1)
+
+    def test_gateway_config_is_cleared_on_module_configuration_change(self):
+        data = self._execute('{ paymentGatewayConfig { baseUrl timeout } }')
+        self.assertEqual(data['paymentGatewayConfig']['baseUrl'], PayrollConfig.gateway_base_url)
+
+        self.addCleanup(PayrollConfig.reload_config)
+        with mock.patch.dict(DEFAULT_CONFIG, gateway_base_url='http://localhost:8070/'):
+            cached = self._execute('{ paymentGatewayConfig { baseUrl } }')
+            with self.captureOnCommitCallbacks(execute=True):
+                post_save.send(sender=ModuleConfiguration, instance=ModuleConfiguration(module='payroll'),
+                               created=False)
+            refreshed = self._execute('{ paymentGatewayConfig { baseUrl } }')
+
+        self.assertEqual(cached['paymentGatewayConfig']['baseUrl'], data['paymentGatewayConfig']['baseUrl'])
+        self.assertEqual(refreshed['paymentGatewayConfig']['baseUrl'], 'http://localhost:8070/')
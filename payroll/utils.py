@@ -1,5 +1,15 @@
+import os
 import random
+import re
+import uuid
+
 from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, StreamingHttpResponse
+from simple_history.utils import bulk_create_with_history
+
+from core import datetime
 
 
 class CodeGenerator:
@@ -20,3 +30,105 @@ class CodeGenerator:
             return model.objects.filter(**{code_field_name: code}).exists()
         except model.DoesNotExist:
             return False
+
+
+def bulk_create_history_models(objs, user, batch_size):
+    """
+    bulk_create for HistoryModel subclasses. Fills the fields otherwise set by HistoryModel.save and writes
+    the historical records, since bulk_create bypasses both.
+    """
+    now = datetime.datetime.now()
+    for obj in objs:
+        obj.id = obj.id or uuid.uuid4()
+        obj.user_created = user
+        obj.user_updated = user
+        obj.date_created = now
+        obj.date_updated = now
+    if objs:
+        bulk_create_with_history(objs, type(objs[0]), batch_size=batch_size, default_user=user)
+    return objs
+
+
+_RANGE_HEADER_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def save_stored_file(path, file, storage=None):
+    """
+    Save a file object to the storage backend chunk by chunk, the storage reads it through File.chunks.
+    """
+    storage = storage or default_storage
+    file.seek(0)
+    return storage.save(path, File(file, name=os.path.basename(path)))
+
+
+def stream_stored_file(request, path, content_type, file_name=None, storage=None, chunk_size=None):
+    """
+    Serve a file of the storage backend as a streaming response, so that it is never loaded into memory as a
+    whole. A single byte range of the Range header is answered with 206 Partial Content.
+    """
+    from payroll.apps import PayrollConfig
+    storage = storage or default_storage
+    chunk_size = chunk_size or PayrollConfig.storage_stream_chunk_size
+    if not storage.exists(path):
+        raise FileNotFoundError(f"File {path} not found")
+
+    size = storage.size(path)
+    byte_range = _parse_range_header(request.META.get('HTTP_RANGE'), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    stored_file = storage.open(path, 'rb')
+    stored_file.seek(start)
+    response = StreamingHttpResponse(
+        _iter_file_range(stored_file, end - start + 1, chunk_size),
+        status=206 if byte_range else 200,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Disposition'] = f'attachment; filename="{file_name or os.path.basename(path)}"'
+    return response
+
+
+def _parse_range_header(range_header, size):
+    """
+    Returns (start, end) of the requested range, None if the whole file is requested and False if the range
+    can not be satisfied. Multiple ranges are not supported and the whole file is served for them.
+    """
+    if not range_header:
+        return None
+    match = _RANGE_HEADER_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # suffix range, the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _iter_file_range(file, length, chunk_size):
+    try:
+        remaining = length
+        while remaining > 0:
+            data = file.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        file.close()
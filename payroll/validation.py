@@ -58,9 +58,15 @@ def are_bills_in_data(data):
 
 def validate_one_payroll_per_bill(data):
     bills = data.get('bills', [])
+    if not bills:
+        return []
     query = PayrollBill.objects.filter(bill__in=bills, is_deleted=False)
-    if query.exists():
-        payroll_bill_ids = list(query.values_list('id', flat=True))
+    # bills of a payroll recreated from failed invoices are moved from the source payroll
+    from_payroll_id = data.get('from_failed_invoices_payroll_id')
+    if from_payroll_id:
+        query = query.exclude(payroll_id=from_payroll_id)
+    payroll_bill_ids = list(query.values_list('id', flat=True))
+    if payroll_bill_ids:
         return [{"message": _("payroll.validation.payroll.bill_already_assigned") % {
             "bill_ids": payroll_bill_ids,
         }}]
@@ -1,16 +1,19 @@
+import json
 import logging
 
 from django.db import transaction
-from rest_framework import views
+from rest_framework import renderers, views
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
 from core.utils import DefaultStorageFileHandler
 from im_export.views import check_user_rights
 from payroll.apps import PayrollConfig
 from payroll.models import Payroll, CsvReconciliationUpload
 from payroll.payments_registry import PaymentMethodStorage
-from payroll.services import CsvReconciliationService
+from payroll.services import CsvReconciliationService, PaymentCycleExportService
+from payroll.utils import save_stored_file, stream_stored_file
 
 logger = logging.getLogger(__name__)
 
@@ -55,8 +58,38 @@ def _resolve_send_callback_to_imis_args(request):
     return payroll_id, response_from_gateway, rejected_bills
 
 
+class ReconciliationFileRenderer(renderers.BaseRenderer):
+    """
+    Makes the reconciliation export formats acceptable for the content negotiation of `format`. The file itself
+    is set directly as response content, only error payloads go through the renderer.
+    """
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return json.dumps(data).encode('utf-8')
+
+
+class CSVRenderer(ReconciliationFileRenderer):
+    media_type = 'text/csv'
+    format = CsvReconciliationService.FORMAT_CSV
+
+
+class ParquetRenderer(ReconciliationFileRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = CsvReconciliationService.FORMAT_PARQUET
+
+
 class CSVReconciliationAPIView(views.APIView):
     permission_classes = [check_user_rights(PayrollConfig.gql_csv_reconciliation_create_perms, )]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer, ParquetRenderer]
+
+    EXPORT_CONTENT_TYPES = {
+        CSVRenderer.format: CSVRenderer.media_type,
+        ParquetRenderer.format: ParquetRenderer.media_type,
+    }
 
     def get(self, request):
         try:
@@ -65,17 +98,19 @@ class CSVReconciliationAPIView(views.APIView):
             get_blank_bool = get_blank.lower() == 'true'
 
             if get_blank_bool:
+                file_format = request.GET.get('format', CsvReconciliationService.FORMAT_CSV).lower()
                 service = CsvReconciliationService(request.user)
-                in_memory_file = service.download_reconciliation(payroll_id)
-                response = Response(headers={'Content-Disposition': f'attachment; filename="reconciliation.csv"'},
-                                    content_type='text/csv')
+                in_memory_file = service.download_reconciliation(payroll_id, file_format)
+                response = Response(
+                    headers={'Content-Disposition': f'attachment; filename="reconciliation.{file_format}"'},
+                    content_type=self.EXPORT_CONTENT_TYPES[file_format]
+                )
                 response.content = in_memory_file.getvalue()
                 return response
             else:
                 file_name = request.GET.get('payroll_file_name')
                 path = PayrollConfig.get_payroll_payment_file_path(payroll_id, file_name)
-                file_handler = DefaultStorageFileHandler(path)
-                return file_handler.get_file_response_csv(file_name)
+                return stream_stored_file(request, path, CSVRenderer.media_type, file_name)
         except ValueError as exc:
             logger.error("Error while generating CSV reconciliation", exc_info=exc)
             return Response({'success': False, 'error': str(exc)}, status=400)
@@ -88,8 +123,11 @@ class CSVReconciliationAPIView(views.APIView):
 
     @transaction.atomic
     def post(self, request):
-        upload = CsvReconciliationUpload()
         payroll_id = request.GET.get('payroll_id')
+        if request.GET.get('dry_run', 'false').lower() == 'true':
+            return self._validate_upload(request, payroll_id)
+        upload = CsvReconciliationUpload()
+        file_to_upload = None
         try:
             upload.save(username=request.user.login_name)
             file = request.FILES.get('file')
@@ -107,7 +145,7 @@ class CSVReconciliationAPIView(views.APIView):
                 upload.status = CsvReconciliationUpload.Status.SUCCESS
                 upload.json_ext = {'extra_info': summary}
             upload.save(username=request.user.login_name)
-            file_handler.save_file(file_to_upload)
+            save_stored_file(target_file_path, file_to_upload)
             return Response({'success': True, 'error': None}, status=201)
         except Exception as exc:
             logger.error("Error while uploading CSV reconciliation", exc_info=exc)
@@ -121,3 +159,57 @@ class CSVReconciliationAPIView(views.APIView):
                 upload.json_ext = {'extra_info': summary}
                 upload.save(username=request.user.login_name)
             return Response({'success': False, 'error': str(exc)}, status=500)
+        finally:
+            if file_to_upload is not None:
+                file_to_upload.close()
+
+    def _validate_upload(self, request, payroll_id):
+        try:
+            service = CsvReconciliationService(request.user)
+            _, errors, summary = service.upload_reconciliation(payroll_id, request.FILES.get('file'), dry_run=True)
+            return Response({'success': True, 'error': None, 'errors': errors, 'summary': summary}, status=200)
+        except ValueError as exc:
+            logger.error("Error while validating CSV reconciliation", exc_info=exc)
+            return Response({'success': False, 'error': str(exc)}, status=400)
+        except Exception as exc:
+            logger.error("Error while validating CSV reconciliation", exc_info=exc)
+            return Response({'success': False, 'error': str(exc)}, status=500)
+
+
+class PaymentCycleExportAPIView(views.APIView):
+    """
+    POST schedules the export of all payrolls of a payment cycle and returns the name of the zip file,
+    GET downloads that file once the export task has stored it.
+    """
+    permission_classes = [check_user_rights(PayrollConfig.gql_csv_reconciliation_search_perms, )]
+
+    def get(self, request):
+        try:
+            payment_cycle_id = request.GET.get('payment_cycle_id')
+            file_name = request.GET.get('file_name')
+            if not payment_cycle_id or not file_name:
+                raise ValueError('payment_cycle_export.validation.payment_cycle_id_and_file_name_required')
+            path = PayrollConfig.get_payment_cycle_export_file_path(payment_cycle_id, file_name)
+            return stream_stored_file(request, path, 'application/zip', file_name)
+        except ValueError as exc:
+            logger.error("Error while downloading payment cycle export", exc_info=exc)
+            return Response({'success': False, 'error': str(exc)}, status=400)
+        except FileNotFoundError as exc:
+            logger.error("Payment cycle export not found", exc_info=exc)
+            return Response({'success': False, 'error': str(exc)}, status=404)
+        except Exception as exc:
+            logger.error("Error while downloading payment cycle export", exc_info=exc)
+            return Response({'success': False, 'error': str(exc)}, status=500)
+
+    @transaction.atomic
+    def post(self, request):
+        try:
+            payment_cycle_id = request.GET.get('payment_cycle_id')
+            file_name = PaymentCycleExportService(request.user).request_export(payment_cycle_id)
+            return Response({'success': True, 'error': None, 'file_name': file_name}, status=202)
+        except ValueError as exc:
+            logger.error("Error while requesting payment cycle export", exc_info=exc)
+            return Response({'success': False, 'error': str(exc)}, status=400)
+        except Exception as exc:
+            logger.error("Error while requesting payment cycle export", exc_info=exc)
+            return Response({'success': False, 'error': str(exc)}, status=500)
@@ -29,6 +29,11 @@ setup(
         'openimis-be-invoice',
         'openimis-be-payment_cycle',
     ],
+    extras_require={
+        'parquet': ['pyarrow'],
+        'prometheus': ['prometheus-client'],
+        'statsd': ['statsd'],
+    },
     classifiers=[
         'Environment :: Web Environment',
         'Framework :: Django',